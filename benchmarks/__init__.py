@@ -0,0 +1,3 @@
+"""
+Benchmarks for the ckanext.searchindexhook extension. See README.md for usage.
+"""
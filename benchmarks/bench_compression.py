@@ -0,0 +1,100 @@
+"""
+Measures the compression of request bodies: the compression ratio and CPU time per
+level, and the throughput against a local stub endpoint limited to a given bandwidth.
+
+    python -m benchmarks.bench_compression [--bandwidth 1250000] [--requests 50]
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.bench_geo import build_ring
+from benchmarks.stub_server import StubIndexQueueServer
+from ckanext.searchindexhook.client import IndexClient, compress
+
+AUTH = ('kermit', 'kermit')
+
+SETTINGS = [
+    ('none', 'none', 6),
+    ('gzip level 1', 'gzip', 1),
+    ('gzip level 6', 'gzip', 6),
+    ('gzip level 9', 'gzip', 9),
+    ('deflate level 6', 'deflate', 6),
+]
+
+
+def build_body(documents, vertices, seed=1):
+    """Returns a bulk body of documents with resources, extras and a polygon."""
+    rng = random.Random(seed)
+    payload = []
+    for number in range(documents):
+        metadata = {
+            'name': 'dataset-{0}'.format(number),
+            'notes': 'Beschreibung des Datensatzes {0}. '.format(number) * 20,
+            'resources': [{
+                'url': 'https://example.org/data/{0}/{1}.csv'.format(number, index),
+                'format': 'CSV',
+                'license': 'http://dcat-ap.de/def/licenses/dl-by-de/2.0',
+                'description': 'Ressource {0}'.format(index),
+            } for index in range(10)],
+            'extras': [{'key': 'contributorID', 'value': '["http://dcat-ap.de/def/contributors/test"]'}],
+            'boundingbox': {'type': 'Polygon', 'coordinates': [
+                build_ring(vertices, 10 + rng.random(), 51 + rng.random(), 0.1)
+            ]},
+        }
+        payload.append({
+            'indexName': 'bench',
+            'document': {'id': 'dataset-{0}'.format(number), 'metadata': json.dumps(metadata)}
+        })
+    return json.dumps(payload)
+
+
+def measure_cpu(body, compression, level, rounds=5):
+    """Returns the compressed size and the CPU milliseconds per compression."""
+    if compression == 'none':
+        return len(body.encode('utf-8')), 0.0
+    data = body.encode('utf-8')
+    start = time.process_time()
+    for _ in range(rounds):
+        compressed = compress(data, compression, level)
+    return len(compressed), (time.process_time() - start) * 1000.0 / rounds
+
+
+def measure_throughput(endpoint, body, compression, level, requests):
+    """Returns the requests per second of sending the body with the given settings."""
+    client = IndexClient(compression=compression, compression_min_size=0, compression_level=level)
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.post(endpoint, AUTH, body).raise_for_status()
+    elapsed = time.perf_counter() - start
+    client.close()
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=20, help='documents per request')
+    parser.add_argument('--vertices', type=int, default=500, help='vertices per polygon')
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--bandwidth', type=int, default=1250000, help='bytes per second, 0 for unlimited')
+    args = parser.parse_args()
+
+    body = build_body(args.documents, args.vertices)
+    raw_size = len(body.encode('utf-8'))
+    print('body: {0} documents, {1} bytes; bandwidth: {2} bytes/s'.format(
+        args.documents, raw_size, args.bandwidth or 'unlimited'
+    ))
+    print('{0:<16} {1:>10} {2:>7} {3:>12} {4:>12}'.format('setting', 'bytes', 'ratio', 'cpu ms/req', 'req/s'))
+
+    with StubIndexQueueServer(bandwidth=args.bandwidth) as server:
+        for label, compression, level in SETTINGS:
+            size, cpu = measure_cpu(body, compression, level)
+            throughput = measure_throughput(server.endpoint, body, compression, level, args.requests)
+            print('{0:<16} {1:>10} {2:>7.1f} {3:>12.2f} {4:>12.1f}'.format(
+                label, size, raw_size / float(size), cpu, throughput
+            ))
+
+
+if __name__ == '__main__':
+    main()
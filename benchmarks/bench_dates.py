@@ -0,0 +1,81 @@
+"""
+Compares the former sequential date normalization with the shape-classifying parser and
+the memoizing DateNormalizer on a corpus of harvested date strings.
+
+    python -m benchmarks.bench_dates [--dates 50000] [--distinct 2000]
+"""
+import argparse
+import datetime
+import random
+import time
+
+from dateutil.parser import parse
+
+from ckanext.searchindexhook.dates import (
+    DATE_FORMATS, NORMALIZED_DATE_FORMAT, DateNormalizer, parse_date, transform_date_notation
+)
+
+# share of the date shapes found in harvested temporal, issued and modified extras
+SHAPES = [
+    ('%Y-%m-%dT%H:%M:%S+0200', 30),
+    ('%Y-%m-%dT%H:%M:%S', 20),
+    ('%Y-%m-%d', 25),
+    ('%Y-%m-%d %H:%M:%S', 10),
+    ('%d.%m.%Y', 10),
+    ('%Y-%m-%dT%H:%M:%S.123456+02:00', 5),
+]
+
+
+def legacy_normalize_date(datestr):
+    """The former implementation: translates and tries every format in table order."""
+    for dateformat in DATE_FORMATS:
+        try:
+            parseddate = datetime.datetime.strptime(datestr, transform_date_notation(dateformat))
+            return parseddate.strftime(NORMALIZED_DATE_FORMAT)
+        except ValueError:
+            pass
+    return parse(datestr).strftime(NORMALIZED_DATE_FORMAT)
+
+
+def build_corpus(dates, distinct):
+    """Returns ``dates`` strings drawn from ``distinct`` different dates."""
+    rng = random.Random(42)
+    start = datetime.datetime(2000, 1, 1)
+    formats = [dateformat for dateformat, _ in SHAPES]
+    weights = [weight for _, weight in SHAPES]
+    values = [
+        (start + datetime.timedelta(seconds=rng.randrange(800000000))).strftime(
+            rng.choices(formats, weights)[0]
+        )
+        for _ in range(distinct)
+    ]
+    return [rng.choice(values) for _ in range(dates)]
+
+
+def measure(func, corpus):
+    """Returns the mean time per date string in microseconds."""
+    start = time.perf_counter()
+    for value in corpus:
+        func(value)
+    return (time.perf_counter() - start) * 1000000.0 / len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dates', type=int, default=50000)
+    parser.add_argument('--distinct', type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.dates, args.distinct)
+    legacy = measure(legacy_normalize_date, corpus)
+    classified = measure(parse_date, corpus)
+    memoized = measure(DateNormalizer().normalize, corpus)
+
+    print('dates:                 {0} ({1} distinct)'.format(args.dates, args.distinct))
+    print('sequential formats:    {0:.2f} us/date'.format(legacy))
+    print('classified shape:      {0:.2f} us/date ({1:.1f}x)'.format(classified, legacy / classified))
+    print('classified + memo:     {0:.2f} us/date ({1:.1f}x)'.format(memoized, legacy / memoized))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares the former spatial enrichment, which built the shapely geometry twice and dumped
+and loaded the bounding box as JSON, with SpatialFeatures on a large generated polygon.
+
+    python -m benchmarks.bench_geo [--vertices 20000] [--repeat 20]
+"""
+import argparse
+import json
+import math
+import time
+
+import geojson
+from area import area
+from shapely.geometry import shape
+
+from ckanext.searchindexhook.geo import SpatialFeatures
+
+geojson.geometry.DEFAULT_PRECISION = 15
+
+
+def build_ring(vertices, center_x=10.0, center_y=51.0, radius=0.5):
+    """Returns a closed, slightly jagged ring like a municipal boundary."""
+    ring = []
+    for index in range(vertices):
+        angle = 2 * math.pi * index / vertices
+        scale = radius * (1 + 0.05 * math.sin(37 * angle))
+        ring.append([center_x + scale * math.cos(angle), center_y + scale * math.sin(angle)])
+    ring.append(ring[0])
+    return ring
+
+
+def legacy_enrichment(spatial):
+    """The former implementation of the bounding box, area and center."""
+    boundingbox = json.loads(geojson.dumps(shape(spatial).simplify(0)))
+    spatial_area = area(spatial)
+    centroid = shape(spatial).centroid
+    return boundingbox, spatial_area, (centroid.x, centroid.y)
+
+
+def single_geometry_enrichment(spatial):
+    """Derives all values from one shapely geometry."""
+    features = SpatialFeatures(spatial)
+    return features.boundingbox(), features.area(), features.center()
+
+
+def measure(func, spatial, repeat):
+    """Returns the mean time per geometry in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(spatial)
+    return (time.perf_counter() - start) * 1000.0 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vertices', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    spatial = geojson.loads(json.dumps({'type': 'Polygon', 'coordinates': [build_ring(args.vertices)]}))
+    legacy = measure(legacy_enrichment, spatial, args.repeat)
+    single = measure(single_geometry_enrichment, spatial, args.repeat)
+
+    print('vertices:         {0}'.format(args.vertices))
+    print('former pipeline:  {0:.2f} ms/geometry'.format(legacy))
+    print('single geometry:  {0:.2f} ms/geometry'.format(single))
+    print('speedup:          {0:.2f}x'.format(legacy / single))
+
+
+if __name__ == '__main__':
+    main()
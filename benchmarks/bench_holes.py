@@ -0,0 +1,87 @@
+"""
+Regression benchmark of the check whether interior rings share more than one coordinate
+with the exterior ring, on a polygon with a large exterior ring and many holes.
+
+    python -m benchmarks.bench_holes [--vertices 50000] [--holes 100] [--max-ms 500]
+
+The former check compares every exterior coordinate with every hole and takes minutes on
+the default polygon; it is only measured with --compare-sequential. The command exits
+with status 1 if the check takes longer than --max-ms.
+"""
+import argparse
+import json
+import math
+import sys
+import time
+
+import geojson
+
+from benchmarks.bench_geo import build_ring
+from ckanext.searchindexhook.geo import shares_exterior_coordinates
+
+geojson.geometry.DEFAULT_PRECISION = 15
+
+
+def build_holes(holes, vertices, center_x=10.0, center_y=51.0, radius=0.3):
+    """Returns small rings placed on a circle inside the exterior ring."""
+    rings = []
+    for index in range(holes):
+        angle = 2 * math.pi * index / holes
+        rings.append(build_ring(
+            vertices,
+            center_x + radius * math.cos(angle),
+            center_y + radius * math.sin(angle),
+            radius=0.004
+        ))
+    return rings
+
+
+def sequential_shares_exterior_coordinates(coordinates):
+    """The former check."""
+    for internal_polygon in coordinates[1:]:
+        shared_coordinates_counter = 0
+        for coord_external in coordinates[0]:
+            if coord_external in internal_polygon:
+                shared_coordinates_counter += 1
+            if shared_coordinates_counter > 1:
+                return True
+    return False
+
+
+def measure(func, coordinates):
+    """Returns the duration of one check in milliseconds."""
+    start = time.perf_counter()
+    func(coordinates)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vertices', type=int, default=50000)
+    parser.add_argument('--holes', type=int, default=100)
+    parser.add_argument('--hole-vertices', type=int, default=200)
+    parser.add_argument('--max-ms', type=float, default=500.0)
+    parser.add_argument('--compare-sequential', action='store_true')
+    args = parser.parse_args()
+
+    spatial = geojson.loads(json.dumps({
+        'type': 'Polygon',
+        'coordinates': [build_ring(args.vertices)] + build_holes(args.holes, args.hole_vertices)
+    }))
+    hashed = measure(shares_exterior_coordinates, spatial.coordinates)
+
+    print('polygon:          {0} vertices, {1} holes of {2} vertices'.format(
+        args.vertices, args.holes, args.hole_vertices
+    ))
+    print('hashed check:     {0:.2f} ms'.format(hashed))
+    if args.compare_sequential:
+        sequential = measure(sequential_shares_exterior_coordinates, spatial.coordinates)
+        print('sequential check: {0:.2f} ms ({1:.0f}x)'.format(sequential, sequential / hashed))
+
+    if hashed > args.max_ms:
+        print('regression: the check took longer than {0:.0f} ms'.format(args.max_ms))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
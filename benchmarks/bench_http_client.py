@@ -0,0 +1,59 @@
+"""
+Compares the per-document latency of the module-level requests functions with the
+pooled keep-alive IndexClient against a local stub endpoint.
+
+    python -m benchmarks.bench_http_client [--documents 2000]
+"""
+import argparse
+import json
+import time
+
+import requests
+
+from benchmarks.stub_server import StubIndexQueueServer
+from ckanext.searchindexhook.client import IndexClient
+
+AUTH = ('kermit', 'kermit')
+PAYLOAD = json.dumps([{'indexName': 'bench', 'document': {'id': 'bench-id', 'metadata': '{}'}}])
+
+
+def run_unpooled(endpoint, documents):
+    """Issues one DELETE and one POST per document with a fresh connection each."""
+    for _ in range(documents):
+        requests.delete(endpoint + 'bench-id', auth=AUTH, data=PAYLOAD).raise_for_status()
+        requests.post(endpoint, auth=AUTH, data=PAYLOAD).raise_for_status()
+
+
+def run_pooled(endpoint, documents):
+    """Issues one DELETE and one POST per document over the shared connection pool."""
+    client = IndexClient()
+    for _ in range(documents):
+        client.delete(endpoint + 'bench-id', AUTH, PAYLOAD).raise_for_status()
+        client.post(endpoint, AUTH, PAYLOAD).raise_for_status()
+    client.close()
+
+
+def measure(func, endpoint, documents):
+    """Returns the mean latency per document in milliseconds."""
+    start = time.perf_counter()
+    func(endpoint, documents)
+    return (time.perf_counter() - start) * 1000.0 / documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=2000)
+    args = parser.parse_args()
+
+    with StubIndexQueueServer() as server:
+        unpooled = measure(run_unpooled, server.endpoint, args.documents)
+        pooled = measure(run_pooled, server.endpoint, args.documents)
+
+    print('documents:            {0}'.format(args.documents))
+    print('requests.post/delete: {0:.3f} ms/document'.format(unpooled))
+    print('IndexClient:          {0:.3f} ms/document'.format(pooled))
+    print('speedup:              {0:.2f}x'.format(unpooled / pooled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Generators of synthetic datasets in the form CKAN passes them to before_dataset_index, with
+tunable numbers of resources and extras, polygon vertices and holes, and date shapes.
+"""
+import datetime
+import json
+import random
+import uuid
+
+from benchmarks.bench_dates import SHAPES
+from benchmarks.bench_geo import build_ring
+from benchmarks.bench_holes import build_holes
+
+LICENSES = [
+    'http://dcat-ap.de/def/licenses/dl-by-de/2.0',
+    'http://dcat-ap.de/def/licenses/cc-by/4.0',
+    'http://dcat-ap.de/def/licenses/other-closed',
+]
+
+FORMATS = [
+    'CSV',
+    'http://publications.europa.eu/resource/authority/file-type/JSON',
+    'https://www.iana.org/assignments/media-types/application/pdf',
+    'http://publications.europa.eu/mdr/resource/authority/file-type/XML',
+]
+
+# extras of a harvested DCAT-AP.de dataset besides the dates and the geometry
+COPIED_EXTRAS = [
+    ('contact_name', 'Stadtverwaltung'),
+    ('contact_email', 'open-data@example.org'),
+    ('maintainer_tel', '+49 30 1234567'),
+    ('publisher_name', 'Statistisches Amt'),
+    ('politicalGeocodingLevelURI', 'http://dcat-ap.de/def/politicalGeocodingLevel/municipality'),
+    ('contributorID', '["http://dcat-ap.de/def/contributors/transparenzportalHamburg"]'),
+    ('geocodingText', '["Hamburg"]'),
+    ('politicalGeocodingURI', '["http://dcat-ap.de/def/politicalGeocoding/stateKey/02"]'),
+    ('applicable_legislation', '["http://data.europa.eu/eli/reg_impl/2023/138/oj"]'),
+    ('hvd_category', '["http://data.europa.eu/bna/c_dd313021"]'),
+]
+
+DATE_EXTRAS = ['temporal_start', 'temporal_end', 'issued', 'modified']
+
+
+def build_date(rng, date_shape=None):
+    """Returns a date string in the given strftime shape or in a shape drawn from SHAPES."""
+    if date_shape is None:
+        date_shape = rng.choices([shape for shape, _ in SHAPES], [weight for _, weight in SHAPES])[0]
+    start = datetime.datetime(2000, 1, 1)
+    return (start + datetime.timedelta(seconds=rng.randrange(700000000))).strftime(date_shape)
+
+
+def build_polygon(vertices, holes=0, hole_vertices=50):
+    """Returns a GeoJSON polygon with the given number of exterior vertices and holes."""
+    return {
+        'type': 'Polygon',
+        'coordinates': [build_ring(vertices)] + build_holes(holes, hole_vertices)
+    }
+
+
+def build_resources(rng, count, package_id='bench-dataset'):
+    """Returns resource dicts with licenses, formats, URLs and access services."""
+    resources = []
+    for index in range(count):
+        resource = {
+            'id': 'resource-{0}'.format(index),
+            'package_id': package_id,
+            'url': 'http://example.org/data/{0}.csv'.format(index),
+            'format': rng.choice(FORMATS),
+            'license': rng.choice(LICENSES),
+            'cache_last_updated': None,
+        }
+        if index % 3 == 0:
+            resource['download_url'] = resource['url']
+        if index % 10 == 9:
+            resource['access_services'] = json.dumps([
+                {'title': 'WMS', 'endpoint_url': ['http://example.org/wms']}
+            ])
+        resources.append(resource)
+    return resources
+
+
+def build_extras(rng, count, vertices=0, holes=0, date_shape=None):
+    """
+    Returns ``count`` extras: the dates, the geometry if ``vertices`` is set, the known
+    copied and list extras and as many unknown extras as needed, like harvested datasets.
+    """
+    extras = [{'key': key, 'value': build_date(rng, date_shape)} for key in DATE_EXTRAS]
+    if vertices:
+        extras.append({'key': 'spatial', 'value': json.dumps(build_polygon(vertices, holes))})
+    extras.extend({'key': key, 'value': value} for key, value in COPIED_EXTRAS)
+    index = 0
+    while len(extras) < count:
+        extras.append({'key': 'harvest_extra_{0}'.format(index), 'value': 'value {0}'.format(index)})
+        index += 1
+    return extras[:max(count, 0)]
+
+
+def build_pkg_dict(resources=10, extras=20, vertices=0, holes=0, date_shape=None, seed=42):
+    """
+    Returns a dataset as passed to before_dataset_index with the generated resources and
+    extras in its serialized data dict.
+    """
+    rng = random.Random(seed)
+    package_id = str(uuid.UUID(int=seed, version=4))
+    name = 'bench-dataset-{0}'.format(seed)
+    data_dict = {
+        'resources': build_resources(rng, resources, package_id),
+        'extras': build_extras(rng, extras, vertices, holes, date_shape)
+    }
+    return {
+        'id': package_id,
+        'name': name,
+        'type': 'dataset',
+        'state': 'active',
+        'private': False,
+        'title': 'Benchmark dataset',
+        'notes': 'Generated dataset for the benchmarks',
+        'tags': ['bench'],
+        'author': 'Bench Author',
+        'author_email': 'author@example.org',
+        'maintainer': 'Bench Maintainer',
+        'maintainer_email': 'maintainer@example.org',
+        'groups': ['group-one'],
+        'owner_org': 'bench-org',
+        'metadata_created': '2024-01-01T10:00:00.000000Z',
+        'metadata_modified': '2024-01-02T10:00:00.000000Z',
+        'data_dict': json.dumps(data_dict)
+    }
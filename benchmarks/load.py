@@ -0,0 +1,155 @@
+"""
+End-to-end load test: simulated CKAN workers call before_dataset_index concurrently on
+generated datasets against the local stub of the index-queue webservice (or another
+endpoint) and the throughput and the latency added by the hook are reported.
+
+    python -m benchmarks.load [--workers 8] [--documents 2000] [--distinct 200]
+                              [--resources 10] [--extras 25] [--vertices 100]
+                              [--latency 0.01] [--jitter 0.005] [--error-rate 0.01]
+                              [--reset-rate 0.001] [--upsert] [--async] [--batch]
+                              [--coalesce-window 1] [--compression gzip] [--endpoint URL]
+
+The workers are threads sharing one plugin, as the threads of a CKAN web worker do. In
+the asynchronous, the batch and the coalescing mode the reported latency only covers the
+hook call; the throughput includes sending the remaining operations at the end.
+"""
+import argparse
+import itertools
+import threading
+import time
+
+from benchmarks.datasets import build_pkg_dict
+from benchmarks.stub_server import StubIndexQueueServer
+from ckanext.searchindexhook.plugin import SearchIndexHookPlugin
+
+
+def build_plugin(endpoint, args):
+    """Returns a plugin configured for the endpoint and the modes of the arguments."""
+    plugin = SearchIndexHookPlugin()
+    plugin.search_index_endpoint = endpoint
+    plugin.search_index_credentials = 'load:load'
+    plugin.indexable_data_types = 'dataset'
+    plugin.targetlink_url_base_path = '/dataset/'
+    plugin.search_index_name = 'load'
+    plugin.license_openness_map = {
+        'http://dcat-ap.de/def/licenses/dl-by-de/2.0': True,
+        'http://dcat-ap.de/def/licenses/cc-by/4.0': True,
+        'http://dcat-ap.de/def/licenses/other-closed': False,
+    }
+    plugin.http_pool_size = max(args.workers, args.async_workers)
+    plugin.http_compression = args.compression
+    plugin.upsert_enabled = args.upsert
+    plugin.async_enabled = args.async_mode
+    plugin.async_workers = args.async_workers
+    plugin.batch_enabled = args.batch
+    plugin.coalesce_window = args.coalesce_window
+    return plugin
+
+
+def percentile(sorted_values, fraction):
+    """Returns the value below which the given fraction of the sorted values lies."""
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_load(plugin, datasets, documents, workers):
+    """
+    Calls before_dataset_index ``documents`` times from ``workers`` threads, cycling
+    through the datasets, and returns the latencies in seconds and the elapsed time
+    including the delivery of the pending operations.
+    """
+    counter = itertools.count()
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def work():
+        own_latencies = []
+        while True:
+            number = next(counter)
+            if number >= documents:
+                break
+            pkg_dict = dict(datasets[number % len(datasets)])
+            start = time.perf_counter()
+            plugin.before_dataset_index(pkg_dict)
+            own_latencies.append(time.perf_counter() - start)
+        with latencies_lock:
+            latencies.extend(own_latencies)
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    plugin.shutdown()
+    return sorted(latencies), time.perf_counter() - start
+
+
+def report(args, latencies, elapsed, stats):
+    """Prints the throughput, the latency percentiles and the counts of the stub."""
+    print('workers:          {0}'.format(args.workers))
+    print('documents:        {0}'.format(len(latencies)))
+    print('elapsed:          {0:.3f} s'.format(elapsed))
+    print('throughput:       {0:.1f} documents/s'.format(len(latencies) / elapsed))
+    for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+        print('latency {0}:      {1:.3f} ms'.format(label, percentile(latencies, fraction) * 1000.0))
+    print('latency max:      {0:.3f} ms'.format(latencies[-1] * 1000.0 if latencies else 0.0))
+    if stats is not None:
+        print('requests:         {0} (post {1}, delete {2})'.format(
+            stats['requests'], stats['post'], stats['delete']
+        ))
+        print('errors / resets:  {0} / {1}'.format(stats['errors'], stats['resets']))
+        print('bytes:            {0} on the wire, {1} decoded'.format(
+            stats['wire_bytes'], stats['body_bytes']
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--workers', type=int, default=8, help='concurrent hook calls')
+    parser.add_argument('--documents', type=int, default=2000)
+    parser.add_argument('--distinct', type=int, default=200, help='number of generated datasets')
+    parser.add_argument('--resources', type=int, default=10)
+    parser.add_argument('--extras', type=int, default=25)
+    parser.add_argument('--vertices', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds per stub answer')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--reset-rate', type=float, default=0.0)
+    parser.add_argument('--upsert', action='store_true')
+    parser.add_argument('--async', dest='async_mode', action='store_true')
+    parser.add_argument('--async-workers', type=int, default=4)
+    parser.add_argument('--batch', action='store_true')
+    parser.add_argument('--coalesce-window', type=float, default=0, help='seconds')
+    parser.add_argument('--compression', default='none')
+    parser.add_argument('--endpoint', default=None, help='use this endpoint instead of the stub')
+    args = parser.parse_args()
+
+    datasets = [
+        build_pkg_dict(args.resources, args.extras, args.vertices, seed=seed)
+        for seed in range(args.distinct)
+    ]
+
+    if args.endpoint:
+        plugin = build_plugin(args.endpoint, args)
+        latencies, elapsed = run_load(plugin, datasets, args.documents, args.workers)
+        report(args, latencies, elapsed, None)
+        return
+
+    server = StubIndexQueueServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        error_status=args.error_status, reset_rate=args.reset_rate, seed=42
+    )
+    with server:
+        plugin = build_plugin(server.endpoint, args)
+        latencies, elapsed = run_load(plugin, datasets, args.documents, args.workers)
+        report(args, latencies, elapsed, server.stats)
+
+
+if __name__ == '__main__':
+    main()
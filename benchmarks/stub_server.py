@@ -0,0 +1,180 @@
+"""
+Local stub of the index-queue webservice used by the benchmarks. It can also run on its
+own, e.g. as the endpoint of a development CKAN instance:
+
+    python -m benchmarks.stub_server [--port 8099] [--latency 0.02] [--jitter 0.01]
+                                     [--error-rate 0.05] [--error-status 503]
+                                     [--reset-rate 0.01] [--bandwidth 1250000]
+"""
+import argparse
+import collections
+import gzip
+import random
+import socket
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubIndexQueueHandler(BaseHTTPRequestHandler):
+    """
+    Accepts the POST and DELETE calls of the search index hook and answers with 200.
+    Compressed bodies are decoded. With a bandwidth of the server, reading a body takes
+    as long as transferring it over a link of that many bytes per second.
+
+    The server can add a latency with a random jitter to every answer, answer a share of
+    the requests with an error status and reset the connection for another share without
+    answering.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def _consume(self, method):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        if self.server.bandwidth:
+            time.sleep(length / float(self.server.bandwidth))
+        encoding = self.headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            body = gzip.decompress(body)
+        elif encoding == 'deflate':
+            body = zlib.decompress(body)
+
+        outcome = self.server.draw_outcome()
+        with self.server.stats_lock:
+            self.server.stats['requests'] += 1
+            self.server.stats[method] += 1
+            self.server.stats[outcome] += 1
+            self.server.stats['wire_bytes'] += length
+            self.server.stats['body_bytes'] += len(body)
+
+        delay = self.server.draw_delay()
+        if delay:
+            time.sleep(delay)
+
+        if outcome == 'resets':
+            # closing with a zero linger time sends a RST instead of a FIN
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.close_connection = True
+            return
+
+        self.send_response(self.server.error_status if outcome == 'errors' else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handles adding documents."""
+        self._consume('post')
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """Handles deleting documents."""
+        self._consume('delete')
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """
+    Threading server holding the behaviour and the statistics of the stub.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, bandwidth=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503, reset_rate=0.0, seed=None):
+        super().__init__(address, StubIndexQueueHandler)
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reset_rate = reset_rate
+        self.stats = collections.Counter()
+        self.stats_lock = threading.Lock()
+        self.random = random.Random(seed)
+
+    def draw_outcome(self):
+        """Returns whether a request succeeds, fails with the error status or is reset."""
+        with self.stats_lock:
+            draw = self.random.random()
+        if draw < self.reset_rate:
+            return 'resets'
+        if draw < self.reset_rate + self.error_rate:
+            return 'errors'
+        return 'ok'
+
+    def draw_delay(self):
+        """Returns the latency of an answer in seconds."""
+        if not self.jitter:
+            return self.latency
+        with self.stats_lock:
+            jitter = self.random.uniform(-self.jitter, self.jitter)
+        return max(self.latency + jitter, 0.0)
+
+
+class StubIndexQueueServer:
+    """
+    Runs the stub handler on a free local port in a background thread. The received
+    requests, the requests per method and outcome (ok, errors, resets) and the bytes are
+    counted in ``stats``.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, bandwidth=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, reset_rate=0.0, seed=None):
+        self.httpd = StubHTTPServer(
+            (host, port), bandwidth=bandwidth, latency=latency, jitter=jitter, error_rate=error_rate,
+            error_status=error_status, reset_rate=reset_rate, seed=seed
+        )
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def stats(self):
+        """Returns the counted requests, bytes on the wire and decoded body bytes."""
+        return self.httpd.stats
+
+    @property
+    def endpoint(self):
+        """Returns the base URL of the stub endpoint."""
+        host, port = self.httpd.server_address[:2]
+        return 'http://{host}:{port}/index-queue/'.format(host=host, port=port)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per answer')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random +/- seconds per answer')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of error answers')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--reset-rate', type=float, default=0.0, help='share of reset connections')
+    parser.add_argument('--bandwidth', type=int, default=None, help='bytes per second')
+    args = parser.parse_args()
+
+    server = StubIndexQueueServer(
+        args.host, args.port, bandwidth=args.bandwidth, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, error_status=args.error_status, reset_rate=args.reset_rate
+    )
+    with server:
+        print('Listening on {0}, stop with Ctrl-C'.format(server.endpoint))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    print(dict(server.stats))
+
+
+if __name__ == '__main__':
+    main()
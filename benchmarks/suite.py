@@ -0,0 +1,228 @@
+"""
+Benchmark suite of the document transformation: add_to_index on generated datasets of
+different shapes with the HTTP calls stubbed out, and micro benchmarks of the helpers on
+its hot path. The results can be stored and compared with a baseline.
+
+    python -m benchmarks.suite [--filter add_to_index] [--rounds 5] [--min-time 0.2]
+                               [--save results.json] [--baseline baseline.json]
+                               [--max-regression 0.25]
+
+With --baseline the command exits with status 1 if the median of a benchmark is more than
+--max-regression (a fraction) slower than in the baseline. Stored results are only
+comparable on the same machine.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_dates import build_corpus
+from benchmarks.datasets import build_pkg_dict, build_polygon, build_resources
+from ckanext.searchindexhook.client import IndexClient
+from ckanext.searchindexhook.geocache import SpatialCache
+from ckanext.searchindexhook.plugin import SearchIndexHookPlugin
+
+
+class StubResponse:
+    """Successful response of the stubbed search index."""
+    status_code = 200
+
+    def raise_for_status(self):
+        """Never raises."""
+
+
+class StubSession:
+    """Session answering every request without network traffic."""
+
+    def post(self, *args, **kwargs):  # pylint: disable=unused-argument
+        """Accepts the request."""
+        return StubResponse()
+
+    def delete(self, *args, **kwargs):  # pylint: disable=unused-argument
+        """Accepts the request."""
+        return StubResponse()
+
+
+class StubIndexClient(IndexClient):
+    """IndexClient encoding the bodies as usual, but sending them to a StubSession."""
+
+    def get_session(self):
+        return StubSession()
+
+
+def build_plugin():
+    """
+    Returns a configured plugin sending to a stub. The spatial cache keeps no entries, so
+    the geometries are derived on every call.
+    """
+    plugin = SearchIndexHookPlugin()
+    plugin.search_index_endpoint = 'http://localhost/index-queue/'
+    plugin.search_index_credentials = 'bench:bench'
+    plugin.indexable_data_types = 'dataset'
+    plugin.targetlink_url_base_path = '/dataset/'
+    plugin.search_index_name = 'bench'
+    plugin.license_openness_map = {
+        'http://dcat-ap.de/def/licenses/dl-by-de/2.0': True,
+        'http://dcat-ap.de/def/licenses/cc-by/4.0': True,
+        'http://dcat-ap.de/def/licenses/other-closed': False,
+    }
+    plugin.index_client = StubIndexClient()
+    plugin.spatial_cache = SpatialCache(max_entries=0)
+    return plugin
+
+
+def fresh_resources(count):
+    """Returns a setup creating new resources for every call of a mutating helper."""
+    resources = build_resources(random.Random(42), count)
+    return lambda: ([dict(resource) for resource in resources],)
+
+
+def build_benchmarks(plugin):
+    """
+    Returns the benchmarks as (name, setup, func) tuples. ``setup()`` returns the
+    arguments of one call of ``func`` and is not measured.
+    """
+    benchmarks = []
+
+    add_to_index_shapes = [
+        ('add_to_index.minimal', {'resources': 1, 'extras': 4}),
+        ('add_to_index.typical', {'resources': 10, 'extras': 25, 'vertices': 100}),
+        ('add_to_index.many_resources', {'resources': 200, 'extras': 25}),
+        ('add_to_index.many_extras', {'resources': 10, 'extras': 500}),
+        ('add_to_index.large_polygon', {'resources': 5, 'extras': 20, 'vertices': 20000}),
+        ('add_to_index.polygon_with_holes', {
+            'resources': 5, 'extras': 20, 'vertices': 5000, 'holes': 50
+        }),
+        ('add_to_index.german_dates', {'resources': 5, 'extras': 20, 'date_shape': '%d.%m.%Y'}),
+    ]
+    for name, shape in add_to_index_shapes:
+        pkg_dict = build_pkg_dict(**shape)
+        benchmarks.append((name, lambda pkg_dict=pkg_dict: (pkg_dict,), plugin.add_to_index))
+
+    corpus = itertools.cycle(build_corpus(100000, 2000))
+    benchmarks.append(('normalize_date', lambda: (next(corpus),), plugin.normalize_date))
+
+    benchmarks.append(('shorten_resource_formats', fresh_resources(50), plugin.shorten_resource_formats))
+    resources = build_resources(random.Random(42), 50)
+    for helper in ('aggregate_openness', 'aggregate_quality_metrics', 'aggregate_access_service',
+                   'aggregate_licenses'):
+        benchmarks.append((helper, lambda: (resources,), getattr(plugin, helper)))
+
+    spatial = json.dumps(build_polygon(1000))
+    benchmarks.append((
+        'spatial_to_meta',
+        lambda: ({'key': 'spatial', 'value': spatial}, {}),
+        plugin.spatial_to_meta
+    ))
+    return benchmarks
+
+
+def run_benchmark(setup, func, rounds, min_time):
+    """
+    Runs ``rounds`` rounds of calls, each lasting at least ``min_time`` seconds, and
+    returns the median and minimum of the mean call time of the rounds in microseconds.
+    """
+    means = []
+    iterations = 0
+    for _ in range(rounds):
+        elapsed = 0.0
+        calls = 0
+        while elapsed < min_time:
+            args = setup()
+            start = time.perf_counter()
+            func(*args)
+            elapsed += time.perf_counter() - start
+            calls += 1
+        means.append(elapsed * 1000000.0 / calls)
+        iterations += calls
+    return {
+        'median_us': round(statistics.median(means), 3),
+        'min_us': round(min(means), 3),
+        'iterations': iterations
+    }
+
+
+def git_commit():
+    """Returns the current git commit or None."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """
+    Prints the changes against the baseline and returns the names of the benchmarks
+    slower than allowed.
+    """
+    regressions = []
+    print('')
+    print('{0:<36} {1:>14} {2:>14} {3:>9}'.format('benchmark', 'baseline us', 'current us', 'change'))
+    for name, result in results.items():
+        if name not in baseline:
+            print('{0:<36} {1:>14} {2:>14.3f} {3:>9}'.format(name, '-', result['median_us'], 'new'))
+            continue
+        before = baseline[name]['median_us']
+        change = (result['median_us'] - before) / before if before else 0.0
+        marker = ''
+        if max_regression is not None and change > max_regression:
+            regressions.append(name)
+            marker = ' REGRESSION'
+        print('{0:<36} {1:>14.3f} {2:>14.3f} {3:>+8.1%}{4}'.format(
+            name, before, result['median_us'], change, marker
+        ))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--filter', default=None, help='only run benchmarks containing this text')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per round')
+    parser.add_argument('--save', default=None, help='file to store the results in')
+    parser.add_argument('--baseline', default=None, help='stored results to compare with')
+    parser.add_argument('--max-regression', type=float, default=None, help='allowed slowdown, e.g. 0.25')
+    args = parser.parse_args()
+
+    plugin = build_plugin()
+    results = {}
+    for name, setup, func in build_benchmarks(plugin):
+        if args.filter and args.filter not in name:
+            continue
+        result = run_benchmark(setup, func, args.rounds, args.min_time)
+        results[name] = result
+        print('{0:<36} {1:>12.3f} us (min {2:.3f} us, {3} calls)'.format(
+            name, result['median_us'], result['min_us'], result['iterations']
+        ))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as results_file:
+            json.dump({
+                'created': datetime.datetime.now().isoformat(),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results
+            }, results_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print('regression: {0} slower than allowed'.format(', '.join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
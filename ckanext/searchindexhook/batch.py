@@ -0,0 +1,166 @@
+"""
+Module for collecting index documents and sending them as one multi-document request.
+"""
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+
+class BatchBuffer:
+    """
+    Collects serialized index documents and hands them to the sender as one JSON list as
+    soon as the configured document count, byte size or time window is reached.
+
+    Documents are kept per dataset id, so a later document for the same dataset replaces
+    a pending one. Forked processes start with an empty buffer, because the inherited
+    documents are flushed by the parent. If sending fails, the documents of the batch are
+    passed as (document_id, serialized document) pairs to ``on_error``, otherwise to
+    ``on_sent``. Documents are serialized with ``dumps``.
+
+    Documents can be added while a batch is sent. Batches are sent one after the other, so
+    an older document never overtakes a newer one for the same dataset. Discarding a
+    document which is being sent waits until its batch was sent, so a following deletion
+    never overtakes it either.
+    """
+
+    def __init__(self, sender, max_documents=500, max_bytes=5242880, max_wait=5.0, on_error=None,
+                 dumps=json.dumps, on_sent=None):
+        self.sender = sender
+        self.on_error = on_error
+        self.on_sent = on_sent
+        self.dumps = dumps
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.max_wait = max_wait
+
+        self._documents = collections.OrderedDict()
+        self._size = 0
+        self._oldest = None
+        self._lock = threading.RLock()
+        self._send_lock = threading.Lock()
+        self._sending = frozenset()
+        self._wakeup = threading.Event()
+        self._timer = None
+        self._pid = os.getpid()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _check_fork(self):
+        """
+        Drops the documents and timer inherited from the parent process.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._documents = collections.OrderedDict()
+            self._size = 0
+            self._oldest = None
+            self._lock = threading.RLock()
+            self._send_lock = threading.Lock()
+            self._sending = frozenset()
+            self._wakeup = threading.Event()
+            self._timer = None
+
+    def add(self, document_id, document):
+        """
+        Adds a document to the buffer and flushes the buffer if a threshold is reached.
+        """
+        serialized = self.dumps(document)
+        with self._lock:
+            self._check_fork()
+            self._discard(document_id)
+            self._documents[document_id] = serialized
+            self._size += len(serialized)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._documents) >= self.max_documents or self._size >= self.max_bytes
+            self._ensure_timer()
+        if full:
+            self.flush()
+
+    def discard(self, document_id):
+        """
+        Removes a pending document, e.g. because the dataset was deleted in the meantime. If
+        the document is being sent, this waits until its batch was sent.
+        """
+        with self._lock:
+            self._check_fork()
+            self._discard(document_id)
+            in_flight = document_id in self._sending
+            send_lock = self._send_lock
+        if in_flight:
+            with send_lock:
+                pass
+
+    def _discard(self, document_id):
+        serialized = self._documents.pop(document_id, None)
+        if serialized is not None:
+            self._size -= len(serialized)
+
+    def flush(self):
+        """
+        Sends all pending documents as one request. Errors of the sender are passed on to
+        the caller after the documents were handed to ``on_error``.
+        """
+        with self._lock:
+            self._check_fork()
+            send_lock = self._send_lock
+        # the buffer is only locked while taking the documents, not while sending them
+        with send_lock:
+            with self._lock:
+                if not self._documents:
+                    return
+                documents = list(self._documents.items())
+                self._documents = collections.OrderedDict()
+                self._size = 0
+                self._oldest = None
+                self._sending = frozenset(document_id for document_id, _ in documents)
+            try:
+                self._send(documents)
+            finally:
+                with self._lock:
+                    self._sending = frozenset()
+
+    def _send(self, documents):
+        body = '[' + ','.join(serialized for _, serialized in documents) + ']'
+        LOGGER.debug('Flushing %s documents (%s bytes) to the search index', len(documents), len(body))
+        try:
+            self.sender(body)
+        except Exception:
+            if self.on_error is not None:
+                self.on_error(documents)
+            raise
+        if self.on_sent is not None:
+            self.on_sent(documents)
+
+    def _ensure_timer(self):
+        """
+        Starts the thread flushing the buffer when the time window has elapsed.
+        """
+        if self.max_wait and (self._timer is None or not self._timer.is_alive()):
+            self._timer = threading.Thread(target=self._run_timer, name='searchindexhook-batch')
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            with self._lock:
+                if self._pid != os.getpid():
+                    return
+                oldest = self._oldest
+            if oldest is None:
+                timeout = self.max_wait
+            else:
+                timeout = oldest + self.max_wait - time.monotonic()
+            if timeout > 0:
+                self._wakeup.wait(timeout)
+                continue
+            try:
+                self.flush()
+            except Exception as error:  # pylint: disable=broad-except
+                LOGGER.error('Flushing the batch failed: %s', error)
@@ -0,0 +1,98 @@
+"""
+Module providing the CKAN CLI commands of the search index hook.
+"""
+import click
+
+import ckan.plugins as p
+
+from ckanext.searchindexhook.reindex import Reindexer
+
+
+def get_plugin():
+    """
+    Returns the loaded search index hook plugin.
+    """
+    return p.get_plugin('search_index_hook')
+
+
+@click.group(short_help='Search index hook commands')
+def searchindexhook():
+    """
+    Commands of the search index hook.
+    """
+
+
+@searchindexhook.command(short_help='Re-sends undelivered index operations')
+@click.option('--limit', type=int, default=None, help='Maximum number of operations to send.')
+def replay(limit):
+    """
+    Re-sends the index operations stored in the outbox.
+    """
+    plugin = get_plugin()
+    if plugin.get_outbox() is None:
+        raise click.ClickException('No outbox configured (ckan.searchindexhook.outbox.path)')
+
+    delivered = plugin.replay_outbox(limit)
+    remaining = len(plugin.get_outbox())
+    click.secho(
+        'Replayed {0} index operations, {1} remaining'.format(delivered, remaining),
+        fg='green' if remaining == 0 else 'yellow'
+    )
+
+
+@searchindexhook.command(short_help='Sends all datasets to the search index')
+@click.option('--organization', 'organizations', multiple=True,
+              help='Only datasets of this organization (name or id), can be repeated.')
+@click.option('--type', 'types', multiple=True,
+              help='Only datasets of this type, can be repeated. Defaults to the indexable types.')
+@click.option('--modified-since', type=click.DateTime(), default=None,
+              help='Only datasets modified since this date.')
+@click.option('--processes', type=int, default=None,
+              help='Number of processes building documents, defaults to the number of CPUs.')
+@click.option('--connections', type=int, default=4, help='Number of concurrent requests.')
+@click.option('--chunk-size', type=int, default=100, help='Number of documents per request.')
+@click.option('--checkpoint', 'checkpoint_path', default=None,
+              help='File storing the progress, so an interrupted run can be resumed.')
+@click.option('--resume', is_flag=True, help='Continue after the dataset stored in the checkpoint.')
+def reindex(organizations, types, modified_since, processes, connections, chunk_size,
+            checkpoint_path, resume):
+    """
+    Sends all datasets to the search index without rebuilding the Solr index.
+    """
+    if resume and not checkpoint_path:
+        raise click.ClickException('--resume requires a --checkpoint file')
+
+    reindexer = Reindexer(
+        get_plugin(),
+        types=types,
+        organizations=organizations,
+        modified_since=modified_since,
+        processes=processes,
+        connections=connections,
+        chunk_size=chunk_size,
+        checkpoint_path=checkpoint_path
+    )
+    try:
+        stats = reindexer.run(resume=resume)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+
+    problems = stats['failed'] + stats['undelivered']
+    click.secho(
+        'Reindexed {datasets} datasets: {delivered} delivered, {deferred} stored in the outbox, '
+        '{failed} failed to build, {undelivered} undelivered'.format(
+            datasets=stats['datasets'],
+            delivered=stats['delivered'],
+            deferred=stats['deferred'],
+            failed=stats['failed'],
+            undelivered=stats['undelivered']
+        ),
+        fg='green' if problems == 0 else 'yellow'
+    )
+
+
+def get_commands():
+    """
+    Returns the commands for the IClick interface.
+    """
+    return [searchindexhook]
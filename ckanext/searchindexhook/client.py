@@ -0,0 +1,183 @@
+"""
+Module providing the HTTP client for the search index webservice.
+"""
+import functools
+import gzip
+import logging
+import os
+import threading
+import zlib
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ckanext.searchindexhook import deadline
+
+LOGGER = logging.getLogger(__name__)
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_DEFLATE = 'deflate'
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_DEFLATE)
+
+
+def compress(body, compression, level):
+    """
+    Compresses a request body with gzip or deflate (zlib format, as expected for the
+    deflate content coding).
+    """
+    if compression == COMPRESSION_GZIP:
+        # a fixed mtime keeps the output of equal bodies equal
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    return zlib.compress(body, level)
+
+
+class IndexClient:
+    """
+    Pooled keep-alive HTTP client for the index-queue webservice. The underlying
+    session is created lazily per process, so that forked CKAN workers never share
+    sockets with their parent process.
+
+    Request bodies of at least ``compression_min_size`` bytes are optionally compressed
+    and sent with a Content-Encoding header. The sent body bytes are counted in the
+    optional ``metrics``.
+
+    Responses with a transient status are retried according to the optional
+    ``retry_policy``. With a ``circuit_breaker`` requests fail fast with a
+    CircuitOpenError while the endpoint is considered down; the body is then not even
+    encoded. Within a deadline of the calling thread the timeouts are limited to the time
+    left and no request is started after the deadline.
+    """
+
+    def __init__(self, pool_size=10, keep_alive=True, connect_timeout=5.0, read_timeout=30.0,
+                 compression=COMPRESSION_NONE, compression_min_size=1024, compression_level=6, metrics=None,
+                 retry_policy=None, circuit_breaker=None):
+        if compression not in COMPRESSIONS:
+            raise ValueError('Unknown compression {compression}, expected one of {compressions}'.format(
+                compression=compression, compressions=', '.join(COMPRESSIONS)
+            ))
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.compression = compression
+        self.compression_min_size = compression_min_size
+        self.compression_level = compression_level
+        self.metrics = metrics
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        """
+        Returns the (connect, read) timeout tuple passed to every request.
+        """
+        return self.connect_timeout, self.read_timeout
+
+    def get_session(self):
+        """
+        Returns the session of the current process. A new session is created on the
+        first call and after a fork.
+        """
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                if self._session is None or self._session_pid != pid:
+                    # The session of the parent process is dropped, but not closed, because its
+                    # sockets are still used by the parent.
+                    self._session = self._create_session()
+                    self._session_pid = pid
+                    LOGGER.debug('Created HTTP session for process %s', pid)
+        return self._session
+
+    def _create_session(self):
+        """
+        Creates a session with a connection pool mounted for HTTP and HTTPS.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def encode(self, data):
+        """
+        Returns the headers and the body of a request with the given JSON body, which is
+        compressed if compression is enabled and the body is large enough. String bodies
+        are encoded as UTF-8, because they may contain non-ASCII characters.
+        """
+        if data is None:
+            return JSON_HEADERS, data
+        body = data.encode('utf-8') if isinstance(data, str) else data
+        headers = JSON_HEADERS
+        if self.compression != COMPRESSION_NONE and len(body) >= self.compression_min_size:
+            headers = dict(JSON_HEADERS)
+            headers['Content-Encoding'] = self.compression
+            body = compress(body, self.compression, self.compression_level)
+        if self.metrics is not None:
+            self.metrics.inc('bytes_sent', len(body))
+        return headers, body
+
+    def request(self, method, url, auth, data):
+        """
+        Sends a request with a JSON body, retried and guarded by the circuit breaker if
+        configured.
+        """
+        stage = 'http_' + method
+
+        def send():
+            headers, body = self.encode(data)
+            session_method = functools.partial(
+                getattr(self.get_session(), method),
+                url,
+                auth=auth,
+                headers=headers,
+                data=body
+            )
+
+            def attempt():
+                try:
+                    return session_method(timeout=deadline.bound_timeout(self.timeout, stage))
+                except requests.exceptions.Timeout:
+                    # a timeout shortened by the deadline is reported as an abort
+                    deadline.check(stage)
+                    raise
+
+            if self.retry_policy is None:
+                return attempt()
+            return self.retry_policy.call(attempt)
+
+        deadline.check(stage)
+        if self.circuit_breaker is None:
+            return send()
+        return self.circuit_breaker.call(send)
+
+    def post(self, url, auth, data):
+        """
+        Sends a POST request with a JSON body.
+        """
+        return self.request('post', url, auth, data)
+
+    def delete(self, url, auth, data):
+        """
+        Sends a DELETE request with a JSON body.
+        """
+        return self.request('delete', url, auth, data)
+
+    def close(self):
+        """
+        Closes the session of the current process and releases pooled connections.
+        """
+        with self._lock:
+            if self._session is not None and self._session_pid == os.getpid():
+                self._session.close()
+            self._session = None
+            self._session_pid = None
@@ -0,0 +1,119 @@
+"""
+Module for coalescing repeated index operations for the same dataset.
+"""
+import collections
+import logging
+import os
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Coalescer:
+    """
+    Holds the last index operation per dataset id for ``window`` seconds after the first
+    pending operation for that id and runs it in a background thread afterwards. A later
+    operation for the same id replaces the pending one without extending the window, so a
+    deletion supersedes pending additions and vice versa, and every dataset is sent at most
+    ``window`` seconds after its first change. Replaced operations are passed to
+    ``on_superseded()``.
+
+    If ``max_pending`` datasets are pending, all of them are run at once. Forked processes
+    start without pending operations, because the inherited ones are run by the parent.
+    """
+
+    def __init__(self, window=1.0, max_pending=10000, on_superseded=None, clock=time.monotonic):
+        self.window = window
+        self.max_pending = max_pending
+        self.on_superseded = on_superseded
+        self.clock = clock
+
+        self._reset()
+
+    def _reset(self):
+        # dataset id -> (due time, func, args), in the order of the due times
+        self._pending = collections.OrderedDict()
+        self._condition = threading.Condition()
+        self._flush_all = False
+        self._thread = None
+        self._pid = os.getpid()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _ensure_started(self):
+        """
+        Drops the state inherited from a parent process and starts the background thread
+        on first use.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='searchindexhook-coalescer')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def submit(self, key, func, *args):
+        """
+        Holds ``func(*args)`` as the pending operation of the given dataset id.
+        """
+        with self._condition:
+            self._ensure_started()
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = (self.clock() + self.window, func, args)
+                if len(self._pending) >= self.max_pending:
+                    self._flush_all = True
+                self._condition.notify()
+                return
+            self._pending[key] = (pending[0], func, args)
+        if self.on_superseded is not None:
+            self.on_superseded()
+
+    def _take_due(self):
+        """
+        Removes and returns the operations whose window has passed, all of them if the
+        limit of pending operations was reached.
+        """
+        now = self.clock()
+        due = []
+        while self._pending:
+            key, (due_time, func, args) = next(iter(self._pending.items()))
+            if due_time > now and not self._flush_all:
+                break
+            del self._pending[key]
+            due.append((func, args))
+        self._flush_all = False
+        return due
+
+    def _run(self):
+        while True:
+            with self._condition:
+                due = self._take_due()
+                while not due:
+                    if self._pending:
+                        self._condition.wait(max(next(iter(self._pending.values()))[0] - self.clock(), 0))
+                    else:
+                        self._condition.wait()
+                    due = self._take_due()
+            self._execute(due)
+
+    @staticmethod
+    def _execute(operations):
+        for func, args in operations:
+            try:
+                func(*args)
+            except Exception as error:  # pylint: disable=broad-except
+                LOGGER.error('Coalesced index operation failed: %s', error)
+
+    def flush(self):
+        """
+        Runs all pending operations of the current process in the calling thread.
+        """
+        with self._condition:
+            if self._pid != os.getpid():
+                return
+            operations = [(func, args) for _, func, args in self._pending.values()]
+            self._pending.clear()
+        self._execute(operations)
@@ -0,0 +1,103 @@
+"""
+Module for the validated snapshot of the search index configuration.
+"""
+import collections
+
+from ckan.plugins import toolkit as tk
+
+# attribute of the plugin holding the snapshot
+SNAPSHOT_ATTRIBUTE = 'index_config'
+
+
+def with_trailing_slash(value):
+    """
+    Returns the string with a trailing slash, or None for values which are not strings.
+    """
+    if not isinstance(value, str):
+        return None
+    return value if value.endswith('/') else value + '/'
+
+
+class ConfigOption:
+    """
+    Plugin attribute holding a raw configuration value, read from the CKAN configuration
+    when the class is created. Assigning a value drops the configuration snapshot of the
+    plugin, so it is built again from the new value.
+    """
+
+    def __init__(self, key, default=False):
+        self.key = key
+        self.default = default
+        self.value = tk.config.get(key, default)
+        self.attribute = None
+
+    def __set_name__(self, owner, name):
+        self.attribute = '_' + name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self.value
+        return instance.__dict__.get(self.attribute, self.value)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.attribute] = value
+        instance.__dict__[SNAPSHOT_ATTRIBUTE] = None
+
+    def reload(self, instance):
+        """
+        Reads the value of the plugin again from the CKAN configuration.
+        """
+        self.__set__(instance, tk.config.get(self.key, self.default))
+
+
+def reload_options(instance):
+    """
+    Reads all options of an instance again from the CKAN configuration.
+    """
+    for cls in type(instance).__mro__:
+        for option in vars(cls).values():
+            if isinstance(option, ConfigOption):
+                option.reload(instance)
+
+
+class IndexConfig(collections.namedtuple('IndexConfig', [
+        'endpoint', 'auth', 'indexable_data_types', 'indexable_data_type_set',
+        'targetlink_url_base_path', 'index_name', 'error'])):
+    """
+    Immutable snapshot of the search index configuration with the values prepared for the
+    hook calls: normalized URLs, the auth tuple of the credentials and the indexable data
+    types as a tuple in configured order and as a frozenset.
+
+    Values which are not configured are None. ``error`` holds the AssertionError of the
+    validation, if any.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, endpoint, credentials, indexable_data_types, targetlink_url_base_path, index_name,
+              error=None):
+        """
+        Returns the snapshot of the given raw configuration values.
+        """
+        auth = None
+        if isinstance(credentials, str) and len(credentials.split(':')) == 2:
+            auth = tuple(credentials.split(':'))
+        data_types = ()
+        if isinstance(indexable_data_types, str):
+            data_types = tuple(x.strip() for x in indexable_data_types.split(','))
+        return cls(
+            endpoint=with_trailing_slash(endpoint),
+            auth=auth,
+            indexable_data_types=data_types,
+            indexable_data_type_set=frozenset(data_types),
+            targetlink_url_base_path=with_trailing_slash(targetlink_url_base_path),
+            index_name=index_name,
+            error=error
+        )
+
+    def assert_valid(self):
+        """
+        Raises the AssertionError of the validation, if the configuration is invalid.
+        """
+        if self.error is not None:
+            raise AssertionError(*self.error.args)
@@ -0,0 +1,145 @@
+"""
+Module for normalizing the date strings of harvested datasets.
+"""
+import collections
+import datetime
+import re
+import threading
+
+from dateutil.parser import parse
+
+NORMALIZED_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# formats equal to govdata-DateUtil Java class
+DATE_FORMATS = [
+    "yyyy-MM-dd'T'HH:mm:ssX",
+    "yyyy-MM-dd'T'HH:mm:ssz",
+    "yyyy-MM-dd'T'HH:mm:ss",
+    "yyyy-MM-dd HH:mm:ssX",
+    "yyyy-MM-dd HH:mm:ssz",
+    "yyyy-MM-dd HH:mm:ss X",
+    "yyyy-MM-dd HH:mm:ss z",
+    "yyyy-MM-dd HH:mm:ss",
+    "yyyy-MM-dd",
+    "dd.MM.yyyy'T'HH:mm:ssX",
+    "dd.MM.yyyy'T'HH:mm:ssz",
+    "dd.MM.yyyy'T'HH:mm:ss",
+    "dd.MM.yyyy HH:mm:ss",
+    "dd.MM.yyyy"
+]
+
+DATE_NOTATION_TRANSLATIONS = [
+    ["yyyy", "%Y"],
+    ["MM", "%m"],
+    ["dd", "%d"],
+    ["HH", "%H"],
+    ["mm", "%M"],
+    ["ss", "%S"],
+    ["'T'", "T"],
+    ["z", "%Z"],
+    ["X", "%z"]
+]
+
+# The shape of a date string is determined by its date part and the character following
+# it. Only the formats which can match a shape are tried; strings of any other shape are
+# tried against all formats.
+SHAPE_PATTERN = re.compile(
+    r'^(?:(?P<iso>\d{4}-\d{2}-\d{2})|(?P<german>\d{2}\.\d{2}\.\d{4}))'
+    r'(?:(?P<end>\Z)|(?P<time>[Tt])|(?P<space>\s))'
+)
+
+
+def transform_date_notation(notation):
+    """
+    Transforms a date notation of the Java class into a strptime format
+    """
+    for translation in DATE_NOTATION_TRANSLATIONS:
+        notation = notation.replace(
+            translation[0],
+            translation[1]
+        )
+
+    return notation
+
+
+STRPTIME_FORMATS = [transform_date_notation(dateformat) for dateformat in DATE_FORMATS]
+
+FORMATS_BY_SHAPE = {
+    ('iso', 'time'): STRPTIME_FORMATS[0:3],
+    ('iso', 'space'): STRPTIME_FORMATS[3:8],
+    ('iso', 'end'): STRPTIME_FORMATS[8:9],
+    ('german', 'time'): STRPTIME_FORMATS[9:12],
+    ('german', 'space'): STRPTIME_FORMATS[12:13],
+    ('german', 'end'): STRPTIME_FORMATS[13:14],
+}
+
+
+def candidate_formats(datestr):
+    """
+    Returns the strptime formats which can match the given date string, in the order of
+    the format table.
+    """
+    match = SHAPE_PATTERN.match(datestr)
+    if match is None:
+        return STRPTIME_FORMATS
+    family = 'iso' if match.group('iso') else 'german'
+    separator = next(name for name in ('end', 'time', 'space') if match.group(name) is not None)
+    return FORMATS_BY_SHAPE[(family, separator)]
+
+
+def parse_date(datestr):
+    """
+    Normalizes a date string without memoization. Raises a ValueError for strings which
+    are no valid date.
+    """
+    for dateformat in candidate_formats(datestr):
+        try:
+            parseddate = datetime.datetime.strptime(datestr, dateformat)
+
+            return parseddate.strftime(NORMALIZED_DATE_FORMAT)
+        except ValueError:
+            pass
+
+    # Use dateutil as fallback, e.g. for time offset with colon: +02:00
+    parseddate = parse(datestr)
+    return parseddate.strftime(NORMALIZED_DATE_FORMAT)
+
+
+class DateNormalizer:
+    """
+    Normalizes date strings into NORMALIZED_DATE_FORMAT and remembers the results for the
+    most recently used strings, because harvested dates repeat heavily. Invalid strings
+    are remembered as well and raise the same ValueError again.
+    """
+
+    def __init__(self, cache_size=10000):
+        self.cache_size = cache_size
+        self._results = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def normalize(self, datestr):
+        """
+        Returns the normalized date string.
+        """
+        with self._lock:
+            result = self._results.get(datestr)
+            if result is not None:
+                self._results.move_to_end(datestr)
+        if result is None:
+            try:
+                result = parse_date(datestr)
+            except ValueError as error:
+                result = error
+            self._remember(datestr, result)
+
+        if isinstance(result, ValueError):
+            raise result.with_traceback(None)
+        return result
+
+    def _remember(self, datestr, result):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._results[datestr] = result
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
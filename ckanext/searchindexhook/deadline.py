@@ -0,0 +1,102 @@
+"""
+Module for the time budget of a hook call. The deadline is kept per thread, so the code
+on the way from the hook to the HTTP client checks it without passing it around.
+"""
+import contextlib
+import threading
+import time
+
+import requests
+
+_local = threading.local()
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    Raised when the time budget of a hook call is used up before ``stage``. It is a
+    Timeout, so the operation is handled like one to an endpoint not responding in time.
+    """
+
+    def __init__(self, stage, budget):
+        super().__init__('Time budget of {budget}s used up before {stage}'.format(budget=budget, stage=stage))
+        self.stage = stage
+        self.budget = budget
+
+
+class Deadline:
+    """
+    Point in time at which the work of a hook call has to be done.
+    """
+
+    def __init__(self, budget, clock=time.monotonic):
+        self.budget = budget
+        self.clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self):
+        """
+        Returns the seconds left, negative if the deadline has passed.
+        """
+        return self.expires_at - self.clock()
+
+    def check(self, stage):
+        """
+        Raises DeadlineExceeded if no time is left for the given stage.
+        """
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(stage, self.budget)
+
+
+@contextlib.contextmanager
+def deadline(budget, clock=time.monotonic):
+    """
+    Sets a deadline ``budget`` seconds from now for the enclosed block in the calling
+    thread. A nested deadline can only shorten an outer one.
+    """
+    outer = current()
+    inner = Deadline(budget, clock)
+    if outer is not None and outer.expires_at <= inner.expires_at:
+        inner = outer
+    _local.deadline = inner
+    try:
+        yield inner
+    finally:
+        _local.deadline = outer
+
+
+def current():
+    """
+    Returns the deadline of the calling thread or None.
+    """
+    return getattr(_local, 'deadline', None)
+
+
+def check(stage):
+    """
+    Raises DeadlineExceeded if the deadline of the calling thread has passed.
+    """
+    active = current()
+    if active is not None:
+        active.check(stage)
+
+
+def remaining():
+    """
+    Returns the seconds left until the deadline of the calling thread or None.
+    """
+    active = current()
+    return None if active is None else active.remaining()
+
+
+def bound_timeout(timeout, stage):
+    """
+    Returns the (connect, read) timeout tuple limited to the seconds left until the
+    deadline of the calling thread. Raises DeadlineExceeded if no time is left.
+    """
+    active = current()
+    if active is None:
+        return timeout
+    active.check(stage)
+    left = active.remaining()
+    connect_timeout, read_timeout = timeout
+    return min(connect_timeout, left), min(read_timeout, left)
@@ -0,0 +1,159 @@
+"""
+Module for detecting index documents which did not change since they were last sent.
+"""
+import collections
+import hashlib
+import importlib
+import json
+import logging
+import threading
+
+from ckanext.searchindexhook.storage import connect, prepare_database
+
+LOGGER = logging.getLogger(__name__)
+
+
+def document_digest(document):
+    """
+    Returns a stable digest of an index document.
+    """
+    serialized = json.dumps(document, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class MemoryDigestStore:
+    """
+    Keeps the digests of the current process in a bounded LRU map. Only suitable if CKAN
+    runs in a single process: with several processes, a process which did not send the
+    latest state of a dataset skips a document it considers unchanged.
+    """
+
+    def __init__(self, path=None, max_size=100000):  # pylint: disable=unused-argument
+        self.max_size = max_size
+        self._digests = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, package_id):
+        """Returns the digest of the last sent document of a dataset or None."""
+        with self._lock:
+            digest = self._digests.get(package_id)
+            if digest is not None:
+                self._digests.move_to_end(package_id)
+            return digest
+
+    def set(self, package_id, digest):
+        """Stores the digest of the last sent document of a dataset."""
+        with self._lock:
+            self._digests[package_id] = digest
+            self._digests.move_to_end(package_id)
+            while len(self._digests) > self.max_size:
+                self._digests.popitem(last=False)
+
+    def remove(self, package_id):
+        """Removes the digest of a dataset."""
+        with self._lock:
+            self._digests.pop(package_id, None)
+
+
+class SqliteDigestStore:
+    """
+    Keeps the digests in a SQLite database shared by all processes of a host.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        prepare_database(path, [
+            'CREATE TABLE IF NOT EXISTS digests (package_id TEXT PRIMARY KEY, digest TEXT NOT NULL)'
+        ])
+
+    def get(self, package_id):
+        """Returns the digest of the last sent document of a dataset or None."""
+        with connect(self.path) as connection:
+            row = connection.execute(
+                'SELECT digest FROM digests WHERE package_id = ?', (str(package_id),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, package_id, digest):
+        """Stores the digest of the last sent document of a dataset."""
+        with connect(self.path) as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO digests (package_id, digest) VALUES (?, ?)',
+                (str(package_id), digest)
+            )
+
+    def remove(self, package_id):
+        """Removes the digest of a dataset."""
+        with connect(self.path) as connection:
+            connection.execute('DELETE FROM digests WHERE package_id = ?', (str(package_id),))
+
+
+DIGEST_STORES = {
+    'memory': MemoryDigestStore,
+    'sqlite': SqliteDigestStore,
+}
+
+
+def load_digest_store(backend, path):
+    """
+    Creates the digest store for the configured backend. Besides 'memory' and 'sqlite' a
+    class can be given as 'package.module:ClassName'; it is instantiated with the path.
+    Raises a ValueError if the sqlite backend is configured without a path.
+    """
+    if backend == 'sqlite' and not path:
+        raise ValueError('The sqlite digest backend requires ckan.searchindexhook.digest.path')
+    if backend in DIGEST_STORES:
+        return DIGEST_STORES[backend](path)
+    module_name, class_name = backend.split(':', 1)
+    return getattr(importlib.import_module(module_name), class_name)(path)
+
+
+class ChangeDetector:
+    """
+    Decides whether a document has to be sent and counts sent and skipped documents.
+
+    The digest is stored as soon as a document is considered changed; callers have to
+    forget it again if the document could not be delivered. Errors of the store are logged
+    and the document is considered changed, so they never prevent a document from being
+    sent.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+
+    def has_changed(self, package_id, document):
+        """
+        Returns False if the same document was already sent for the dataset.
+        """
+        digest = document_digest(document)
+        try:
+            changed = self.store.get(package_id) != digest
+            if changed:
+                self.store.set(package_id, digest)
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.warning('Reading or writing the digest store failed: %s', error)
+            changed = True
+        with self._lock:
+            self.stats['sent' if changed else 'skipped'] += 1
+        return changed
+
+    def is_known(self, package_id):
+        """
+        Returns True if a digest of a sent document of the dataset is stored.
+        """
+        try:
+            return self.store.get(package_id) is not None
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.warning('Reading the digest store failed: %s', error)
+            return False
+
+    def forget(self, package_id):
+        """
+        Removes the digest of a dataset, so its next document is sent in any case.
+        """
+        try:
+            self.store.remove(package_id)
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.warning('Writing the digest store failed: %s', error)
@@ -0,0 +1,136 @@
+"""
+Module for sending index operations in background threads.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+
+from ckanext.searchindexhook import deadline
+
+LOGGER = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AsyncDispatcher:
+    """
+    Runs index operations in a pool of worker threads. Every worker owns a bounded queue
+    and all operations for the same dataset id are routed to the same worker, so a later
+    operation never overtakes an earlier one for the same dataset.
+
+    If the queue of a worker is full, submitting blocks for up to ``enqueue_timeout``
+    seconds (forever if 0), at most until the deadline of the calling thread, and raises
+    ``queue.Full`` afterwards.
+    """
+
+    def __init__(self, workers=4, queue_size=1000, enqueue_timeout=30.0):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.enqueue_timeout = enqueue_timeout or None
+
+        self._queues = []
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        """
+        Starts the worker threads on first use and again in a forked process.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._queues = [queue.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+            self._threads = []
+            for index, work_queue in enumerate(self._queues):
+                thread = threading.Thread(
+                    target=self._run, args=(work_queue,), name='searchindexhook-worker-{0}'.format(index)
+                )
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+            self._pid = pid
+
+    def submit(self, key, func, *args):
+        """
+        Queues ``func(*args)`` on the worker responsible for the given dataset id.
+        """
+        self._ensure_started()
+        index = zlib.crc32(str(key).encode('utf-8')) % self.workers
+        timeout = self.enqueue_timeout
+        left = deadline.remaining()
+        if left is not None:
+            timeout = max(min(timeout or left, left), 0)
+        self._queues[index].put((func, args), timeout=timeout)
+
+    def offer(self, key, func, *args):
+        """
+        Queues ``func(*args)`` like ``submit`` without waiting for space in a full queue.
+        Returns False if the operation was not queued.
+        """
+        self._ensure_started()
+        index = zlib.crc32(str(key).encode('utf-8')) % self.workers
+        try:
+            self._queues[index].put_nowait((func, args))
+        except queue.Full:
+            return False
+        return True
+
+    def pending(self):
+        """
+        Returns the number of queued operations of the current process.
+        """
+        if self._pid != os.getpid():
+            return 0
+        return sum(work_queue.qsize() for work_queue in self._queues)
+
+    @staticmethod
+    def _run(work_queue):
+        while True:
+            item = work_queue.get()
+            try:
+                if item is _STOP:
+                    return
+                func, args = item
+                try:
+                    func(*args)
+                except Exception as error:  # pylint: disable=broad-except
+                    LOGGER.error('Asynchronous index operation failed: %s', error)
+            finally:
+                work_queue.task_done()
+
+    def drain(self, timeout=30.0):
+        """
+        Lets the workers finish all queued operations and stops them. Returns the
+        (func, args) pairs of the operations which were not started within the timeout.
+        """
+        if self._pid != os.getpid():
+            return []
+        with self._lock:
+            drain_until = time.monotonic() + timeout
+            for work_queue in self._queues:
+                try:
+                    work_queue.put(_STOP, timeout=max(0, drain_until - time.monotonic()))
+                except queue.Full:
+                    pass
+            for thread in self._threads:
+                thread.join(max(0, drain_until - time.monotonic()))
+            remaining = []
+            for work_queue in self._queues:
+                while True:
+                    try:
+                        item = work_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        remaining.append(item)
+            if remaining:
+                LOGGER.warning('%s index operations were not sent before shutdown', len(remaining))
+            self._pid = None
+            return remaining
@@ -0,0 +1,72 @@
+"""
+Module mapping the extras of a dataset to the fields of the search index metadata.
+"""
+import functools
+
+HANDLER_COPY = 'copy'
+HANDLER_JSON_LIST = 'json_list'
+HANDLER_DATE = 'date'
+HANDLER_MODIFIED = 'modified'
+HANDLER_SPATIAL = 'spatial'
+HANDLER_SPATIAL_BBOX = 'spatial_bbox'
+HANDLER_SPATIAL_CENTROID = 'spatial_centroid'
+HANDLER_APPLICABLE_LEGISLATION = 'applicable_legislation'
+HANDLER_HVD_CATEGORY = 'hvd_category'
+
+# extras key -> (handler, metadata field)
+EXTRAS_MAPPING = {
+    # geo data
+    'spatial': (HANDLER_SPATIAL, None),
+    'spatial_bbox': (HANDLER_SPATIAL_BBOX, None),
+    'spatial_centroid': (HANDLER_SPATIAL_CENTROID, None),
+    # time coverage for easier search
+    'temporal_start': (HANDLER_DATE, 'temporal_start'),
+    'temporal_end': (HANDLER_DATE, 'temporal_end'),
+    # dct:issued and dct:modified attributes
+    'issued': (HANDLER_DATE, 'dct_issued'),
+    'modified': (HANDLER_MODIFIED, 'dct_modified'),
+    # high value datasets
+    'applicable_legislation': (HANDLER_APPLICABLE_LEGISLATION, None),
+    'hvd_category': (HANDLER_HVD_CATEGORY, None),
+    # contact, publisher info and geocoding information for metadata quality dashboard
+    'contact_name': (HANDLER_COPY, 'contact_name'),
+    'contact_email': (HANDLER_COPY, 'contact_email'),
+    'maintainer_tel': (HANDLER_COPY, 'maintainer_tel'),
+    'publisher_name': (HANDLER_COPY, 'publisher_name'),
+    'politicalGeocodingLevelURI': (HANDLER_COPY, 'politicalGeocodingLevelURI'),
+    # list values
+    'contributorID': (HANDLER_JSON_LIST, 'contributorID'),
+    'geocodingText': (HANDLER_JSON_LIST, 'geocodingText'),
+    'politicalGeocodingURI': (HANDLER_JSON_LIST, 'politicalGeocodingURI'),
+}
+
+
+def build_extras_mapping(copy_keys=(), list_keys=()):
+    """
+    Returns the mapping of extras keys to handlers, extended by additional keys whose
+    values are copied or parsed as JSON lists into a metadata field of the same name.
+    """
+    mapping = dict(EXTRAS_MAPPING)
+    for key in copy_keys:
+        mapping[key] = (HANDLER_COPY, key)
+    for key in list_keys:
+        mapping[key] = (HANDLER_JSON_LIST, key)
+    return mapping
+
+
+def compile_extras_mapping(mapping, handlers):
+    """
+    Compiles a mapping of extras keys to handler names into a dispatch table of extras
+    keys to functions called as ``func(metadata_dict=..., extra=...)``. ``handlers`` maps
+    the handler names to such functions, which also get the metadata ``field`` if the
+    mapping names one. Raises a ValueError for unknown handler names.
+    """
+    table = {}
+    for key, (handler_name, field) in mapping.items():
+        if handler_name not in handlers:
+            raise ValueError('Unknown handler {handler} for extras key {key}'.format(
+                handler=handler_name, key=key
+            ))
+        handler = handlers[handler_name]
+        table[key] = handler if field is None else functools.partial(handler, field=field)
+    return table
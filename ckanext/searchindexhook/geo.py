@@ -0,0 +1,209 @@
+"""
+Module for deriving the spatial fields of the index document from one parsed geometry.
+"""
+import collections
+import json
+import logging
+import threading
+
+import numpy
+import shapely
+from area import area
+from shapely.geometry import shape
+
+LOGGER = logging.getLogger(__name__)
+
+BOUNDINGBOX_FULL = 'full'
+BOUNDINGBOX_SIMPLIFY = 'simplify'
+BOUNDINGBOX_ENVELOPE = 'envelope'
+BOUNDINGBOX_MODES = (BOUNDINGBOX_FULL, BOUNDINGBOX_SIMPLIFY, BOUNDINGBOX_ENVELOPE)
+
+# length of one degree of latitude, used to convert tolerances in metres into degrees
+METRES_PER_DEGREE = 111320.0
+
+
+def coordinate_list(coordinate_sequence):
+    """
+    Converts a shapely coordinate sequence into a list of [x, y] lists of floats.
+    """
+    return numpy.asarray(coordinate_sequence).tolist()
+
+
+def geometry_coordinates(geometry):
+    """
+    Returns the GeoJSON coordinates of a shapely geometry as nested lists, equal to
+    dumping and loading its __geo_interface__ as JSON, but without the tuple copies.
+    """
+    if geometry.is_empty:
+        return []
+    if geometry.geom_type == 'Point':
+        return coordinate_list(geometry.coords)[0]
+    if geometry.geom_type == 'Polygon':
+        return [coordinate_list(geometry.exterior.coords)] + [
+            coordinate_list(interior.coords) for interior in geometry.interiors
+        ]
+    if geometry.geom_type.startswith('Multi'):
+        return [geometry_coordinates(member) for member in geometry.geoms]
+    return coordinate_list(geometry.coords)
+
+
+def geometry_to_dict(geometry):
+    """
+    Returns a GeoJSON dict of a shapely geometry.
+    """
+    if geometry.geom_type == 'GeometryCollection':
+        return {
+            'type': geometry.geom_type,
+            'geometries': [geometry_to_dict(member) for member in geometry.geoms]
+        }
+    return {
+        'type': geometry.geom_type,
+        'coordinates': geometry_coordinates(geometry)
+    }
+
+
+def hashable_coordinates(coordinates):
+    """
+    Converts nested coordinate lists into nested tuples, which are equal exactly when the
+    lists are equal.
+    """
+    if isinstance(coordinates, list):
+        return tuple(hashable_coordinates(coordinate) for coordinate in coordinates)
+    return coordinates
+
+
+def shares_exterior_coordinates(coordinates):
+    """
+    Returns True if one of the interior rings contains more than one of the coordinates of
+    the exterior ring, counting coordinates repeated in the exterior ring repeatedly.
+
+    The exterior coordinates are counted once, so the check is linear in the number of
+    coordinates instead of comparing every exterior coordinate with every interior ring.
+    """
+    exterior_counts = collections.Counter(
+        hashable_coordinates(coordinate) for coordinate in coordinates[0]
+    )
+    for interior in coordinates[1:]:
+        interior_coordinates = {hashable_coordinates(coordinate) for coordinate in interior}
+        shared_coordinates = 0
+        for coordinate in interior_coordinates:
+            shared_coordinates += exterior_counts.get(coordinate, 0)
+            if shared_coordinates > 1:
+                return True
+    return False
+
+
+def geojson_area(spatial):
+    """
+    Calculates the geodesic area in square metres of a GeoJSON geometry. The area is at
+    least 1 for polygons with a negative area, because the results are ranked by 1/area.
+    """
+    spatial_area = area(spatial)
+    if spatial_area < 0:
+        spatial_area = 1
+
+    return spatial_area
+
+
+class BoundingBoxRepresentation:
+    """
+    Reduces the geometries stored as boundingbox of the index documents.
+
+    - full: the geometry without duplicate coordinates
+    - simplify: the geometry simplified with a tolerance in metres, preserving its topology
+    - envelope: the rectangle enclosing the geometry
+
+    With a precision the coordinates are additionally snapped to that many decimal places.
+    The number of geometries and vertices before and after the reduction are counted.
+    """
+
+    def __init__(self, mode=BOUNDINGBOX_FULL, tolerance=0.0, precision=None):
+        if mode not in BOUNDINGBOX_MODES:
+            raise ValueError('Unknown boundingbox mode {mode}, expected one of {modes}'.format(
+                mode=mode, modes=', '.join(BOUNDINGBOX_MODES)
+            ))
+        self.mode = mode
+        self.tolerance = float(tolerance)
+        self.precision = int(precision) if precision not in (None, '') else None
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def signature(self):
+        """Identifies the representation, e.g. in cache keys."""
+        return '{0}:{1}:{2}'.format(self.mode, self.tolerance, self.precision)
+
+    def reduce(self, geometry):
+        """
+        Returns the reduced shapely geometry.
+        """
+        if self.mode == BOUNDINGBOX_ENVELOPE:
+            reduced = geometry.envelope
+        elif self.mode == BOUNDINGBOX_SIMPLIFY:
+            reduced = geometry.simplify(self.tolerance / METRES_PER_DEGREE, preserve_topology=True)
+        else:
+            # remove potential duplicate coordinates using shapely
+            # https://stackoverflow.com/questions/49330030/remove-a-duplicate-point-from-polygon-in-shapely
+            reduced = geometry.simplify(0)
+
+        if self.precision is not None:
+            snapped = shapely.set_precision(reduced, 10.0 ** -self.precision)
+            # geometries smaller than the precision would collapse
+            if not snapped.is_empty:
+                reduced = snapped
+        return reduced
+
+    def to_dict(self, geometry):
+        """
+        Returns the reduced geometry as GeoJSON dict.
+        """
+        reduced = self.reduce(geometry)
+        boundingbox = geometry_to_dict(reduced)
+
+        vertices = int(shapely.get_num_coordinates(geometry))
+        reduced_vertices = int(shapely.get_num_coordinates(reduced))
+        with self._lock:
+            self.stats.update(geometries=1, vertices=vertices, reduced_vertices=reduced_vertices)
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug('Reduced {mode} boundingbox: {vertices} -> {reduced} vertices, {size} bytes'.format(
+                mode=self.mode, vertices=vertices, reduced=reduced_vertices, size=len(json.dumps(boundingbox))
+            ))
+        return boundingbox
+
+
+class SpatialFeatures:
+    """
+    Derives the bounding box, area and center of a validated GeoJSON geometry. The shapely
+    geometry is built at most once and only if one of its derived values is requested.
+    """
+
+    def __init__(self, spatial, representation=None):
+        self.spatial = spatial
+        self.representation = representation or BoundingBoxRepresentation()
+        self._geometry = None
+
+    @property
+    def geometry(self):
+        """The shapely geometry of the GeoJSON object."""
+        if self._geometry is None:
+            self._geometry = shape(self.spatial)
+        return self._geometry
+
+    def boundingbox(self):
+        """
+        Returns the geometry in the configured representation as GeoJSON dict.
+        """
+        return self.representation.to_dict(self.geometry)
+
+    def area(self):
+        """
+        Returns the area covered by the geometry.
+        """
+        return geojson_area(self.spatial)
+
+    def center(self):
+        """
+        Returns the centroid of the geometry as (x, y).
+        """
+        centroid = self.geometry.centroid
+        return centroid.x, centroid.y
@@ -0,0 +1,180 @@
+"""
+Module for sharing the spatial fields derived from identical GeoJSON values between
+datasets.
+"""
+import collections
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from ckanext.searchindexhook.storage import connect, prepare_database
+
+LOGGER = logging.getLogger(__name__)
+
+# estimated bytes of an entry besides the cached result
+ENTRY_OVERHEAD = 200
+
+
+def spatial_key(kind, value):
+    """
+    Returns the cache key of a raw GeoJSON value of an extra.
+    """
+    return hashlib.sha256('{0}\0{1}'.format(kind, value).encode('utf-8')).hexdigest()
+
+
+def entry_size(serialized):
+    """
+    Returns the estimated bytes of a cached result from its JSON representation, or the
+    message of an error, plus the overhead of an entry.
+    """
+    return len(serialized) + ENTRY_OVERHEAD
+
+
+class SqliteSpatialStore:
+    """
+    Keeps derived spatial fields as JSON in a SQLite database, so they survive worker
+    restarts.
+    The database holds at most ``max_entries`` entries (unlimited if 0); beyond that the
+    least recently used ones are removed.
+    """
+
+    def __init__(self, path, max_entries=100000, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.clock = clock
+        prepare_database(path, [
+            'CREATE TABLE IF NOT EXISTS spatial ('
+            ' key TEXT PRIMARY KEY,'
+            ' derived TEXT NOT NULL,'
+            ' used REAL NOT NULL)',
+            'CREATE INDEX IF NOT EXISTS spatial_used ON spatial (used)'
+        ])
+
+    def get(self, key):
+        """Returns the JSON of the derived fields stored for a key or None."""
+        with connect(self.path) as connection:
+            row = connection.execute('SELECT derived FROM spatial WHERE key = ?', (key,)).fetchone()
+            if row:
+                connection.execute('UPDATE spatial SET used = ? WHERE key = ?', (self.clock(), key))
+        return row[0] if row else None
+
+    def set(self, key, serialized):
+        """Stores the JSON of the derived fields for a key and removes the least recently used entries."""
+        with connect(self.path) as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO spatial (key, derived, used) VALUES (?, ?, ?)',
+                (key, serialized, self.clock())
+            )
+            if self.max_entries > 0:
+                excess = connection.execute('SELECT COUNT(*) FROM spatial').fetchone()[0] - self.max_entries
+                if excess > 0:
+                    connection.execute(
+                        'DELETE FROM spatial WHERE key IN'
+                        ' (SELECT key FROM spatial ORDER BY used LIMIT ?)',
+                        (excess,)
+                    )
+
+    def __len__(self):
+        with connect(self.path) as connection:
+            return connection.execute('SELECT COUNT(*) FROM spatial').fetchone()[0]
+
+
+class SpatialCache:
+    """
+    Bounded LRU cache of the spatial fields derived from raw GeoJSON values, keyed by a
+    digest of the value. The memory use is limited by the number of entries and by the
+    summed size of the cached results.
+
+    Values which could not be derived are remembered with their error in memory only. An
+    optional store keeps the derived fields on disk as a second tier.
+
+    The cached dicts are shared by all documents with the same value and must not be
+    modified.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=33554432, store=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.store = store
+        self.stats = collections.Counter()
+
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_or_derive(self, kind, value, derive):
+        """
+        Returns the fields derived from a raw value by ``derive(value)``, calling it only if
+        the value is not cached. Errors of ``derive`` are raised again for the same value.
+        """
+        key = spatial_key(kind, value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+            else:
+                self.stats['misses'] += 1
+
+        if entry is None:
+            # the JSON of a result is built once, for its size and for the store
+            serialized = self._load(key)
+            if serialized is not None:
+                result = json.loads(serialized)
+            else:
+                try:
+                    result = derive(value)
+                except Exception as error:  # pylint: disable=broad-except
+                    result = error
+                    serialized = str(error)
+                else:
+                    serialized = json.dumps(result)
+                    if result is not None:
+                        self._save(key, serialized)
+            entry = (result, entry_size(serialized))
+            self._remember(key, entry)
+
+        result = entry[0]
+        if isinstance(result, Exception):
+            raise result.with_traceback(None)
+        return result
+
+    def _load(self, key):
+        if self.store is None:
+            return None
+        try:
+            serialized = self.store.get(key)
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.warning('Reading the spatial cache failed: %s', error)
+            return None
+        if serialized is not None:
+            with self._lock:
+                self.stats['disk_hits'] += 1
+        return serialized
+
+    def _save(self, key, serialized):
+        if self.store is None:
+            return
+        try:
+            self.store.set(key, serialized)
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.warning('Writing the spatial cache failed: %s', error)
+
+    def _remember(self, key, entry):
+        if self.max_entries <= 0 or entry[1] > self.max_bytes:
+            return
+        with self._lock:
+            former = self._entries.pop(key, None)
+            if former is not None:
+                self._size -= former[1]
+            self._entries[key] = entry
+            self._size += entry[1]
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted[1]
+                self.stats['evictions'] += 1
+
+    def __len__(self):
+        return len(self._entries)
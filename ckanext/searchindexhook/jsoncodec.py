@@ -0,0 +1,100 @@
+"""
+Module providing the JSON encoding and decoding of the search index hook, backed by the json
+module of the standard library or optionally by orjson or ujson.
+"""
+import json
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+BACKEND_AUTO = 'auto'
+BACKEND_ORJSON = 'orjson'
+BACKEND_UJSON = 'ujson'
+BACKEND_JSON = 'json'
+
+
+class JsonCodec:
+    """
+    Encodes to and decodes from JSON strings. The output of the backends differs in
+    whitespace and escaping, but decodes to the same values. Decoding errors are
+    ValueErrors for all backends.
+    """
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return 'JsonCodec({0})'.format(self.name)
+
+
+def _orjson_dumps(value):
+    return orjson.dumps(value).decode('utf-8')
+
+
+def _ujson_dumps(value):
+    return ujson.dumps(value, ensure_ascii=False, escape_forward_slashes=False)
+
+
+def _fall_back(func, fallback, errors):
+    """
+    Returns a function calling ``func`` and ``fallback`` for values ``func`` rejects with
+    one of ``errors``, e.g. NaN or integers beyond 64 bits, which the json module handles.
+    """
+    def call(value):
+        try:
+            return func(value)
+        except errors:
+            return fallback(value)
+    return call
+
+
+def available_backends():
+    """
+    Returns the names of the installed backends, fastest first.
+    """
+    backends = []
+    if orjson is not None:
+        backends.append(BACKEND_ORJSON)
+    if ujson is not None:
+        backends.append(BACKEND_UJSON)
+    backends.append(BACKEND_JSON)
+    return backends
+
+
+def load_codec(backend=BACKEND_JSON):
+    """
+    Returns the codec of the given backend. 'auto' selects the fastest installed one.
+    Values which orjson or ujson reject are handled by the json module, so every backend
+    accepts what the json module accepts. Raises a ValueError for backends which are
+    unknown or not installed.
+    """
+    if backend == BACKEND_AUTO:
+        backend = available_backends()[0]
+    if backend not in available_backends():
+        raise ValueError('JSON backend {backend} is not available, installed are {backends}'.format(
+            backend=backend, backends=', '.join(available_backends())
+        ))
+
+    if backend == BACKEND_ORJSON:
+        return JsonCodec(
+            backend, _fall_back(orjson.loads, json.loads, ValueError),
+            _fall_back(_orjson_dumps, json.dumps, TypeError)
+        )
+    if backend == BACKEND_UJSON:
+        return JsonCodec(
+            backend, _fall_back(ujson.loads, json.loads, ValueError),
+            _fall_back(_ujson_dumps, json.dumps, (TypeError, OverflowError))
+        )
+    return JsonCodec(backend, json.loads, json.dumps)
@@ -0,0 +1,92 @@
+"""
+Module for the periodically refreshed openness of the licenses known to CKAN.
+"""
+import logging
+import os
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LicenseOpennessCache:
+    """
+    Holds the mapping from license ids to the "is-open" flag returned by ``loader``. After
+    ``ttl`` seconds the mapping is reloaded in a background thread, while lookups keep
+    getting the former mapping without waiting. If loading fails, the last loaded mapping
+    is kept and the load is retried after ``retry_interval`` seconds.
+
+    A ``ttl`` of 0 disables the refresh once a mapping was loaded. The mapping is replaced
+    as a whole and never modified, so it can be read without a lock.
+    """
+
+    def __init__(self, loader, ttl=3600.0, retry_interval=60.0):
+        self.loader = loader
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.openness_map = {}
+        self.loaded = False
+
+        self._expires = 0.0
+        self._refresh_lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def load(self):
+        """
+        Loads the mapping in the calling thread. Returns whether loading succeeded.
+        """
+        try:
+            openness_map = self.loader()
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.warning('Could not load license list for openness calculation! Details: %s', error)
+            self._expires = time.monotonic() + self.retry_interval
+            return False
+        self.set(openness_map)
+        return True
+
+    def set(self, openness_map):
+        """
+        Replaces the mapping, which is kept until the TTL has passed.
+        """
+        self.openness_map = openness_map
+        self.loaded = True
+        self._expires = time.monotonic() + self.ttl
+
+    def get(self):
+        """
+        Returns the current mapping and starts a background refresh if it is expired.
+        """
+        if (self.ttl > 0 or not self.loaded) and time.monotonic() >= self._expires:
+            self.refresh_in_background()
+        return self.openness_map
+
+    def refresh_in_background(self):
+        """
+        Starts loading the mapping in a background thread, unless a refresh is running.
+        """
+        self._check_fork()
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        # no further refreshes are started while this one runs
+        self._expires = time.monotonic() + self.retry_interval
+        try:
+            threading.Thread(target=self._refresh, name='searchindexhook-licenses', daemon=True).start()
+        except RuntimeError as error:
+            self._refresh_lock.release()
+            LOGGER.warning('Could not start the license refresh: %s', error)
+
+    def _refresh(self):
+        try:
+            if self.load():
+                LOGGER.debug('Refreshed the openness of %d licenses', len(self.openness_map))
+        finally:
+            self._refresh_lock.release()
+
+    def _check_fork(self):
+        """
+        Drops the refresh lock inherited from the parent process, whose refresh thread
+        does not exist in a forked process.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._refresh_lock = threading.Lock()
@@ -0,0 +1,233 @@
+"""
+Module for the latency and throughput metrics of the search index hook, exposed in the
+Prometheus text format.
+"""
+import bisect
+import contextlib
+import logging
+import os
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_PARSE = 'parse'
+STAGE_RESOURCES = 'resources'
+STAGE_EXTRAS = 'extras'
+STAGE_GEO = 'geo'
+STAGE_SERIALIZE = 'serialize'
+STAGE_DELETE = 'http_delete'
+STAGE_POST = 'http_post'
+
+# upper bounds in seconds, from 50 microseconds to 10 seconds
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0
+)
+
+STAGE_HISTOGRAM = (
+    'searchindexhook_stage_duration_seconds', 'Duration of the processing stages of a document'
+)
+
+# counter -> (metric name, help, label name)
+COUNTERS = {
+    'sent': (
+        'searchindexhook_documents_sent_total', 'Documents sent to the search index', None
+    ),
+    'skipped': (
+        'searchindexhook_documents_skipped_total', 'Documents not sent to the search index', 'reason'
+    ),
+    'failed': (
+        'searchindexhook_delivery_errors_total', 'Index operations which could not be delivered', 'error'
+    ),
+    'bytes_sent': (
+        'searchindexhook_bytes_sent_total', 'Request body bytes sent to the search index', None
+    ),
+    'retried': (
+        'searchindexhook_retries_total', 'Requests retried after a transient status', 'status'
+    ),
+    'coalesced': (
+        'searchindexhook_operations_coalesced_total', 'Operations replaced by a later one', None
+    ),
+    'aborted': (
+        'searchindexhook_deadline_aborts_total', 'Hook calls aborted at the deadline, by stage', 'stage'
+    ),
+    'circuit': (
+        'searchindexhook_circuit_transitions_total', 'State changes of the endpoint circuit breaker', 'state'
+    ),
+}
+
+
+def escape_label(value):
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value):
+    """
+    Formats a sample value, integral values without a fraction.
+    """
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Metrics:
+    """
+    Collects stage durations in histograms with fixed buckets and counters of the sent
+    documents of the current process. Recording takes a lock for a few dict operations
+    only; if disabled, nothing is recorded.
+
+    Optionally the metrics are written to a file, e.g. for the textfile collector of the
+    node exporter, at most every ``write_interval`` seconds. A ``{pid}`` in the path is
+    replaced by the process id, so every worker writes its own file.
+
+    The stage durations of a single call can be traced in the calling thread, also if the
+    metrics are disabled.
+    """
+
+    def __init__(self, enabled=True, path=None, write_interval=15.0, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.path = path
+        self.write_interval = write_interval
+        self.buckets = tuple(buckets)
+
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_write = time.monotonic() + write_interval
+
+    def observe(self, stage, seconds):
+        """
+        Records the duration of a stage.
+        """
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace[stage] = trace.get(stage, 0.0) + seconds
+        if not self.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                # bucket counts, followed by the count of values above all buckets
+                histogram = self._histograms[stage] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        """
+        Records the duration of the enclosed block as a stage, also if it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def tracing(self):
+        """
+        Yields a dict which collects the summed durations per stage recorded by the
+        enclosed block in the current thread.
+        """
+        outer = getattr(self._local, 'trace', None)
+        trace = self._local.trace = {}
+        try:
+            yield trace
+        finally:
+            self._local.trace = outer
+
+    def timed(self, stage, func):
+        """
+        Returns a function recording the duration of each call of ``func`` as a stage.
+        """
+        def timed_func(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(stage, time.perf_counter() - start)
+        return timed_func
+
+    def inc(self, counter, value=1, label=None):
+        """
+        Increments one of the COUNTERS, optionally for a label value.
+        """
+        if not self.enabled:
+            return
+        key = (counter, label)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self):
+        """
+        Returns the metrics in the Prometheus text format.
+        """
+        with self._lock:
+            histograms = {stage: (list(counts), total) for stage, (counts, total) in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        name, help_text = STAGE_HISTOGRAM
+        lines.append('# HELP {0} {1}'.format(name, help_text))
+        lines.append('# TYPE {0} histogram'.format(name))
+        for stage in sorted(histograms):
+            counts, total = histograms[stage]
+            label = escape_label(stage)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append('{0}_bucket{{stage="{1}",le="{2}"}} {3}'.format(
+                    name, label, repr(bound), cumulative
+                ))
+            cumulative += counts[-1]
+            lines.append('{0}_bucket{{stage="{1}",le="+Inf"}} {2}'.format(name, label, cumulative))
+            lines.append('{0}_sum{{stage="{1}"}} {2}'.format(name, label, repr(total)))
+            lines.append('{0}_count{{stage="{1}"}} {2}'.format(name, label, cumulative))
+
+        for counter, (name, help_text, label_name) in COUNTERS.items():
+            lines.append('# HELP {0} {1}'.format(name, help_text))
+            lines.append('# TYPE {0} counter'.format(name))
+            if label_name is None:
+                lines.append('{0} {1}'.format(name, format_value(counters.get((counter, None), 0))))
+                continue
+            for (key, label), value in sorted(counters.items()):
+                if key == counter:
+                    lines.append('{0}{{{1}="{2}"}} {3}'.format(
+                        name, label_name, escape_label(label), format_value(value)
+                    ))
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """
+        Writes the metrics to the configured file, replacing it atomically.
+        """
+        if not self.path:
+            return
+        path = self.path.format(pid=os.getpid())
+        temporary_path = path + '.tmp'
+        try:
+            with open(temporary_path, 'w', encoding='utf-8') as metrics_file:
+                metrics_file.write(self.render())
+            os.replace(temporary_path, path)
+        except OSError as error:
+            LOGGER.warning('Writing the metrics to {path} failed: {error}'.format(path=path, error=error))
+
+    def maybe_write(self):
+        """
+        Writes the metrics file if the write interval has passed since the last write.
+        """
+        if not self.path or time.monotonic() < self._next_write:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_write:
+                return
+            self._next_write = time.monotonic() + self.write_interval
+        self.write()
@@ -0,0 +1,181 @@
+"""
+Module for storing index operations that could not be delivered to the search index.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+import requests
+
+from ckanext.searchindexhook.storage import connect, prepare_database
+
+LOGGER = logging.getLogger(__name__)
+
+OPERATION_ADD = 'add'
+OPERATION_DELETE = 'delete'
+
+# errors after which an index operation is stored in the outbox
+DELIVERY_ERRORS = (
+    requests.exceptions.HTTPError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    queue.Full
+)
+
+
+class OutboxStore:
+    """
+    Durable store of undelivered index operations in a SQLite database in WAL mode.
+
+    Only the latest operation per dataset id is kept, so replaying the outbox sends every
+    dataset at most once, no matter how often it failed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        prepare_database(path, [
+            'CREATE TABLE IF NOT EXISTS operations ('
+            ' package_id TEXT PRIMARY KEY,'
+            ' operation TEXT NOT NULL,'
+            ' document TEXT,'
+            ' created REAL NOT NULL,'
+            ' attempts INTEGER NOT NULL DEFAULT 0)'
+        ])
+
+    def _connect(self):
+        return connect(self.path)
+
+    def add(self, package_id, document):
+        """
+        Stores a serialized document to be added to the search index.
+        """
+        self._put(package_id, OPERATION_ADD, document)
+
+    def delete(self, package_id):
+        """
+        Stores the deletion of a dataset from the search index.
+        """
+        self._put(package_id, OPERATION_DELETE, None)
+
+    def add_many(self, documents):
+        """
+        Stores several serialized documents given as (package_id, document) pairs.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO operations (package_id, operation, document, created)'
+                ' VALUES (?, ?, ?, ?)',
+                [(str(package_id), OPERATION_ADD, document, now) for package_id, document in documents]
+            )
+
+    def _put(self, package_id, operation, document):
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO operations (package_id, operation, document, created)'
+                ' VALUES (?, ?, ?, ?)',
+                (str(package_id), operation, document, time.time())
+            )
+
+    def discard(self, package_id):
+        """
+        Removes the stored operation of a dataset, if any.
+        """
+        with self._connect() as connection:
+            connection.execute('DELETE FROM operations WHERE package_id = ?', (str(package_id),))
+
+    def discard_many(self, package_ids):
+        """
+        Removes the stored operations of several datasets, if any.
+        """
+        with self._connect() as connection:
+            connection.executemany(
+                'DELETE FROM operations WHERE package_id = ?',
+                [(str(package_id),) for package_id in package_ids]
+            )
+
+    def fetch(self, limit):
+        """
+        Returns up to ``limit`` of the oldest operations as
+        (rowid, package_id, operation, document) tuples.
+        """
+        with self._connect() as connection:
+            return connection.execute(
+                'SELECT rowid, package_id, operation, document FROM operations'
+                ' ORDER BY created LIMIT ?',
+                (limit,)
+            ).fetchall()
+
+    def existing(self, rowids):
+        """
+        Returns the set of the given rowids whose operations were neither replaced nor
+        discarded since they were fetched.
+        """
+        found = set()
+        with self._connect() as connection:
+            for start in range(0, len(rowids), 500):
+                chunk = rowids[start:start + 500]
+                found.update(row[0] for row in connection.execute(
+                    'SELECT rowid FROM operations WHERE rowid IN ({0})'.format(','.join('?' * len(chunk))),
+                    chunk
+                ))
+        return found
+
+    def remove(self, rowids):
+        """
+        Removes delivered operations. Operations replaced in the meantime have a new rowid
+        and are kept.
+        """
+        with self._connect() as connection:
+            connection.executemany('DELETE FROM operations WHERE rowid = ?', [(rowid,) for rowid in rowids])
+
+    def mark_failed(self, rowids):
+        """
+        Increments the attempt counter of operations that failed again.
+        """
+        with self._connect() as connection:
+            connection.executemany(
+                'UPDATE operations SET attempts = attempts + 1 WHERE rowid = ?',
+                [(rowid,) for rowid in rowids]
+            )
+
+    def __len__(self):
+        with self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM operations').fetchone()[0]
+
+
+class OutboxDrainer:
+    """
+    Calls the replay function periodically in a background thread of the current process.
+    """
+
+    def __init__(self, replay, interval):
+        self.replay = replay
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """
+        Starts the drainer thread on first use and again in a forked process.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            thread = threading.Thread(target=self._run, name='searchindexhook-outbox')
+            thread.daemon = True
+            thread.start()
+            self._pid = pid
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.replay()
+            except Exception as error:  # pylint: disable=broad-except
+                LOGGER.warning('Replaying the outbox failed: %s', error)
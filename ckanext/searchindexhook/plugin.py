@@ -1,81 +1,486 @@
 """
 Module for pushing data into the search index.
 """
+import atexit
+import contextlib
 import datetime
 import json
 import logging
+import queue
 
 from ckan import model
 import ckan.plugins as p
 from ckan.plugins import toolkit as tk
 import geojson
 import requests
-from area import area
-from dateutil.parser import parse
-from shapely.geometry import shape
 
-LOGGER = logging.getLogger(__name__)
+from ckanext.searchindexhook.batch import BatchBuffer
+from ckanext.searchindexhook.dates import NORMALIZED_DATE_FORMAT, DateNormalizer, transform_date_notation
+from ckanext.searchindexhook.digest import ChangeDetector, load_digest_store
+from ckanext.searchindexhook.client import IndexClient
+from ckanext.searchindexhook import cli, deadline, views
+from ckanext.searchindexhook.coalesce import Coalescer
+from ckanext.searchindexhook.config import ConfigOption, IndexConfig, reload_options
+from ckanext.searchindexhook.deadline import DeadlineExceeded
+from ckanext.searchindexhook.dispatch import AsyncDispatcher
+from ckanext.searchindexhook.geocache import SpatialCache, SqliteSpatialStore
+from ckanext.searchindexhook.extras import (
+    HANDLER_APPLICABLE_LEGISLATION, HANDLER_COPY, HANDLER_DATE, HANDLER_HVD_CATEGORY, HANDLER_JSON_LIST,
+    HANDLER_MODIFIED, HANDLER_SPATIAL, HANDLER_SPATIAL_BBOX, HANDLER_SPATIAL_CENTROID, build_extras_mapping,
+    compile_extras_mapping
+)
+from ckanext.searchindexhook.jsoncodec import load_codec
+from ckanext.searchindexhook.licenses import LicenseOpennessCache
+from ckanext.searchindexhook.metrics import (
+    STAGE_DELETE, STAGE_EXTRAS, STAGE_GEO, STAGE_PARSE, STAGE_POST, STAGE_RESOURCES, STAGE_SERIALIZE, Metrics
+)
+from ckanext.searchindexhook.geo import (
+    BoundingBoxRepresentation, SpatialFeatures, geojson_area, shares_exterior_coordinates
+)
+from ckanext.searchindexhook.profiling import SlowDocumentProfiler
+from ckanext.searchindexhook.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from ckanext.searchindexhook.outbox import DELIVERY_ERRORS, OPERATION_ADD, OutboxDrainer, OutboxStore
+from ckanext.searchindexhook.resolver import PackageIdResolver
+from ckanext.searchindexhook.storage import STORE_ERRORS
 
-NORMALIZED_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+LOGGER = logging.getLogger(__name__)
 
 HVD_APPLICABLE_LEGISLATION = "http://data.europa.eu/eli/reg_impl/2023/138/oj"
 
 geojson.geometry.DEFAULT_PRECISION = 15
 
 
+
 class SearchIndexHookPlugin(p.SingletonPlugin):
     """
     Plugin for adding and deleting package data from the bmi-govdata
     search index.
     """
     p.implements(p.IPackageController, inherit=True)
+    p.implements(p.IClick)
+    p.implements(p.IBlueprint)
 
-    search_index_endpoint = tk.config.get(
-        'ckan.searchindexhook.endpoint',
-        False
+    search_index_endpoint = ConfigOption(
+        'ckan.searchindexhook.endpoint'
     )
 
-    search_index_credentials = tk.config.get(
-        'ckan.searchindexhook.endpoint.credentials',
-        False
+    search_index_credentials = ConfigOption(
+        'ckan.searchindexhook.endpoint.credentials'
+    )
+
+    indexable_data_types = ConfigOption(
+        'ckan.searchindexhook.indexable.data.types'
+    )
+
+    targetlink_url_base_path = ConfigOption(
+        'ckan.searchindexhook.targetlink.url.base.path'
+    )
+
+    search_index_name = ConfigOption(
+        'ckan.searchindexhook.index.name'
     )
 
-    indexable_data_types = tk.config.get(
-        'ckan.searchindexhook.indexable.data.types',
+    # validated snapshot of the options above, built on first use
+    index_config = None
+
+    http_pool_size = tk.asint(tk.config.get(
+        'ckan.searchindexhook.http.pool.size',
+        10
+    ))
+
+    http_keep_alive = tk.asbool(tk.config.get(
+        'ckan.searchindexhook.http.keep.alive',
+        True
+    ))
+
+    http_connect_timeout = float(tk.config.get(
+        'ckan.searchindexhook.http.connect.timeout',
+        5
+    ))
+
+    http_read_timeout = float(tk.config.get(
+        'ckan.searchindexhook.http.read.timeout',
+        30
+    ))
+
+    http_compression = tk.config.get(
+        'ckan.searchindexhook.http.compression',
+        'none'
+    )
+
+    http_compression_min_size = tk.asint(tk.config.get(
+        'ckan.searchindexhook.http.compression.min.size',
+        1024
+    ))
+
+    http_compression_level = tk.asint(tk.config.get(
+        'ckan.searchindexhook.http.compression.level',
+        6
+    ))
+
+    retry_max_attempts = tk.asint(tk.config.get(
+        'ckan.searchindexhook.retry.max.attempts',
+        1
+    ))
+
+    retry_backoff = float(tk.config.get(
+        'ckan.searchindexhook.retry.backoff',
+        0.1
+    ))
+
+    retry_max_backoff = float(tk.config.get(
+        'ckan.searchindexhook.retry.max.backoff',
+        2
+    ))
+
+    retry_statuses = [int(status) for status in tk.aslist(tk.config.get(
+        'ckan.searchindexhook.retry.statuses',
+        '429 500 502 503 504'
+    ))]
+
+    circuit_failure_threshold = tk.asint(tk.config.get(
+        'ckan.searchindexhook.circuit.failure.threshold',
+        0
+    ))
+
+    circuit_reset_timeout = float(tk.config.get(
+        'ckan.searchindexhook.circuit.reset.timeout',
+        30
+    ))
+
+    circuit_half_open_calls = tk.asint(tk.config.get(
+        'ckan.searchindexhook.circuit.half.open.calls',
+        1
+    ))
+
+    coalesce_window = float(tk.config.get(
+        'ckan.searchindexhook.coalesce.window',
+        0
+    ))
+
+    coalesce_max_pending = tk.asint(tk.config.get(
+        'ckan.searchindexhook.coalesce.max.pending',
+        10000
+    ))
+
+    deadline_budget = float(tk.config.get(
+        'ckan.searchindexhook.deadline.budget',
+        0
+    ))
+
+    batch_enabled = tk.asbool(tk.config.get(
+        'ckan.searchindexhook.batch.enabled',
         False
+    ))
+
+    batch_max_documents = tk.asint(tk.config.get(
+        'ckan.searchindexhook.batch.max.documents',
+        500
+    ))
+
+    batch_max_bytes = tk.asint(tk.config.get(
+        'ckan.searchindexhook.batch.max.bytes',
+        5242880
+    ))
+
+    batch_max_wait = float(tk.config.get(
+        'ckan.searchindexhook.batch.max.wait',
+        5
+    ))
+
+    async_enabled = tk.asbool(tk.config.get(
+        'ckan.searchindexhook.async.enabled',
+        False
+    ))
+
+    async_workers = tk.asint(tk.config.get(
+        'ckan.searchindexhook.async.workers',
+        4
+    ))
+
+    async_queue_size = tk.asint(tk.config.get(
+        'ckan.searchindexhook.async.queue.size',
+        1000
+    ))
+
+    async_enqueue_timeout = float(tk.config.get(
+        'ckan.searchindexhook.async.enqueue.timeout',
+        30
+    ))
+
+    async_drain_timeout = float(tk.config.get(
+        'ckan.searchindexhook.async.drain.timeout',
+        30
+    ))
+
+    upsert_enabled = tk.asbool(tk.config.get(
+        'ckan.searchindexhook.upsert.enabled',
+        False
+    ))
+
+    upsert_delete_states = tk.aslist(tk.config.get(
+        'ckan.searchindexhook.upsert.delete.states',
+        'deleted'
+    ))
+
+    digest_enabled = tk.asbool(tk.config.get(
+        'ckan.searchindexhook.digest.enabled',
+        False
+    ))
+
+    digest_backend = tk.config.get(
+        'ckan.searchindexhook.digest.backend',
+        'sqlite'
+    )
+
+    digest_path = tk.config.get(
+        'ckan.searchindexhook.digest.path',
+        None
+    )
+
+    resolver_cache_size = tk.asint(tk.config.get(
+        'ckan.searchindexhook.resolver.cache.size',
+        10000
+    ))
+
+    date_cache_size = tk.asint(tk.config.get(
+        'ckan.searchindexhook.date.cache.size',
+        10000
+    ))
+
+    boundingbox_mode = tk.config.get(
+        'ckan.searchindexhook.boundingbox.mode',
+        'full'
+    )
+
+    boundingbox_tolerance = float(tk.config.get(
+        'ckan.searchindexhook.boundingbox.tolerance',
+        0
+    ))
+
+    boundingbox_precision = tk.config.get(
+        'ckan.searchindexhook.boundingbox.precision',
+        None
+    )
+
+    spatial_cache_size = tk.asint(tk.config.get(
+        'ckan.searchindexhook.spatial.cache.size',
+        1000
+    ))
+
+    spatial_cache_max_bytes = tk.asint(tk.config.get(
+        'ckan.searchindexhook.spatial.cache.max.bytes',
+        33554432
+    ))
+
+    spatial_cache_path = tk.config.get(
+        'ckan.searchindexhook.spatial.cache.path',
+        None
     )
 
-    targetlink_url_base_path = tk.config.get(
-        'ckan.searchindexhook.targetlink.url.base.path',
+    spatial_cache_disk_max_entries = tk.asint(tk.config.get(
+        'ckan.searchindexhook.spatial.cache.disk.max.entries',
+        100000
+    ))
+
+    metrics_enabled = tk.asbool(tk.config.get(
+        'ckan.searchindexhook.metrics.enabled',
+        True
+    ))
+
+    metrics_endpoint_enabled = tk.asbool(tk.config.get(
+        'ckan.searchindexhook.metrics.endpoint.enabled',
         False
+    ))
+
+    metrics_path = tk.config.get(
+        'ckan.searchindexhook.metrics.path',
+        None
+    )
+
+    metrics_write_interval = float(tk.config.get(
+        'ckan.searchindexhook.metrics.write.interval',
+        15
+    ))
+
+    profile_threshold = float(tk.config.get(
+        'ckan.searchindexhook.profile.threshold',
+        0
+    ))
+
+    profile_log_path = tk.config.get(
+        'ckan.searchindexhook.profile.log.path',
+        None
+    )
+
+    profile_log_max_bytes = tk.asint(tk.config.get(
+        'ckan.searchindexhook.profile.log.max.bytes',
+        10485760
+    ))
+
+    profile_log_backup_count = tk.asint(tk.config.get(
+        'ckan.searchindexhook.profile.log.backup.count',
+        5
+    ))
+
+    profile_cprofile_dir = tk.config.get(
+        'ckan.searchindexhook.profile.cprofile.dir',
+        None
+    )
+
+    license_ttl = float(tk.config.get(
+        'ckan.searchindexhook.license.ttl',
+        3600
+    ))
+
+    license_retry_interval = float(tk.config.get(
+        'ckan.searchindexhook.license.retry.interval',
+        60
+    ))
+
+    extras_copy_fields = tk.aslist(tk.config.get(
+        'ckan.searchindexhook.extras.copy.fields',
+        ''
+    ))
+
+    extras_list_fields = tk.aslist(tk.config.get(
+        'ckan.searchindexhook.extras.list.fields',
+        ''
+    ))
+
+    json_backend = tk.config.get(
+        'ckan.searchindexhook.json.backend',
+        'json'
     )
 
-    search_index_name = tk.config.get(
-        'ckan.searchindexhook.index.name',
+    outbox_path = tk.config.get(
+        'ckan.searchindexhook.outbox.path',
         False
     )
 
+    outbox_drain_interval = float(tk.config.get(
+        'ckan.searchindexhook.outbox.drain.interval',
+        0
+    ))
+
+    outbox_replay_batch_size = tk.asint(tk.config.get(
+        'ckan.searchindexhook.outbox.replay.batch.size',
+        500
+    ))
+
+    # IClick
+
+    def get_commands(self):
+        return cli.get_commands()
+
+    # IBlueprint
+
+    def get_blueprint(self):
+        if not self.metrics_endpoint_enabled:
+            return []
+        return [views.build_metrics_blueprint(self.metrics)]
+
     # IPackageController
 
     def __init__(self, **kwargs):
-        # Load license information once
-        self.license_openness_map = self.load_license_openness()
+        self.metrics = Metrics(
+            enabled=self.metrics_enabled, path=self.metrics_path, write_interval=self.metrics_write_interval
+        )
+        # Load license information, it is refreshed in the background after the TTL
+        self.license_openness = LicenseOpennessCache(
+            self.fetch_license_openness, ttl=self.license_ttl, retry_interval=self.license_retry_interval
+        )
+        self.license_openness.load()
+        self.index_client = None
+        self.batch_buffer = None
+        self.coalescer = None
+        self.dispatcher = None
+        self.outbox = None
+        self.outbox_drainer = None
+        self.package_id_resolver = PackageIdResolver(max_size=self.resolver_cache_size)
+        self.change_detector = None
+        # a misconfigured digest store fails at startup instead of in the hook
+        self.get_change_detector()
+        self.spatial_cache = None
+        self.boundingbox_representation = BoundingBoxRepresentation(
+            self.boundingbox_mode, self.boundingbox_tolerance, self.boundingbox_precision
+        )
+        self.date_normalizer = DateNormalizer(cache_size=self.date_cache_size)
+        self.json_codec = load_codec(self.json_backend)
+        self.extras_handlers = self.compile_extras_handlers()
+        self.profiler = None
+        if self.profile_threshold > 0:
+            self.profiler = SlowDocumentProfiler(
+                self.profile_threshold,
+                log_path=self.profile_log_path,
+                max_bytes=self.profile_log_max_bytes,
+                backup_count=self.profile_log_backup_count,
+                cprofile_dir=self.profile_cprofile_dir,
+                loads=self.json_codec.loads,
+                dumps=self.json_codec.dumps
+            )
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        """
+        Sends all pending operations. Called at process exit: first the coalesced operations
+        are run, then the background workers are drained and the remaining batch is flushed.
+        """
+        if self.coalescer is not None:
+            self.coalescer.flush()
+        if self.dispatcher is not None:
+            for func, args in self.dispatcher.drain(self.async_drain_timeout):
+                if func == self.deliver_document:  # pylint: disable=comparison-with-callable
+                    self.defer_document(*args)
+                elif func == self.index_in_background:  # pylint: disable=comparison-with-callable
+                    self.defer_dataset(*args)
+                elif func == self.deliver_deletion:  # pylint: disable=comparison-with-callable
+                    self.defer_deletion(*args)
+        if self.batch_buffer is not None:
+            try:
+                self.batch_buffer.flush()
+            except requests.exceptions.RequestException as error:
+                LOGGER.error('Flushing the batch at shutdown failed: %s', error)
+        if self.spatial_cache is not None:
+            LOGGER.info('Spatial cache statistics: %s', dict(self.spatial_cache.stats))
+        if self.boundingbox_representation.stats:
+            LOGGER.info('Boundingbox statistics: %s', dict(self.boundingbox_representation.stats))
+        self.metrics.write()
+
+    @property
+    def license_openness_map(self):
+        """
+        Returns the mapping from license-ids to the "is-open" flag without blocking.
+        """
+        return self.license_openness.get()
+
+    @license_openness_map.setter
+    def license_openness_map(self, openness_map):
+        self.license_openness.set(openness_map)
 
     @staticmethod
-    def load_license_openness():
+    def fetch_license_openness():
         """
-        Loads the list of licenses from CKAN and stores a mapping from license-ids to the "is-open" flag.
+        Loads the list of licenses from CKAN and returns a mapping from license-ids to the "is-open" flag.
         """
-        try:
-            context = {'model': model, 'ignore_auth': True}
-            license_list = tk.get_action('license_list')(context, {})
+        context = {'model': model, 'ignore_auth': True}
+        license_list = tk.get_action('license_list')(context, {})
 
-            license_openness_map = {}
-            for license_dict in license_list:
-                license_openness_map[license_dict["id"]] = license_dict["od_conformance"] == 'approved' or \
-                                                      license_dict["osd_conformance"] == 'approved'
+        license_openness_map = {}
+        for license_dict in license_list:
+            license_openness_map[license_dict["id"]] = license_dict["od_conformance"] == 'approved' or \
+                                                  license_dict["osd_conformance"] == 'approved'
 
-            return license_openness_map
+        return license_openness_map
+
+    @classmethod
+    def load_license_openness(cls):
+        """
+        Loads the list of licenses from CKAN and returns a mapping from license-ids to the "is-open" flag,
+        or an empty mapping if the list could not be loaded.
+        """
+        try:
+            return cls.fetch_license_openness()
         except Exception as err:
             LOGGER.warning('Could not load license list for openness calculation! Details: %s', err)
             return {}
@@ -141,14 +546,16 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
         assert isinstance(value, str), assert_message
 
     @classmethod
-    def assert_mandatory_dict_keys(cls, data_dict):
+    def assert_mandatory_dict_keys(cls, data_dict, data_dict_from_json=None):
         """
-        Asserts that the dict contains the mandatory keys.
+        Asserts that the dict contains the mandatory keys. The 'data_dict' string is only
+        parsed if it is not passed already parsed.
         """
         assert_message = "Dictionary does not contain key 'data_dict'"
         assert 'data_dict' in data_dict, assert_message
 
-        data_dict_from_json = json.loads(data_dict['data_dict'])
+        if data_dict_from_json is None:
+            data_dict_from_json = json.loads(data_dict['data_dict'])
 
         assert_message = "Dictionary does not contain key 'resources'"
         assert 'resources' in data_dict_from_json, assert_message
@@ -158,30 +565,66 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
 
     def assert_configuration(self):
         """
-        Asserts / guards the configuration of this plugin.
+        Asserts / guards the configuration of this plugin. The configuration is validated
+        once when its snapshot is built.
         """
-        self.assert_endpoint_configuration(
-            self.search_index_endpoint
-        )
-        self.assert_credentials_configuration(
-            self.search_index_credentials
-        )
-        self.assert_targetlink_url_base_path(
-            self.targetlink_url_base_path
-        )
-        self.assert_search_index_name(
-            self.search_index_name
-        )
+        self.get_index_config().assert_valid()
+
+    def validate_configuration(self):
+        """
+        Returns the AssertionError of the configuration of this plugin or None.
+        """
+        try:
+            self.assert_endpoint_configuration(
+                self.search_index_endpoint
+            )
+            self.assert_credentials_configuration(
+                self.search_index_credentials
+            )
+            self.assert_targetlink_url_base_path(
+                self.targetlink_url_base_path
+            )
+            self.assert_search_index_name(
+                self.search_index_name
+            )
+        except AssertionError as error:
+            return error
+        return None
+
+    def get_index_config(self):
+        """
+        Returns the immutable snapshot of the search index configuration. It is built
+        on first use and again after one of the options was changed or reloaded.
+        """
+        index_config = self.index_config
+        if index_config is None:
+            index_config = IndexConfig.build(
+                self.search_index_endpoint,
+                self.search_index_credentials,
+                self.indexable_data_types,
+                self.targetlink_url_base_path,
+                self.search_index_name,
+                error=self.validate_configuration()
+            )
+            self.index_config = index_config
+        return index_config
+
+    def reload_config(self):
+        """
+        Reads the search index options again from the CKAN configuration, e.g. after it
+        was changed.
+        """
+        reload_options(self)
 
     def get_search_index_credentials(self):
         """
         Returns the configured HTTP basic auth credentials for
         the search index webservice as a dictionary.
         """
-        credentials = self.search_index_credentials.split(':')
+        username, password = self.get_index_config().auth
         return {
-            'username': credentials[0],
-            'password': credentials[1]
+            'username': username,
+            'password': password
         }
 
     def get_indexable_data_types(self):
@@ -189,34 +632,178 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
         Returns the configured indexable data types to add to
         the search index as a list.
         """
-        return [x.strip() for x in self.indexable_data_types.split(',')]
+        return list(self.get_index_config().indexable_data_types)
 
     def should_be_indexed(self, dataset_type):
         """
         Returns if a given dataset type should be index based on the
         configured accepted data types.
         """
-        indexable_data_types = self.get_indexable_data_types()
-
-        return dataset_type.strip() in indexable_data_types
+        return dataset_type.strip() in self.get_index_config().indexable_data_type_set
 
     def get_targetlink_url_base_path(self):
         """
         Returns the configured targetlink URL base path. If configured value
         misses an slash (/) it's added.
         """
-        if self.targetlink_url_base_path[-1] == '/':
-            return self.targetlink_url_base_path
-        return self.targetlink_url_base_path + '/'
+        return self.get_index_config().targetlink_url_base_path
 
     def get_search_index_endpoint(self):
         """
         Returns the configured search index endpoint. If configured value
         misses an slash (/) it's added.
         """
-        if self.search_index_endpoint[-1] == '/':
-            return self.search_index_endpoint
-        return self.search_index_endpoint + '/'
+        return self.get_index_config().endpoint
+
+    def get_index_client(self):
+        """
+        Returns the shared HTTP client used for all calls against the search index
+        webservice. The client is created on first use.
+        """
+        if self.index_client is None:
+            self.index_client = IndexClient(
+                pool_size=self.http_pool_size,
+                keep_alive=self.http_keep_alive,
+                connect_timeout=self.http_connect_timeout,
+                read_timeout=self.http_read_timeout,
+                compression=self.http_compression,
+                compression_min_size=self.http_compression_min_size,
+                compression_level=self.http_compression_level,
+                metrics=self.metrics,
+                retry_policy=self.build_retry_policy(),
+                circuit_breaker=self.build_circuit_breaker()
+            )
+        return self.index_client
+
+    def build_retry_policy(self):
+        """
+        Returns the retry policy for transient responses or None if retries are disabled.
+        """
+        if self.retry_max_attempts <= 1:
+            return None
+        return RetryPolicy(
+            max_attempts=self.retry_max_attempts,
+            backoff=self.retry_backoff,
+            max_backoff=self.retry_max_backoff,
+            statuses=self.retry_statuses,
+            on_retry=lambda status: self.metrics.inc('retried', label=status)
+        )
+
+    def build_circuit_breaker(self):
+        """
+        Returns the circuit breaker of the endpoint or None if it is disabled.
+        """
+        if self.circuit_failure_threshold <= 0:
+            return None
+        return CircuitBreaker(
+            failure_threshold=self.circuit_failure_threshold,
+            reset_timeout=self.circuit_reset_timeout,
+            half_open_calls=self.circuit_half_open_calls,
+            on_change=lambda state: self.metrics.inc('circuit', label=state)
+        )
+
+    def uses_upsert(self):
+        """
+        Returns True if additions replace the indexed document with the same id without a
+        prior deletion. Batch mode implies this, a deletion per document would cost one
+        request per dataset again and leave the dataset out of the index until the flush.
+        """
+        return self.upsert_enabled or self.batch_enabled
+
+    def hook_deadline(self):
+        """
+        Returns a context limiting the enclosed work of a hook call to the configured time
+        budget, or a context without a limit if no budget is configured.
+        """
+        if self.deadline_budget <= 0:
+            return contextlib.nullcontext()
+        return deadline.deadline(self.deadline_budget)
+
+    def get_batch_buffer(self):
+        """
+        Returns the buffer collecting documents for multi-document requests. The buffer is
+        created on first use and flushed at shutdown.
+        """
+        if self.batch_buffer is None:
+            self.batch_buffer = BatchBuffer(
+                self.send_documents,
+                max_documents=self.batch_max_documents,
+                max_bytes=self.batch_max_bytes,
+                max_wait=self.batch_max_wait,
+                on_error=self.defer_serialized_documents,
+                on_sent=lambda documents: self.metrics.inc('sent', len(documents)),
+                dumps=self.metrics.timed(STAGE_SERIALIZE, self.json_codec.dumps)
+            )
+        return self.batch_buffer
+
+    def get_coalescer(self):
+        """
+        Returns the coalescer holding the last operation per dataset during the window. The
+        coalescer is created on first use and flushed at shutdown.
+        """
+        if self.coalescer is None:
+            self.coalescer = Coalescer(
+                window=self.coalesce_window,
+                max_pending=self.coalesce_max_pending,
+                on_superseded=lambda: self.metrics.inc('coalesced')
+            )
+        return self.coalescer
+
+    def get_dispatcher(self):
+        """
+        Returns the dispatcher sending index operations in background threads. The
+        dispatcher is created on first use and drained at shutdown.
+        """
+        if self.dispatcher is None:
+            self.dispatcher = AsyncDispatcher(
+                workers=self.async_workers,
+                queue_size=self.async_queue_size,
+                enqueue_timeout=self.async_enqueue_timeout
+            )
+        return self.dispatcher
+
+    def get_change_detector(self):
+        """
+        Returns the detector for unchanged documents or None if the change detection is
+        disabled.
+        """
+        if not self.digest_enabled:
+            return None
+        if self.change_detector is None:
+            self.change_detector = ChangeDetector(
+                load_digest_store(self.digest_backend, self.digest_path)
+            )
+        return self.change_detector
+
+    def get_spatial_cache(self):
+        """
+        Returns the cache of spatial fields derived from GeoJSON values.
+        """
+        if self.spatial_cache is None:
+            store = None
+            if self.spatial_cache_path:
+                store = SqliteSpatialStore(self.spatial_cache_path, self.spatial_cache_disk_max_entries)
+            self.spatial_cache = SpatialCache(
+                max_entries=self.spatial_cache_size,
+                max_bytes=self.spatial_cache_max_bytes,
+                store=store
+            )
+        return self.spatial_cache
+
+    def get_outbox(self):
+        """
+        Returns the store for undelivered index operations or None if no outbox is
+        configured. The background drainer is started here, if configured.
+        """
+        if not self.outbox_path:
+            return None
+        if self.outbox is None:
+            self.outbox = OutboxStore(self.outbox_path)
+        if self.outbox_drain_interval > 0:
+            if self.outbox_drainer is None:
+                self.outbox_drainer = OutboxDrainer(self.replay_outbox, self.outbox_drain_interval)
+            self.outbox_drainer.ensure_started()
+        return self.outbox
 
     def substitute_targetlink(self, dataset_name):
         """
@@ -243,103 +830,443 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
         LOGGER.debug("Syncing after package deletion")
 
         try:
-            self.delete_from_index(
-                data_dict['id'],
-                context
-            )
-        except requests.exceptions.HTTPError as error:
-            error_message = 'Request failed with: {message}'.format(
-                message=str(error)
-            )
-            LOGGER.error(error_message)
-        except requests.exceptions.ConnectionError as error:
-            error_message = 'Endpoint is not available: {message}'.format(
-                message=str(error)
-            )
-            LOGGER.error(error_message)
+            with self.hook_deadline():
+                if self.coalesce_window > 0:
+                    self.withdraw_from_index(self.resolve_package_id(data_dict['id']))
+                elif self.async_enabled:
+                    package_id = self.resolve_package_id(data_dict['id'])
+                    self.get_dispatcher().submit(package_id, self.deliver_deletion, package_id)
+                else:
+                    package_id = self.delete_from_index(
+                        data_dict['id'],
+                        context
+                    )
+                    self.forget_digest(package_id)
+        except DELIVERY_ERRORS as error:
+            self.log_delivery_error(error)
+            self.defer_deletion(data_dict['id'], context)
 
     def before_dataset_index(self, pkg_dict):
         """
         CKAN hook point for dataset addition. Before every addition
         a deletion is performed. Only "active" datasets will be index,
         "deleted" datasets are only deleted, but not updated.
+
+        In upsert and batch mode only the addition is sent and the search index replaces
+        the document with the same id. A deletion is only sent for datasets with a
+        non indexable state, or with a non indexable type if they were indexed before.
+
+        With a coalescing window only the last state of a dataset within the window
+        is sent, after the window.
         """
         LOGGER.debug("Syncing before Solr indexing")
 
         if 'type' not in pkg_dict:
             LOGGER.error('No package / dataset type set')
+            self.metrics.inc('skipped', label='no_type')
 
             return pkg_dict
 
+        if 'id' in pkg_dict and 'name' in pkg_dict:
+            self.package_id_resolver.remember(pkg_dict['name'], pkg_dict['id'])
+
         if not self.should_be_indexed(pkg_dict['type']):
             info_message = 'Skipping non indexable type: {type}'.format(
                 type=pkg_dict['type']
             )
 
             LOGGER.info(info_message)
+            self.metrics.inc('skipped', label='not_indexable')
+
+            if self.uses_upsert() and self.was_indexed(pkg_dict['id']):
+                # the dataset was indexed with its former type
+                self.withdraw_from_index(pkg_dict['id'])
 
             return pkg_dict
 
-        try:
-            self.delete_from_index(pkg_dict['id'])
-            self.add_to_index(pkg_dict)
-        except requests.exceptions.HTTPError as error:
-            error_message = 'Request failed with: {message}'.format(
-                message=str(error)
-            )
-            LOGGER.error(error_message)
-        except requests.exceptions.ConnectionError as error:
-            error_message = 'Endpoint is not available: {message}'.format(
-                message=str(error)
-            )
-            LOGGER.error(error_message)
+        if self.uses_upsert() and pkg_dict.get('state') in self.upsert_delete_states:
+            self.withdraw_from_index(pkg_dict['id'])
+
+            return pkg_dict
+
+        if self.coalesce_window > 0:
+            # only the last state within the window is sent, from the coalescing thread
+            self.get_coalescer().submit(pkg_dict['id'], self.sync_dataset, dict(pkg_dict))
+        else:
+            self.sync_dataset(pkg_dict)
 
+        self.metrics.maybe_write()
         return pkg_dict
 
+    def sync_dataset(self, pkg_dict):
+        """
+        Replaces the indexed document of an indexable dataset within the time budget. If
+        this fails, the operation is deferred.
+        """
+        document = None
+        failure = None
+        try:
+            with self.hook_deadline():
+                change_detector = self.get_change_detector()
+                if change_detector is not None or self.async_enabled:
+                    document = self.profiled(pkg_dict, lambda: self.build_index_document(pkg_dict))
+                    unchanged = change_detector is not None and not change_detector.has_changed(
+                        pkg_dict['id'], document
+                    )
+                    if unchanged:
+                        LOGGER.debug('Skipping unchanged document: %s', pkg_dict['id'])
+                        self.metrics.inc('skipped', label='unchanged')
+                        return
+
+                if self.async_enabled:
+                    # only the document is built here, the workers talk to the search index
+                    self.get_dispatcher().submit(
+                        pkg_dict['id'], self.deliver_document, pkg_dict['id'], document
+                    )
+                elif document is not None:
+                    self.replace_document(pkg_dict['id'], document)
+                elif self.uses_upsert():
+                    self.add_to_index(pkg_dict)
+                else:
+                    self.delete_from_index(pkg_dict['id'])
+                    self.add_to_index(pkg_dict)
+        except DELIVERY_ERRORS as error:
+            failure = error
+
+        # the failed operation is deferred outside of the time budget of the hook call
+        if failure is not None:
+            self.log_delivery_error(failure)
+            self.forget_digest(pkg_dict['id'])
+            if isinstance(failure, DeadlineExceeded):
+                self.defer_aborted_document(pkg_dict, document)
+            elif self.get_outbox() is not None:
+                if document is None:
+                    document = self.build_index_document(pkg_dict)
+                self.defer_document(pkg_dict['id'], document)
+
+    def withdraw_from_index(self, package_id):
+        """
+        Deletes a dataset with a resolved id from the search index, after the coalescing
+        window if configured.
+        """
+        if self.coalesce_window > 0:
+            self.get_coalescer().submit(package_id, self.send_withdrawal, package_id)
+        else:
+            self.send_withdrawal(package_id)
+
+    def send_withdrawal(self, package_id):
+        """
+        Deletes a dataset with a resolved id from the search index, in the background if
+        the asynchronous mode is enabled.
+        """
+        try:
+            if self.async_enabled:
+                self.get_dispatcher().submit(package_id, self.deliver_deletion, package_id)
+            else:
+                self.deliver_deletion(package_id)
+        except queue.Full as error:
+            self.log_delivery_error(error)
+            self.defer_deletion(package_id)
+
+    def log_delivery_error(self, error):
+        """
+        Logs and counts an error which prevented an index operation from being delivered.
+        """
+        self.metrics.inc('failed', label=type(error).__name__)
+        if isinstance(error, DeadlineExceeded):
+            self.metrics.inc('aborted', label=error.stage)
+            LOGGER.warning('Index operation is aborted: {message}'.format(message=str(error)))
+            return
+        if isinstance(error, CircuitOpenError):
+            LOGGER.warning('Endpoint is skipped: {message}'.format(message=str(error)))
+            return
+        if isinstance(error, requests.exceptions.HTTPError):
+            template = 'Request failed with: {message}'
+        elif isinstance(error, requests.exceptions.ConnectionError):
+            template = 'Endpoint is not available: {message}'
+        elif isinstance(error, requests.exceptions.Timeout):
+            template = 'Endpoint did not respond in time: {message}'
+        else:
+            template = 'Index operation queue is full: {message}'
+        LOGGER.error(template.format(message=str(error)))
+
+    def deliver_document(self, package_id, document):
+        """
+        Replaces the indexed document of a dataset. If this fails, the document is stored
+        in the outbox.
+        """
+        try:
+            self.replace_document(package_id, document)
+        except DELIVERY_ERRORS as error:
+            self.log_delivery_error(error)
+            self.defer_document(package_id, document)
+
+    def index_in_background(self, pkg_dict):
+        """
+        Builds the document of a dataset and replaces the indexed one, used for hook calls
+        which ran out of time.
+        """
+        self.deliver_document(pkg_dict['id'], self.build_index_document(pkg_dict))
+
+    def defer_aborted_document(self, pkg_dict, document):
+        """
+        Hands a dataset whose hook call ran out of time on. In the asynchronous mode it is
+        queued on the background workers without waiting for space, as all later operations
+        for the dataset go through the same worker. Otherwise, or if the workers are busy,
+        the document is stored in the outbox, where a later delivery of the dataset replaces
+        it, so it never overwrites a newer document in the search index.
+        """
+        if self.async_enabled:
+            if document is None:
+                queued = self.get_dispatcher().offer(pkg_dict['id'], self.index_in_background, pkg_dict)
+            else:
+                queued = self.get_dispatcher().offer(
+                    pkg_dict['id'], self.deliver_document, pkg_dict['id'], document
+                )
+            if queued:
+                return
+        self.defer_dataset(pkg_dict, document)
+
+    def defer_dataset(self, pkg_dict, document=None):
+        """
+        Stores the document of a dataset in the outbox, building it if it is not given. Without
+        an outbox the dataset is only logged as not indexed.
+        """
+        if not self.outbox_path:
+            LOGGER.error('Dataset {id} is not indexed, no outbox is configured'.format(id=pkg_dict['id']))
+            return
+        if document is None:
+            document = self.build_index_document(pkg_dict)
+        self.defer_document(pkg_dict['id'], document)
+
+    def deliver_deletion(self, package_id):
+        """
+        Deletes the indexed document of a dataset. If this fails, the deletion is stored in
+        the outbox.
+        """
+        self.forget_digest(package_id)
+        try:
+            self.remove_document(package_id)
+        except DELIVERY_ERRORS as error:
+            self.log_delivery_error(error)
+            self.defer_deletion(package_id)
+
+    def defer_document(self, package_id, document):
+        """
+        Stores a document in the outbox, if configured.
+        """
+        self.forget_digest(package_id)
+        try:
+            outbox = self.get_outbox()
+            if outbox is not None:
+                outbox.add(package_id, self.json_codec.dumps(document))
+        except STORE_ERRORS as error:
+            self.log_outbox_error(error)
+
+    def defer_serialized_documents(self, documents):
+        """
+        Stores (package_id, serialized document) pairs of a failed batch in the outbox, if
+        configured.
+        """
+        for package_id, _ in documents:
+            self.forget_digest(package_id)
+        try:
+            outbox = self.get_outbox()
+            if outbox is not None:
+                outbox.add_many(documents)
+        except STORE_ERRORS as error:
+            self.log_outbox_error(error)
+
+    def defer_deletion(self, document_id, context=None):
+        """
+        Stores the deletion of a dataset in the outbox, if configured.
+        """
+        try:
+            outbox = self.get_outbox()
+            if outbox is not None:
+                try:
+                    package_id = self.resolve_package_id(document_id)
+                except Exception:  # pylint: disable=broad-except
+                    return
+                outbox.delete(package_id)
+        except STORE_ERRORS as error:
+            self.log_outbox_error(error)
+
+    @staticmethod
+    def log_outbox_error(error):
+        """
+        Logs an error of the outbox database, which must not fail the dataset save.
+        """
+        LOGGER.error('Writing the outbox failed: {message}'.format(message=str(error)))
+
+    def was_indexed(self, package_id):
+        """
+        Returns True if a document of the dataset was sent and not deleted since. This is
+        only known if the change detection is enabled, otherwise False is returned.
+        """
+        change_detector = self.get_change_detector()
+        return change_detector is not None and change_detector.is_known(package_id)
+
+    def forget_digest(self, package_id):
+        """
+        Removes the digest of the last sent document, if the change detection is enabled.
+        """
+        change_detector = self.get_change_detector()
+        if change_detector is not None:
+            change_detector.forget(package_id)
+
+    def clear_deferred(self, package_id):
+        """
+        Removes a stored operation before a newer state of the dataset is delivered, so
+        that a replay running at the same time skips the outdated operation.
+        """
+        try:
+            outbox = self.get_outbox()
+            if outbox is not None:
+                outbox.discard(package_id)
+        except STORE_ERRORS as error:
+            self.log_outbox_error(error)
+
+    def replay_outbox(self, limit=None):
+        """
+        Re-sends the operations stored in the outbox. All documents of one replay batch are
+        posted in a single request. Returns the number of delivered operations.
+
+        Right before each request the fetched operations are checked again: operations which
+        were replaced or discarded in the meantime, e.g. because a hook call delivered a newer
+        document, are skipped, so that the replay does not send an outdated document.
+        """
+        outbox = self.get_outbox()
+        if outbox is None:
+            return 0
+
+        delivered = 0
+        while limit is None or delivered < limit:
+            batch_size = self.outbox_replay_batch_size
+            if limit is not None:
+                batch_size = min(batch_size, limit - delivered)
+            operations = outbox.fetch(batch_size)
+            if not operations:
+                break
+
+            rowids = [operation[0] for operation in operations]
+            try:
+                for rowid, package_id, operation, _ in operations:
+                    if operation == OPERATION_ADD and self.uses_upsert():
+                        continue
+                    if outbox.existing([rowid]):
+                        self.send_deletion(package_id)
+                current = outbox.existing(rowids)
+                documents = [
+                    document for rowid, _, operation, document in operations
+                    if operation == OPERATION_ADD and rowid in current
+                ]
+                if documents:
+                    self.send_documents('[' + ','.join(documents) + ']')
+                    self.metrics.inc('sent', len(documents))
+            except DELIVERY_ERRORS as error:
+                self.log_delivery_error(error)
+                outbox.mark_failed(rowids)
+                break
+
+            outbox.remove(rowids)
+            delivered += len(operations)
+            LOGGER.info('Replayed %s index operations from the outbox', len(operations))
+
+        return delivered
+
     def calculate_geojson_area(self, spatial):
         """
         Calculates the area of the spatial feature
         """
-        spatial_area = area(spatial)
-        # area must at least be >0. We are using 1/X to rank the results
-        if spatial_area < 0:
-            spatial_area = 1
-
-        return spatial_area
+        return geojson_area(spatial)
 
     def calculate_geojson_center(self, spatial):
         """
         Calculates the center point of the given Polygon and returns the coordinates
         """
-        shapely_polygon = shape(spatial)
-        centroid = shapely_polygon.centroid
-        return centroid.x, centroid.y
+        return SpatialFeatures(spatial).center()
 
     def calculate_geojson_boundingbox(self, spatial):
         """
         Calculates the bounding box of the given Polygon and returns the coordinates
         """
-        return json.loads(
-            geojson.dumps(shape(spatial).simplify(0))
-            )
+        return SpatialFeatures(spatial, self.boundingbox_representation).boundingbox()
 
     def add_to_index(self, data_dict):
         """
-        Adds a dataset to the search index.
+        Adds a dataset to the search index. If batching is enabled the document is only
+        queued and sent together with other documents. If profiling is enabled, slow
+        datasets are recorded.
+        """
+        def index():
+            document = self.build_index_document(data_dict)
+            self.submit_document(data_dict['id'], document)
+            return document
+
+        self.profiled(data_dict, index)
+
+        info_message = "Adding to index: id={id}, name={name}".format(
+            id=data_dict['id'],
+            name=data_dict['name']
+        )
+        LOGGER.debug(info_message)
+
+    def profiled(self, data_dict, index):
+        """
+        Calls ``index()``, which returns the document of the dataset, and records the
+        dataset if it is slow and profiling is enabled. Returns the document.
+        """
+        if self.profiler is None:
+            return index()
+        return self.profiler.profile(self.metrics, data_dict, index)
+
+    def submit_document(self, package_id, document):
+        """
+        Sends a built document to the search index, or queues it if batching is enabled.
+        A stored operation of the dataset is removed before, so that a concurrent replay of
+        the outbox skips it; if sending fails, the document is stored again by the caller.
+        """
+        self.clear_deferred(package_id)
+        if self.batch_enabled:
+            self.get_batch_buffer().add(package_id, document)
+        else:
+            with self.metrics.time(STAGE_SERIALIZE):
+                body = self.json_codec.dumps([document])
+            self.send_documents(body)
+            self.metrics.inc('sent')
+
+    def replace_document(self, package_id, document):
+        """
+        Replaces the indexed document of a dataset by first deleting and then adding it.
+        In upsert and batch mode the deletion is skipped.
+        """
+        if not self.uses_upsert():
+            self.remove_document(package_id)
+        self.submit_document(package_id, document)
+
+    def build_index_document(self, data_dict):
+        """
+        Transforms a dataset into the document sent to the search index.
         """
         self.assert_configuration()
-        self.assert_mandatory_dict_keys(data_dict)
 
-        # 'data_dict' comes as a string
-        data_dict_from_json = json.loads(data_dict['data_dict'])
+        # 'data_dict' comes as a string, parse it once for the assertion and the transformation
+        data_dict_from_json = None
+        if 'data_dict' in data_dict:
+            with self.metrics.time(STAGE_PARSE):
+                data_dict_from_json = self.json_codec.loads(data_dict['data_dict'])
+        self.assert_mandatory_dict_keys(data_dict, data_dict_from_json)
         resources_dict = data_dict_from_json['resources']
-        self.shorten_resource_formats(resources_dict)
         extras_dict = data_dict_from_json['extras']
 
-        credentials = self.get_search_index_credentials()
-        has_open, has_closed = self.aggregate_openness(resources_dict)
-        has_access_url, has_formats = self.aggregate_quality_metrics(resources_dict)
-        has_data_service = self.aggregate_access_service(resources_dict)
+        deadline.check(STAGE_RESOURCES)
+        with self.metrics.time(STAGE_RESOURCES):
+            self.shorten_resource_formats(resources_dict)
+            has_open, has_closed = self.aggregate_openness(resources_dict)
+            has_access_url, has_formats = self.aggregate_quality_metrics(resources_dict)
+            has_data_service = self.aggregate_access_service(resources_dict)
+            resources_licenses = self.aggregate_licenses(resources_dict)
 
         metadata_dict = {
             'state': data_dict['state'],
@@ -347,7 +1274,7 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
             'name': data_dict['name'],
             'has_open': has_open,
             'has_closed': has_closed,
-            'resources_licenses': self.aggregate_licenses(resources_dict),
+            'resources_licenses': resources_licenses,
             'author': data_dict['author'],
             'author_email': data_dict['author_email'],
             'maintainer': data_dict['maintainer'],
@@ -368,62 +1295,28 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
             'extras': extras_dict
         }
 
-        # prepare data from extras to be used in search
-        for extra in extras_dict:
-            key = extra['key']
-            try:
-                # if there are geo data, extract them
-                if key == 'spatial' and extra['value'] != '':
-                    self.spatial_to_meta(extra, metadata_dict)
-                # if spatial_bbox is provided, extract it
-                elif key == 'spatial_bbox' and extra['value'] != '':
-                    self.spatial_bbox_to_meta(metadata_dict, extra)
-                 # if spatial_centroid is provided, extract it
-                elif key == 'spatial_centroid' and extra['value'] != '':
-                    self.spatial_centroid_to_meta(metadata_dict, extra)
-                # prepare time coverage for easier search
-                elif key == 'temporal_start' and extra['value'] != '':
-                    metadata_dict['temporal_start'] = self.normalize_date(extra['value'])
-                elif key == 'temporal_end' and extra['value'] != '':
-                    metadata_dict['temporal_end'] = self.normalize_date(extra['value'])
-                # dct:issued and dct:modified attributes
-                elif key == 'issued' and extra['value'] != '':
-                    metadata_dict['dct_issued'] = self.normalize_date(extra['value'])
-                elif key == 'modified' and extra['value'] != '':
-                    metadata_dict['dct_modified'] = self.normalize_date(extra['value'])
-                    # set metadata_modified field to the extras value if available and the date is not
-                    # in the future
-                    dct_modified_date_obj_utc = datetime.datetime.strptime(
-                        metadata_dict['dct_modified'], NORMALIZED_DATE_FORMAT
-                        ).utctimetuple()
-                    if dct_modified_date_obj_utc < datetime.datetime.now().utctimetuple():
-                        metadata_dict['dct_modified_fallback_ckan'] = metadata_dict['dct_modified']
-                elif key == 'applicable_legislation' and extra['value'] != '':
-                    self.applicable_legislation_to_meta(metadata_dict, extra)
-                elif key == 'hvd_category' and extra['value'] != '':
-                    self.hvd_category_to_meta(metadata_dict, extra)
-                elif extra.get('value'):
-                    # some elements simply need to be copied, check if current extra matches one of these
-                    # contact, publisher info and geocoding information for metadata quality dashboard
-                    if key in ['contact_name', 'contact_email', 'maintainer_tel', 'publisher_name',
-                               'politicalGeocodingLevelURI']:
-                        metadata_dict[key] = extra['value']
-                    # list values
-                    elif key in ['contributorID', 'geocodingText', 'politicalGeocodingURI']:
-                        # use json.loads to create a list with the values, if not possible use string
-                        try:
-                            metadata_dict[key] = json.loads(extra['value'])
-                        except ValueError:
-                            metadata_dict[key] = extra['value']
-
-            except (ValueError):
-                info_message = "invalid data in extras->" + key
-                info_message += " at dataset: " + data_dict['name']
-                info_message += ", value: " + extra['value']
-                LOGGER.info(info_message)
+        # prepare data from extras to be used in search, extras without a handler or value are skipped
+        extras_handlers = self.extras_handlers
+        deadline.check(STAGE_EXTRAS)
+        with self.metrics.time(STAGE_EXTRAS):
+            for extra in extras_dict:
+                handler = extras_handlers.get(extra['key'])
+                if handler is None or not extra.get('value'):
+                    continue
+                try:
+                    handler(metadata_dict=metadata_dict, extra=extra)
+                except (ValueError):
+                    info_message = "invalid data in extras->" + extra['key']
+                    info_message += " at dataset: " + data_dict['name']
+                    info_message += ", value: " + extra['value']
+                    LOGGER.info(info_message)
 
-        payload = [{
-            'indexName': self.search_index_name,
+        deadline.check(STAGE_SERIALIZE)
+        with self.metrics.time(STAGE_SERIALIZE):
+            metadata = self.json_codec.dumps(metadata_dict)
+
+        return {
+            'indexName': self.get_index_config().index_name,
             'type': None,
             'version': None,
             'displayName': None,
@@ -435,28 +1328,28 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
                 'sections': [],
                 'tags': data_dict['tags'],
                 'mandant': 1,
-                'metadata': json.dumps(metadata_dict),
+                'metadata': metadata,
                 'targetlink': self.substitute_targetlink(data_dict['name'])
             }
-        }]
+        }
+
+    def send_documents(self, body):
+        """
+        Posts a serialized JSON list of documents to the search index.
+        """
+        index_config = self.get_index_config()
 
         info_message = 'Endpoint to call against: {endpoint}'.format(
-            endpoint=self.get_search_index_endpoint()
+            endpoint=index_config.endpoint
         )
         LOGGER.debug(info_message)
 
-        request = requests.post(
-            self.get_search_index_endpoint(),
-            auth=(credentials['username'], credentials['password']),
-            headers={'Content-Type': 'application/json'},
-            data=json.dumps(payload)
-        )
-
-        info_message = "Adding to index: id={id}, name={name}".format(
-            id=data_dict['id'],
-            name=data_dict['name']
-        )
-        LOGGER.debug(info_message)
+        with self.metrics.time(STAGE_POST):
+            request = self.get_index_client().post(
+                index_config.endpoint,
+                auth=index_config.auth,
+                data=body
+            )
 
         info_message = "Service response status code: (code={code})".format(
             code=request.status_code
@@ -512,10 +1405,11 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
         """
         has_open = False
         has_closed = False
+        license_openness_map = self.license_openness_map
 
         for resource in resources_dict:
-            if "license" in resource and resource["license"] in self.license_openness_map:
-                openness = self.license_openness_map[resource["license"]]
+            if "license" in resource and resource["license"] in license_openness_map:
+                openness = license_openness_map[resource["license"]]
                 has_open = has_open or openness
                 has_closed = has_closed or not openness
 
@@ -530,7 +1424,7 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
         for resource in resources_dict:
             if "access_services" in resource:
                 try:
-                    access_service_list = json.loads(resource.get('access_services', '[]'))
+                    access_service_list = self.json_codec.loads(resource.get('access_services', '[]'))
                     if isinstance(access_service_list, list) and len(access_service_list) > 0:
                         has_data_service = True
                         break
@@ -542,12 +1436,65 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
 
         return has_data_service
 
+    def compile_extras_handlers(self):
+        """
+        Returns the dispatch table of extras keys to the handlers filling the metadata_dict,
+        including the configured additional copy and list fields.
+        """
+        mapping = build_extras_mapping(self.extras_copy_fields, self.extras_list_fields)
+        return compile_extras_mapping(mapping, {
+            HANDLER_COPY: self.copy_extra_to_meta,
+            HANDLER_JSON_LIST: self.json_list_extra_to_meta,
+            HANDLER_DATE: self.date_extra_to_meta,
+            HANDLER_MODIFIED: self.modified_extra_to_meta,
+            HANDLER_SPATIAL: self.metrics.timed(STAGE_GEO, self.spatial_to_meta),
+            HANDLER_SPATIAL_BBOX: self.metrics.timed(STAGE_GEO, self.spatial_bbox_to_meta),
+            HANDLER_SPATIAL_CENTROID: self.metrics.timed(STAGE_GEO, self.spatial_centroid_to_meta),
+            HANDLER_APPLICABLE_LEGISLATION: self.applicable_legislation_to_meta,
+            HANDLER_HVD_CATEGORY: self.hvd_category_to_meta
+        })
+
+    @staticmethod
+    def copy_extra_to_meta(metadata_dict, extra, field):
+        """
+        Copies the value of an extra into the given field of the metadata_dict
+        """
+        metadata_dict[field] = extra['value']
+
+    def json_list_extra_to_meta(self, metadata_dict, extra, field):
+        """
+        Parses the JSON list of an extra into the given field of the metadata_dict, if not
+        possible the string is used
+        """
+        try:
+            metadata_dict[field] = self.json_codec.loads(extra['value'])
+        except ValueError:
+            metadata_dict[field] = extra['value']
+
+    def date_extra_to_meta(self, metadata_dict, extra, field):
+        """
+        Normalizes the date of an extra into the given field of the metadata_dict
+        """
+        metadata_dict[field] = self.normalize_date(extra['value'])
+
+    def modified_extra_to_meta(self, metadata_dict, extra, field):
+        """
+        Normalizes the modification date of an extra into the given field of the metadata_dict.
+        The metadata_modified fallback is set to the date if it is not in the future.
+        """
+        self.date_extra_to_meta(metadata_dict, extra, field)
+        dct_modified_date_obj_utc = datetime.datetime.strptime(
+            metadata_dict[field], NORMALIZED_DATE_FORMAT
+            ).utctimetuple()
+        if dct_modified_date_obj_utc < datetime.datetime.now().utctimetuple():
+            metadata_dict['dct_modified_fallback_ckan'] = metadata_dict[field]
+
     def applicable_legislation_to_meta(self, metadata_dict, extra):
         """
         Helper to get GeoJSON from extras->applicable_legislation into a metadata_dict for the given
         extra item
         """
-        applicable_legislation_list = json.loads(extra.get('value'))
+        applicable_legislation_list = self.json_codec.loads(extra.get('value'))
         if isinstance(applicable_legislation_list, list) and HVD_APPLICABLE_LEGISLATION in applicable_legislation_list:
             metadata_dict['has_hvd'] = True
 
@@ -556,7 +1503,7 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
         Helper to get GeoJSON from extras->hvd_category into a metadata_dict for the given
         extra item
         """
-        hvd_categories = json.loads(extra.get('value'))
+        hvd_categories = self.json_codec.loads(extra.get('value'))
         if isinstance(hvd_categories, list):
             metadata_dict['hvd_categories'] = hvd_categories
 
@@ -575,49 +1522,17 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
                 'Polygon'
             )
 
-            spatial_obj = geojson.loads(fixed_spatial_source)
-
-            if spatial_obj.is_valid:
-                # - additional check: does the interior share more
-                #   than 1 point with exterior? --> invalid
-                # - exclude GeoJSON type Point
-                if len(spatial_obj.coordinates) > 1 and isinstance(spatial_obj.coordinates[0], list):
-                    # check all internal polygons
-                    for internal_polygon in spatial_obj.coordinates[1:]:
-                        shared_coordinates_counter = 0
-                        # iterate external coordinates,
-                        # see if >1 matches internal polygon
-                        for coord_external in spatial_obj.coordinates[0]:
-                            if coord_external in internal_polygon:
-                                shared_coordinates_counter += 1
-                            if shared_coordinates_counter > 1:
-                                # skip spatial coordinates
-                                raise ValueError('More than one shared coordinate!')
-
-                # extract string to JSON and remove potential duplicate coordinates using shapely
-                # https://stackoverflow.com/questions/49330030/remove-a-duplicate-point-from-polygon-in-shapely?rq=1
-                # dump and load to get unicode strings in dicts.
-                if 'boundingbox' not in metadata_dict:
-                    metadata_dict['boundingbox'] = json.loads(
-                        geojson.dumps(shape(spatial_obj).simplify(0))
-                    )
-
-                # calculate area covered by the the shape
-                spatial_area = self.calculate_geojson_area(spatial_obj)
-
-                metadata_dict['spatial_area'] = spatial_area
+            spatial_fields = self.get_spatial_cache().get_or_derive(
+                'spatial:' + self.boundingbox_representation.signature,
+                fixed_spatial_source,
+                self.derive_spatial_fields
+            )
 
-                # calculate center of the shape
-                if 'spatial_center' not in metadata_dict:
-                    spatial_center_x, spatial_center_y = self.calculate_geojson_center(
-                        spatial_obj
-                    )
-                    metadata_dict['spatial_center'] = {
-                        "lat": spatial_center_y,
-                        "lon": spatial_center_x
-                    }
-            else:
-                raise ValueError(spatial_obj.errors())
+            if 'boundingbox' not in metadata_dict:
+                metadata_dict['boundingbox'] = spatial_fields['boundingbox']
+            metadata_dict['spatial_area'] = spatial_fields['spatial_area']
+            if 'spatial_center' not in metadata_dict:
+                metadata_dict['spatial_center'] = spatial_fields['spatial_center']
         except Exception as ex:
             info_message = "invalid GeoJSON in extras->spatial "
             info_message += "at dataset: " + metadata_dict['name']
@@ -628,19 +1543,68 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
             info_message += str(ex.args)
             LOGGER.info(info_message)
 
+    def derive_spatial_fields(self, spatial_source):
+        """
+        Returns the boundingbox, spatial_area and spatial_center fields of a GeoJSON value
+        from extras->spatial. Raises a ValueError for invalid values.
+        """
+        spatial_obj = geojson.loads(spatial_source)
+
+        if not spatial_obj.is_valid:
+            raise ValueError(spatial_obj.errors())
+
+        # - additional check: does the interior share more
+        #   than 1 point with exterior? --> invalid
+        # - exclude GeoJSON type Point
+        if len(spatial_obj.coordinates) > 1 and isinstance(spatial_obj.coordinates[0], list):
+            # check all internal polygons
+            if shares_exterior_coordinates(spatial_obj.coordinates):
+                # skip spatial coordinates
+                raise ValueError('More than one shared coordinate!')
+
+        # bounding box, area and center share one shapely geometry
+        spatial_features = SpatialFeatures(spatial_obj, self.boundingbox_representation)
+        spatial_center_x, spatial_center_y = spatial_features.center()
+        return {
+            'boundingbox': spatial_features.boundingbox(),
+            # calculate area covered by the the shape
+            'spatial_area': spatial_features.area(),
+            'spatial_center': {
+                "lat": spatial_center_y,
+                "lon": spatial_center_x
+            }
+        }
+
     def spatial_bbox_to_meta(self, metadata_dict, extra):
         """
         Helper to get GeoJSON from extras->spatial_bbox into a metadata_dict for the given
         extra item
         """
-        spatial_bbox = geojson.loads(extra['value'])
-        if spatial_bbox.is_valid and isinstance(spatial_bbox, geojson.Polygon):
-            metadata_dict['boundingbox'] = self.calculate_geojson_boundingbox(spatial_bbox)
+        bbox_fields = self.get_spatial_cache().get_or_derive(
+            'spatial_bbox:' + self.boundingbox_representation.signature,
+            extra['value'],
+            self.derive_bbox_fields
+        )
+        if bbox_fields is not None:
+            metadata_dict['boundingbox'] = bbox_fields['boundingbox']
             if 'spatial_area' not in metadata_dict:
-                metadata_dict['spatial_area'] = self.calculate_geojson_area(spatial_bbox)
+                metadata_dict['spatial_area'] = bbox_fields['spatial_area']
         else:
             LOGGER.debug("The value for 'bbox' is no valid GeoJSON or is not from type Polygon.")
 
+    def derive_bbox_fields(self, bbox_source):
+        """
+        Returns the boundingbox and spatial_area fields of a GeoJSON value from
+        extras->spatial_bbox, or None if the value is no valid Polygon.
+        """
+        spatial_bbox = geojson.loads(bbox_source)
+        if spatial_bbox.is_valid and isinstance(spatial_bbox, geojson.Polygon):
+            return {
+                'boundingbox': self.calculate_geojson_boundingbox(spatial_bbox),
+                'spatial_area': self.calculate_geojson_area(spatial_bbox)
+            }
+        return None
+
     def spatial_centroid_to_meta(self, metadata_dict, extra):
         """
         Helper to get GeoJSON from extras->spatial_centroid into a metadata_dict for the given
@@ -658,63 +1622,14 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
         """
         Normalizes date strings
         """
-        # formats equal to govdata-DateUtil Java class
-        dateformats = [
-            "yyyy-MM-dd'T'HH:mm:ssX",
-            "yyyy-MM-dd'T'HH:mm:ssz",
-            "yyyy-MM-dd'T'HH:mm:ss",
-            "yyyy-MM-dd HH:mm:ssX",
-            "yyyy-MM-dd HH:mm:ssz",
-            "yyyy-MM-dd HH:mm:ss X",
-            "yyyy-MM-dd HH:mm:ss z",
-            "yyyy-MM-dd HH:mm:ss",
-            "yyyy-MM-dd",
-            "dd.MM.yyyy'T'HH:mm:ssX",
-            "dd.MM.yyyy'T'HH:mm:ssz",
-            "dd.MM.yyyy'T'HH:mm:ss",
-            "dd.MM.yyyy HH:mm:ss",
-            "dd.MM.yyyy"
-        ]
-
-        for dateformat in dateformats:
-            try:
-                parseddate = datetime.datetime.strptime(
-                    datestr,
-                    self.transform_date_notation(dateformat)
-                )
-
-                return parseddate.strftime(NORMALIZED_DATE_FORMAT)
-            except ValueError:
-                pass
-
-        # Use dateutil as fallback, e.g. for time offset with colon: +02:00
-        parseddate = parse(datestr)
-        return parseddate.strftime(NORMALIZED_DATE_FORMAT)
+        return self.date_normalizer.normalize(datestr)
 
     @classmethod
     def transform_date_notation(cls, notation):
         """
         Transforms date notations
         """
-        translations = [
-            ["yyyy", "%Y"],
-            ["MM", "%m"],
-            ["dd", "%d"],
-            ["HH", "%H"],
-            ["mm", "%M"],
-            ["ss", "%S"],
-            ["'T'", "T"],
-            ["z", "%Z"],
-            ["X", "%z"]
-        ]
-
-        for translation in translations:
-            notation = notation.replace(
-                translation[0],
-                translation[1]
-            )
-
-        return notation
+        return transform_date_notation(notation)
 
     @classmethod
     def resolve_data_dict(cls, document_id, context=None):
@@ -741,27 +1656,64 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
 
             raise Exception(not_found)
 
-    def delete_from_index(self, document_id, context=None):
+    def resolve_package_id(self, document_id):
+        """
+        Resolves the id of a dataset by id or name without loading the whole dataset
+        """
+        try:
+            return self.package_id_resolver.resolve(document_id)
+        except Exception as not_found:
+            log_message = "Dataset for id {id} was not found".format(
+                id=document_id
+            )
+            LOGGER.error(log_message)
+
+            raise Exception(not_found)
+
+    def delete_from_index(self, document_id, context=None):  # pylint: disable=unused-argument
         """
-        Deletes a dataset from the search index.
+        Deletes a dataset from the search index and returns its resolved id.
         """
         self.assert_endpoint_configuration(
-            self.search_index_endpoint
+            self.get_search_index_endpoint()
         )
 
-        credentials = self.get_search_index_credentials()
+        # resolve the id, because CKAN gives us sometimes the name instead of the id
+        real_package_id = self.resolve_package_id(document_id)
+
+        self.remove_document(real_package_id)
+
+        info_message = "Deleting from index: (id={id}, requested={requested})".format(
+            id=real_package_id, requested=document_id
+        )
+        LOGGER.debug(info_message)
+
+        return real_package_id
 
-        # resolve package dict, because CKAN gives us sometimes the name instead of the id
-        package_dict = self.resolve_data_dict(document_id, context)
-        real_package_id = package_dict['id']
+    def remove_document(self, package_id):
+        """
+        Sends the deletion of a dataset with a resolved id to the search index.
+        """
+        # a queued or stored document must not be sent after the deletion
+        if self.batch_buffer is not None:
+            self.batch_buffer.discard(package_id)
+        self.clear_deferred(package_id)
+
+        self.send_deletion(package_id)
+
+    def send_deletion(self, package_id):
+        """
+        Sends a DELETE request for a dataset id to the search index.
+        """
+        index_config = self.get_index_config()
 
         payload = [{
-            'indexName': self.search_index_name,
+            'indexName': index_config.index_name,
             'type': None,
             'version': None,
             'displayName': None,
             'document': {
-                'id': real_package_id,
+                'id': package_id,
                 'title': None,
                 'sprache': None,
                 'sections': [],
@@ -772,21 +1724,17 @@ class SearchIndexHookPlugin(p.SingletonPlugin):
         }]
 
         info_message = 'Endpoint to call against: {endpoint}'.format(
-            endpoint=self.get_search_index_endpoint() + real_package_id
+            endpoint=index_config.endpoint + package_id
         )
         LOGGER.debug(info_message)
 
-        request = requests.delete(
-            self.get_search_index_endpoint() + real_package_id,
-            auth=(credentials['username'], credentials['password']),
-            headers={'Content-Type': 'application/json'},
-            data=json.dumps(payload)
-        )
+        with self.metrics.time(STAGE_DELETE):
+            request = self.get_index_client().delete(
+                index_config.endpoint + package_id,
+                auth=index_config.auth,
+                data=self.json_codec.dumps(payload)
+            )
 
-        info_message = "Deleting from index: (id={id}, name={name})".format(
-            id=real_package_id, name=package_dict['name']
-        )
-        LOGGER.debug(info_message)
         info_message = "Service reponse status code: (code={code})".format(
             code=request.status_code
         )
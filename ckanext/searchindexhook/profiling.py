@@ -0,0 +1,161 @@
+"""
+Module for recording the details of datasets whose indexing takes unusually long.
+"""
+import cProfile
+import json
+import logging
+import logging.handlers
+import os
+import re
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# extras whose GeoJSON vertices are counted
+GEOMETRY_EXTRAS = ('spatial', 'spatial_bbox', 'spatial_centroid')
+
+
+def count_vertices(coordinates):
+    """
+    Returns the number of positions in nested GeoJSON coordinates.
+    """
+    if not isinstance(coordinates, list) or not coordinates:
+        return 0
+    if not isinstance(coordinates[0], list):
+        return 1
+    return sum(count_vertices(item) for item in coordinates)
+
+
+def geometry_vertices(geometry):
+    """
+    Returns the number of positions of a GeoJSON geometry, feature or collection.
+    """
+    if not isinstance(geometry, dict):
+        return 0
+    if 'geometry' in geometry:
+        return geometry_vertices(geometry['geometry'])
+    if 'features' in geometry:
+        return sum(geometry_vertices(feature) for feature in geometry['features'])
+    if 'geometries' in geometry:
+        return sum(geometry_vertices(item) for item in geometry['geometries'])
+    return count_vertices(geometry.get('coordinates'))
+
+
+def build_slow_logger(path, max_bytes, backup_count):
+    """
+    Returns the logger of the slow documents, writing one JSON line per document to a
+    rotating file if a path is given and to the module logger otherwise.
+    """
+    if not path:
+        return LOGGER
+    slow_logger = logging.getLogger(__name__ + '.slow')
+    slow_logger.setLevel(logging.INFO)
+    slow_logger.propagate = False
+    if not slow_logger.handlers:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_logger.addHandler(handler)
+    return slow_logger
+
+
+class SlowDocumentProfiler:
+    """
+    Measures the indexing of single datasets and records the datasets taking at least
+    ``threshold`` seconds with the durations of their stages, the number of resources,
+    extras and geometry vertices and the size of the document. The details are only
+    gathered for these outliers.
+
+    If ``cprofile_dir`` is set, every indexing runs under cProfile and the statistics of
+    the outliers are dumped to that directory. This slows down the indexing considerably.
+    """
+
+    def __init__(self, threshold, log_path=None, max_bytes=10485760, backup_count=5, cprofile_dir=None,
+                 loads=json.loads, dumps=json.dumps):
+        self.threshold = threshold
+        self.cprofile_dir = cprofile_dir
+        self.loads = loads
+        self.dumps = dumps
+        self.logger = build_slow_logger(log_path, max_bytes, backup_count)
+
+    def profile(self, metrics, data_dict, index):
+        """
+        Calls ``index()``, which returns the indexed document, and records the dataset if
+        the call took longer than the threshold. Errors of the call are passed on.
+        """
+        profiler = cProfile.Profile() if self.cprofile_dir else None
+        document = None
+        error = None
+        start = time.perf_counter()
+        with metrics.tracing() as stages:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                document = index()
+            except Exception as index_error:
+                error = index_error
+                raise
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                duration = time.perf_counter() - start
+                if duration >= self.threshold:
+                    self.report(data_dict, document, duration, stages, profiler, error)
+        return document
+
+    def report(self, data_dict, document, duration, stages, profiler=None, error=None):
+        """
+        Logs the details of a slow dataset as one JSON line.
+        """
+        try:
+            record = self.describe(data_dict, document)
+            record['duration_ms'] = round(duration * 1000.0, 3)
+            record['stages_ms'] = {
+                stage: round(seconds * 1000.0, 3) for stage, seconds in sorted(stages.items())
+            }
+            if error is not None:
+                record['error'] = type(error).__name__
+            if profiler is not None:
+                record['profile'] = self.dump_profile(profiler, record['id'])
+            self.logger.warning(json.dumps(record, sort_keys=True))
+        except Exception as report_error:  # pylint: disable=broad-except
+            LOGGER.warning('Recording the slow dataset {id} failed: {error}'.format(
+                id=data_dict.get('id'), error=report_error
+            ))
+
+    def describe(self, data_dict, document):
+        """
+        Returns the id, name and size figures of a dataset and its document.
+        """
+        record = {'id': data_dict.get('id'), 'name': data_dict.get('name')}
+        try:
+            data_dict_from_json = self.loads(data_dict.get('data_dict') or '{}')
+        except ValueError:
+            data_dict_from_json = {}
+        record['resources'] = len(data_dict_from_json.get('resources') or [])
+        extras = data_dict_from_json.get('extras') or []
+        record['extras'] = len(extras)
+
+        vertices = {}
+        for extra in extras:
+            if extra.get('key') in GEOMETRY_EXTRAS and extra.get('value'):
+                try:
+                    vertices[extra['key']] = geometry_vertices(self.loads(extra['value']))
+                except ValueError:
+                    vertices[extra['key']] = None
+        record['vertices'] = vertices
+
+        if document is not None:
+            record['payload_bytes'] = len(self.dumps(document).encode('utf-8'))
+        return record
+
+    def dump_profile(self, profiler, package_id):
+        """
+        Writes the cProfile statistics of a slow dataset and returns the path.
+        """
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', str(package_id))
+        file_name = '{name}-{time}.prof'.format(name=name, time=int(time.time() * 1000))
+        path = os.path.join(self.cprofile_dir, file_name)
+        profiler.dump_stats(path)
+        return path
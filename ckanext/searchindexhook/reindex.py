@@ -0,0 +1,297 @@
+"""
+Module for reindexing datasets into the search index without rebuilding the Solr index.
+"""
+import collections
+import concurrent.futures
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from ckan import model
+from ckan.lib.search.index import escape_xml_illegal_chars
+from ckan.plugins import toolkit as tk
+
+from ckanext.searchindexhook.outbox import DELIVERY_ERRORS
+
+LOGGER = logging.getLogger(__name__)
+
+PACKAGE_SHOW_CONTEXT = {
+    'ignore_auth': True,
+    'validate': False,
+    'use_cache': False
+}
+
+# plugin of a worker process, set by the pool initializer
+_worker_plugin = None
+
+
+def query_dataset_ids(types=None, organizations=None, modified_since=None, after_id=None, chunk_size=100):
+    """
+    Yields the ids of the datasets which are not deleted in chunks, ordered by id. Every
+    chunk is loaded with its own query starting after the last id of the previous one.
+    """
+    query = model.Session.query(model.Package.id).filter(model.Package.state != 'deleted')
+    if types:
+        query = query.filter(model.Package.type.in_(types))
+    if organizations:
+        organization_ids = model.Session.query(model.Group.id).filter(
+            model.Group.is_organization.is_(True),
+            model.Group.name.in_(organizations) | model.Group.id.in_(organizations)
+        )
+        query = query.filter(model.Package.owner_org.in_(organization_ids.scalar_subquery()))
+    if modified_since:
+        query = query.filter(model.Package.metadata_modified >= modified_since)
+
+    while True:
+        chunk = query
+        if after_id is not None:
+            chunk = chunk.filter(model.Package.id > after_id)
+        package_ids = [row[0] for row in chunk.order_by(model.Package.id).limit(chunk_size)]
+        # do not keep a connection checked out while the chunk is processed
+        model.Session.remove()
+        if not package_ids:
+            return
+        yield package_ids
+        after_id = package_ids[-1]
+
+
+def build_index_dict(pkg_dict, dumps=json.dumps):
+    """
+    Returns the dict CKAN passes to before_dataset_index for a package_show result,
+    limited to the fields read by the search index hook. The validated data dict used
+    for the Solr index is not added. The data dict is serialized with ``dumps``.
+    """
+    pkg_dict.pop('tracking_summary', None)
+    for resource in pkg_dict.get('resources', []):
+        resource.pop('tracking_summary', None)
+
+    index_dict = dict(pkg_dict)
+    index_dict['data_dict'] = dumps(pkg_dict)
+    index_dict['tags'] = [tag['name'] for tag in pkg_dict.get('tags', []) if not tag.get('vocabulary_id')]
+    index_dict['groups'] = [group['name'] for group in pkg_dict.get('groups', [])]
+    for key in ('title', 'notes'):
+        if index_dict.get(key):
+            index_dict[key] = escape_xml_illegal_chars(index_dict[key])
+    if index_dict.get('title'):
+        index_dict['title'] = index_dict['title'].lstrip()
+    index_dict['metadata_created'] += 'Z'
+    index_dict['metadata_modified'] += 'Z'
+    return index_dict
+
+
+def init_worker(plugin):
+    """
+    Prepares a forked worker process. The database connections of the parent process are
+    dropped without closing them, so they stay usable in the parent.
+    """
+    global _worker_plugin  # pylint: disable=global-statement
+    _worker_plugin = plugin
+    engine = getattr(model.meta, 'engine', None)
+    if engine is not None:
+        engine.dispose(close=False)
+    model.Session.registry.clear()
+
+
+def build_documents(package_ids, plugin=None):
+    """
+    Builds the serialized documents of the given datasets with the transformation of
+    add_to_index. Returns the (package_id, document) pairs and the ids of the datasets
+    whose document could not be built.
+    """
+    plugin = plugin or _worker_plugin
+    documents = []
+    failed = []
+    for package_id in package_ids:
+        try:
+            context = dict(PACKAGE_SHOW_CONTEXT, model=model)
+            pkg_dict = tk.get_action('package_show')(context, {'id': package_id})
+            document = plugin.build_index_document(build_index_dict(pkg_dict, plugin.json_codec.dumps))
+            documents.append((package_id, plugin.json_codec.dumps(document)))
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.warning('Building the document of dataset {id} failed: {error}'.format(
+                id=package_id, error=error
+            ))
+            failed.append(package_id)
+    model.Session.remove()
+    return documents, failed
+
+
+class Checkpoint:
+    """
+    Stores the last dataset id up to which all datasets were delivered, so an interrupted
+    reindex can resume after it. The file is replaced atomically.
+    """
+
+    def __init__(self, path, filters):
+        self.path = path
+        self.filters = filters
+
+    def load(self):
+        """
+        Returns the last delivered dataset id or None. Raises a ValueError if the
+        checkpoint was written with other filters.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint['filters'] != self.filters:
+            raise ValueError('The checkpoint {path} was written with other filters: {filters}'.format(
+                path=self.path, filters=checkpoint['filters']
+            ))
+        return checkpoint['last_id']
+
+    def save(self, last_id, stats):
+        """
+        Stores the last delivered dataset id.
+        """
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump({
+                'last_id': last_id,
+                'filters': self.filters,
+                'stats': dict(stats),
+                'updated': time.time()
+            }, checkpoint_file)
+        os.replace(temporary_path, self.path)
+
+
+class Reindexer:
+    """
+    Sends all datasets matching the filters to the search index. Documents are built in a
+    pool of forked processes and the chunks are sent over concurrent connections, like a
+    replay of the outbox: one bulk request per chunk, preceded by deletions unless upsert
+    mode is enabled.
+
+    Chunks that could not be delivered are stored in the outbox if one is configured.
+    Otherwise the checkpoint does not advance past them.
+    """
+
+    def __init__(self, plugin, types=None, organizations=None, modified_since=None,
+                 processes=None, connections=4, chunk_size=100, checkpoint_path=None):
+        self.plugin = plugin
+        self.types = list(types or plugin.get_indexable_data_types())
+        self.organizations = list(organizations or [])
+        self.modified_since = modified_since
+        self.processes = processes if processes is not None else os.cpu_count()
+        self.connections = connections
+        self.chunk_size = chunk_size
+        self.checkpoint = None
+        if checkpoint_path:
+            self.checkpoint = Checkpoint(checkpoint_path, {
+                'types': self.types,
+                'organizations': self.organizations,
+                'modified_since': modified_since.isoformat() if modified_since else None
+            })
+        self.stats = collections.Counter()
+
+        self._finished_chunks = {}
+        self._next_chunk = 0
+        self._blocked = False
+
+    def run(self, resume=False):
+        """
+        Reindexes the datasets and returns the statistics. With ``resume`` the datasets up
+        to the id of the checkpoint are skipped.
+        """
+        after_id = self.checkpoint.load() if resume and self.checkpoint else None
+        if after_id is not None:
+            LOGGER.info('Resuming the reindex after dataset {id}'.format(id=after_id))
+
+        chunks = query_dataset_ids(
+            self.types, self.organizations, self.modified_since, after_id, self.chunk_size
+        )
+        builder = None
+        if self.processes > 1:
+            builder = concurrent.futures.ProcessPoolExecutor(
+                self.processes,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=init_worker,
+                initargs=(self.plugin,)
+            )
+        sender = concurrent.futures.ThreadPoolExecutor(self.connections)
+        max_in_flight = max(self.processes, 1) + self.connections
+        in_flight = {}
+
+        try:
+            for index, package_ids in enumerate(chunks):
+                self.stats['datasets'] += len(package_ids)
+                if builder is None:
+                    self._built(index, package_ids[-1], build_documents(package_ids, self.plugin),
+                                sender, in_flight)
+                else:
+                    future = builder.submit(build_documents, package_ids)
+                    in_flight[future] = ('build', index, package_ids[-1], len(package_ids))
+                while len(in_flight) >= max_in_flight:
+                    self._wait(in_flight, sender)
+            while in_flight:
+                self._wait(in_flight, sender)
+        finally:
+            if builder is not None:
+                builder.shutdown(cancel_futures=True)
+            sender.shutdown()
+
+        return self.stats
+
+    def _wait(self, in_flight, sender):
+        done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            stage, index, last_id, size = in_flight.pop(future)
+            if stage == 'build':
+                self._built(index, last_id, future.result(), sender, in_flight)
+            else:
+                outcome = future.result()
+                self.stats[outcome] += size
+                self._finish_chunk(index, last_id, outcome != 'undelivered')
+
+    def _built(self, index, last_id, result, sender, in_flight):
+        documents, failed = result
+        if failed:
+            self.stats['failed'] += len(failed)
+        if documents:
+            in_flight[sender.submit(self.send_chunk, documents)] = ('send', index, last_id, len(documents))
+        else:
+            self._finish_chunk(index, last_id, True)
+
+    def send_chunk(self, documents):
+        """
+        Sends the documents of a chunk. Returns 'delivered', 'deferred' if they were stored
+        in the outbox, or 'undelivered'.
+        """
+        try:
+            if not self.plugin.uses_upsert():
+                for package_id, _ in documents:
+                    self.plugin.send_deletion(package_id)
+            self.plugin.send_documents('[' + ','.join(document for _, document in documents) + ']')
+        except DELIVERY_ERRORS as error:
+            self.plugin.log_delivery_error(error)
+            if self.plugin.get_outbox() is None:
+                return 'undelivered'
+            self.plugin.defer_serialized_documents(documents)
+            return 'deferred'
+
+        # an older deferred document must not be replayed over the reindexed one
+        outbox = self.plugin.get_outbox()
+        if outbox is not None:
+            outbox.discard_many([package_id for package_id, _ in documents])
+        return 'delivered'
+
+    def _finish_chunk(self, index, last_id, succeeded):
+        self._finished_chunks[index] = (last_id, succeeded)
+        advanced = None
+        while not self._blocked and self._next_chunk in self._finished_chunks:
+            chunk_last_id, chunk_succeeded = self._finished_chunks.pop(self._next_chunk)
+            if not chunk_succeeded:
+                self._blocked = True
+                break
+            advanced = chunk_last_id
+            self._next_chunk += 1
+
+        if advanced is not None:
+            LOGGER.info('Reindexed all datasets up to {id}, {delivered} documents delivered'.format(
+                id=advanced, delivered=self.stats['delivered']
+            ))
+            if self.checkpoint:
+                self.checkpoint.save(advanced, self.stats)
@@ -0,0 +1,223 @@
+"""
+Module for the retries and the circuit breaker of the calls against the search index.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+
+from ckanext.searchindexhook import deadline
+from ckanext.searchindexhook.deadline import DeadlineExceeded
+
+LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def is_server_failure(response):
+    """
+    Returns True if a response shows that the endpoint is overloaded or failing.
+    """
+    return response.status_code >= 500 or response.status_code == 429
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling the search index while the circuit is open. It is a
+    ConnectionError, so the operation is handled like one to an unavailable endpoint.
+    """
+
+
+class RetryPolicy:
+    """
+    Bounded retries of responses with a transient status, e.g. 503 or 429. Before retry
+    ``n`` (starting at 0) a random time between 0 and ``backoff * 2 ** n`` seconds, at most
+    ``max_backoff``, is waited ("full jitter"), so that many workers do not retry in step.
+    A Retry-After header in seconds is honoured up to ``max_backoff``. Every retry is
+    passed to ``on_retry(status)``. No retry is made if the wait would outlast the
+    deadline of the calling thread.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.1, max_backoff=2.0, statuses=DEFAULT_RETRY_STATUSES,
+                 on_retry=None, rng=None, sleep=time.sleep):
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.on_retry = on_retry
+        self.random = rng or random.Random()
+        self.sleep = sleep
+
+    def is_retryable(self, response):
+        """
+        Returns True if the status of the response is transient.
+        """
+        return response.status_code in self.statuses
+
+    def delay(self, retry, response=None):
+        """
+        Returns the seconds to wait before the given retry.
+        """
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), self.max_backoff)
+            except ValueError:
+                pass  # HTTP dates are not honoured
+        return self.random.uniform(0, min(self.max_backoff, self.backoff * (2 ** retry)))
+
+    def call(self, send):
+        """
+        Calls ``send()`` until it returns a response without a transient status or the
+        attempts are used up, and returns the last response.
+        """
+        response = send()
+        for retry in range(self.max_attempts - 1):
+            if not self.is_retryable(response):
+                break
+            delay = self.delay(retry, response)
+            left = deadline.remaining()
+            if left is not None and delay >= left:
+                break
+            LOGGER.debug('Retrying after status {status} in {delay:.3f}s'.format(
+                status=response.status_code, delay=delay
+            ))
+            if self.on_retry is not None:
+                self.on_retry(response.status_code)
+            self.sleep(delay)
+            response = send()
+        return response
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of the search index endpoint. After ``failure_threshold`` failed calls
+    in a row the circuit opens and calls fail immediately with a CircuitOpenError. After
+    ``reset_timeout`` seconds it becomes half-open and lets ``half_open_calls`` trial calls
+    through: if one succeeds, the circuit closes, if one fails, it opens again.
+
+    Transitions are passed to ``on_change(state)``. The state is kept per process.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, half_open_calls=1, on_change=None,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = max(half_open_calls, 1)
+        self.on_change = on_change
+        self.clock = clock
+
+        self._reset()
+
+    def _reset(self):
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trials = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        """
+        Starts a forked process with a closed circuit and an unlocked lock.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+
+    @property
+    def state(self):
+        """
+        Returns the current state, an open circuit is reported half-open after the timeout.
+        """
+        self._check_fork()
+        with self._lock:
+            if self._state == STATE_OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return STATE_HALF_OPEN
+            return self._state
+
+    def _change(self, state):
+        if state == self._state:
+            return
+        LOGGER.warning('Circuit of the search index endpoint is {state}'.format(
+            state=state.replace('_', '-')
+        ))
+        self._state = state
+        if self.on_change is not None:
+            self.on_change(state)
+
+    def before_call(self):
+        """
+        Raises a CircuitOpenError if the call must not be made.
+        """
+        self._check_fork()
+        with self._lock:
+            if self._state == STATE_OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(
+                        'Circuit is open after {count} failed calls'.format(count=self._failures)
+                    )
+                self._change(STATE_HALF_OPEN)
+                self._trials = 0
+            if self._state == STATE_HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    raise CircuitOpenError('Circuit is half-open, waiting for the trial calls')
+                self._trials += 1
+
+    def record_success(self):
+        """
+        Closes the circuit after a successful call.
+        """
+        self._check_fork()
+        with self._lock:
+            self._failures = 0
+            self._change(STATE_CLOSED)
+
+    def record_failure(self):
+        """
+        Counts a failed call and opens the circuit at the threshold or after a failed trial.
+        """
+        self._check_fork()
+        with self._lock:
+            self._failures += 1
+            if self._state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+                self._change(STATE_OPEN)
+
+    def release_trial(self):
+        """
+        Gives back a trial call which ended without an outcome of the endpoint.
+        """
+        with self._lock:
+            if self._state == STATE_HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def call(self, send, is_failure=is_server_failure):
+        """
+        Calls ``send()`` if the circuit allows it and records its outcome. Raised request
+        errors and responses for which ``is_failure(response)`` is True are failures.
+        """
+        self.before_call()
+        try:
+            response = send()
+        except DeadlineExceeded:
+            # the call was not made, this says nothing about the endpoint
+            self.release_trial()
+            raise
+        except requests.exceptions.RequestException:
+            self.record_failure()
+            raise
+        except Exception:
+            self.release_trial()
+            raise
+        if is_failure(response):
+            self.record_failure()
+        else:
+            self.record_success()
+        return response
@@ -0,0 +1,85 @@
+"""
+Module for resolving dataset names to dataset ids.
+"""
+import collections
+import logging
+import re
+import threading
+
+from ckan import model
+
+LOGGER = logging.getLogger(__name__)
+
+UUID_PATTERN = re.compile(
+    r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE
+)
+
+
+def query_package_id(name_or_id):
+    """
+    Returns the id of the dataset with the given name or id, or None if there is no such
+    dataset. Only the id column is loaded.
+    """
+    row = model.Session.query(model.Package.id).filter(
+        (model.Package.name == name_or_id) | (model.Package.id == name_or_id)
+    ).first()
+    return row[0] if row else None
+
+
+class PackageIdResolver:
+    """
+    Resolves dataset names to ids. Ids in UUID format are returned as they are, names are
+    looked up with a single column query and kept in a bounded LRU cache.
+    """
+
+    def __init__(self, max_size=10000, lookup=query_package_id):
+        self.max_size = max_size
+        self.lookup = lookup
+
+        self._ids_by_name = collections.OrderedDict()
+        self._names_by_id = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, name_or_id):
+        """
+        Returns the dataset id for a name or id. Raises a LookupError for unknown datasets.
+        """
+        name_or_id = name_or_id.strip()
+        if UUID_PATTERN.match(name_or_id):
+            return name_or_id
+
+        with self._lock:
+            package_id = self._ids_by_name.get(name_or_id)
+            if package_id is not None:
+                self._ids_by_name.move_to_end(name_or_id)
+                return package_id
+
+        package_id = self.lookup(name_or_id)
+        if package_id is None:
+            raise LookupError('Dataset for id {id} was not found'.format(id=name_or_id))
+        if package_id != name_or_id:
+            self.remember(name_or_id, package_id)
+        return package_id
+
+    def remember(self, name, package_id):
+        """
+        Stores the current name of a dataset. A former name of the same dataset is dropped,
+        so renamed datasets are not resolved by their old name.
+        """
+        with self._lock:
+            former_name = self._names_by_id.get(package_id)
+            if former_name is not None and former_name != name:
+                self._ids_by_name.pop(former_name, None)
+            replaced_id = self._ids_by_name.pop(name, None)
+            if replaced_id is not None and replaced_id != package_id:
+                self._names_by_id.pop(replaced_id, None)
+
+            self._ids_by_name[name] = package_id
+            self._names_by_id[package_id] = name
+            while len(self._ids_by_name) > self.max_size:
+                evicted_name, evicted_id = self._ids_by_name.popitem(last=False)
+                if self._names_by_id.get(evicted_id) == evicted_name:
+                    del self._names_by_id[evicted_id]
+
+    def __len__(self):
+        return len(self._ids_by_name)
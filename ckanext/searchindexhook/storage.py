@@ -0,0 +1,38 @@
+"""
+Module with helpers for the local SQLite databases of the search index hook.
+"""
+import contextlib
+import os
+import sqlite3
+
+# errors of the local databases, e.g. a locked database, a full disk or missing permissions
+STORE_ERRORS = (sqlite3.Error, OSError)
+
+
+def prepare_database(path, schema):
+    """
+    Creates the directory of the database, switches the database to WAL mode and runs the
+    given schema statements.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with connect(path) as connection:
+        connection.execute('PRAGMA journal_mode=WAL')
+        for statement in schema:
+            connection.execute(statement)
+
+
+@contextlib.contextmanager
+def connect(path):
+    """
+    Yields a connection and commits and closes it afterwards. A new connection per call
+    keeps the databases usable from threads and forked processes.
+    """
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with connection:
+            yield connection
+    finally:
+        connection.close()
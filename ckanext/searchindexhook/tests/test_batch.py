@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the batching of the ckanext.searchindexhook extension.
+'''
+import json
+import threading
+import time
+import unittest
+
+from mock import Mock, patch
+
+from ckanext.searchindexhook.batch import BatchBuffer
+
+
+class TestBatchBuffer(unittest.TestCase):
+
+    def test_flush_sends_all_documents_as_one_list(self):
+        sender = Mock()
+        buffer = BatchBuffer(sender, max_wait=0)
+
+        buffer.add('id-1', {'document': {'id': 'id-1'}})
+        buffer.add('id-2', {'document': {'id': 'id-2'}})
+        buffer.flush()
+
+        sender.assert_called_once()
+        self.assertEqual(
+            [{'document': {'id': 'id-1'}}, {'document': {'id': 'id-2'}}],
+            json.loads(sender.call_args[0][0])
+        )
+        self.assertEqual(0, len(buffer))
+
+    def test_flush_without_documents_does_not_send(self):
+        sender = Mock()
+        buffer = BatchBuffer(sender, max_wait=0)
+
+        buffer.flush()
+
+        sender.assert_not_called()
+
+    def test_document_count_triggers_flush(self):
+        sender = Mock()
+        buffer = BatchBuffer(sender, max_documents=2, max_wait=0)
+
+        buffer.add('id-1', {'id': 'id-1'})
+        sender.assert_not_called()
+        buffer.add('id-2', {'id': 'id-2'})
+
+        sender.assert_called_once()
+
+    def test_byte_size_triggers_flush(self):
+        sender = Mock()
+        buffer = BatchBuffer(sender, max_bytes=10, max_wait=0)
+
+        buffer.add('id-1', {'metadata': 'more than ten bytes'})
+
+        sender.assert_called_once()
+
+    def test_time_window_triggers_flush(self):
+        sender = Mock()
+        buffer = BatchBuffer(sender, max_wait=0.05)
+
+        buffer.add('id-1', {'id': 'id-1'})
+        for _ in range(100):
+            if sender.called:
+                break
+            time.sleep(0.01)
+
+        sender.assert_called_once()
+
+    def test_later_document_replaces_pending_one(self):
+        sender = Mock()
+        buffer = BatchBuffer(sender, max_wait=0)
+
+        buffer.add('id-1', {'version': 1})
+        buffer.add('id-1', {'version': 2})
+        buffer.flush()
+
+        self.assertEqual([{'version': 2}], json.loads(sender.call_args[0][0]))
+
+    def test_discard_removes_pending_document(self):
+        sender = Mock()
+        buffer = BatchBuffer(sender, max_wait=0)
+
+        buffer.add('id-1', {'id': 'id-1'})
+        buffer.discard('id-1')
+        buffer.flush()
+
+        sender.assert_not_called()
+
+    def test_documents_are_added_while_a_batch_is_sent(self):
+        sending = threading.Event()
+        release = threading.Event()
+
+        def sender(body):
+            sending.set()
+            release.wait(5)
+
+        buffer = BatchBuffer(Mock(side_effect=sender), max_wait=0)
+        buffer.add('id-1', {'id': 'id-1'})
+        flushing = threading.Thread(target=buffer.flush)
+        flushing.start()
+        sending.wait(5)
+
+        try:
+            adding = threading.Thread(target=buffer.add, args=('id-2', {'id': 'id-2'}))
+            adding.start()
+            adding.join(1)
+            self.assertFalse(adding.is_alive())
+            self.assertEqual(1, len(buffer))
+        finally:
+            release.set()
+            flushing.join(5)
+
+    def test_discard_waits_for_the_batch_being_sent(self):
+        sending = threading.Event()
+        release = threading.Event()
+        events = []
+
+        def sender(body):
+            sending.set()
+            release.wait(5)
+            events.append('sent')
+
+        buffer = BatchBuffer(Mock(side_effect=sender), max_wait=0)
+        buffer.add('id-1', {'id': 'id-1'})
+        flushing = threading.Thread(target=buffer.flush)
+        flushing.start()
+        sending.wait(5)
+
+        try:
+            discarding = threading.Thread(target=lambda: events.append(buffer.discard('id-1') or 'discarded'))
+            discarding.start()
+            discarding.join(0.2)
+            self.assertTrue(discarding.is_alive())
+        finally:
+            release.set()
+            flushing.join(5)
+        discarding.join(5)
+
+        self.assertEqual(['sent', 'discarded'], events)
+
+    def test_discard_of_other_document_does_not_wait(self):
+        sending = threading.Event()
+        release = threading.Event()
+
+        def sender(body):
+            sending.set()
+            release.wait(5)
+
+        buffer = BatchBuffer(Mock(side_effect=sender), max_wait=0)
+        buffer.add('id-1', {'id': 'id-1'})
+        flushing = threading.Thread(target=buffer.flush)
+        flushing.start()
+        sending.wait(5)
+
+        try:
+            discarding = threading.Thread(target=buffer.discard, args=('id-2',))
+            discarding.start()
+            discarding.join(1)
+            self.assertFalse(discarding.is_alive())
+        finally:
+            release.set()
+            flushing.join(5)
+
+    @patch('ckanext.searchindexhook.batch.os.getpid')
+    def test_forked_process_starts_with_empty_buffer(self, mock_getpid):
+        sender = Mock()
+        mock_getpid.return_value = 100
+        buffer = BatchBuffer(sender, max_wait=0)
+        buffer.add('id-1', {'id': 'id-1'})
+
+        mock_getpid.return_value = 101
+        buffer.flush()
+
+        sender.assert_not_called()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the CLI commands of the ckanext.searchindexhook extension.
+'''
+import collections
+import unittest
+
+from click.testing import CliRunner
+from mock import Mock, patch
+
+from ckanext.searchindexhook import cli
+
+
+class TestCli(unittest.TestCase):
+
+    @patch('ckanext.searchindexhook.cli.get_plugin')
+    def test_replay_sends_outbox(self, mock_get_plugin):
+        plugin = Mock()
+        plugin.get_outbox.return_value = []
+        plugin.replay_outbox.return_value = 12
+        mock_get_plugin.return_value = plugin
+
+        result = CliRunner().invoke(cli.searchindexhook, ['replay', '--limit', '20'])
+
+        self.assertEqual(0, result.exit_code)
+        plugin.replay_outbox.assert_called_once_with(20)
+        self.assertIn('Replayed 12 index operations, 0 remaining', result.output)
+
+    @patch('ckanext.searchindexhook.cli.get_plugin')
+    def test_replay_fails_without_outbox(self, mock_get_plugin):
+        plugin = Mock()
+        plugin.get_outbox.return_value = None
+        mock_get_plugin.return_value = plugin
+
+        result = CliRunner().invoke(cli.searchindexhook, ['replay'])
+
+        self.assertNotEqual(0, result.exit_code)
+        plugin.replay_outbox.assert_not_called()
+
+    @patch('ckanext.searchindexhook.cli.Reindexer')
+    @patch('ckanext.searchindexhook.cli.get_plugin')
+    def test_reindex_passes_filters(self, mock_get_plugin, mock_reindexer):
+        mock_reindexer.return_value.run.return_value = collections.Counter(datasets=3, delivered=3)
+
+        result = CliRunner().invoke(cli.searchindexhook, [
+            'reindex', '--organization', 'org-1', '--type', 'dataset', '--processes', '2',
+            '--checkpoint', '/tmp/reindex.json', '--resume'
+        ])
+
+        self.assertEqual(0, result.exit_code, result.output)
+        mock_reindexer.assert_called_once_with(
+            mock_get_plugin.return_value,
+            types=('dataset',),
+            organizations=('org-1',),
+            modified_since=None,
+            processes=2,
+            connections=4,
+            chunk_size=100,
+            checkpoint_path='/tmp/reindex.json'
+        )
+        mock_reindexer.return_value.run.assert_called_once_with(resume=True)
+        self.assertIn('Reindexed 3 datasets: 3 delivered', result.output)
+
+    @patch('ckanext.searchindexhook.cli.get_plugin')
+    def test_reindex_resume_requires_checkpoint(self, mock_get_plugin):
+        result = CliRunner().invoke(cli.searchindexhook, ['reindex', '--resume'])
+
+        self.assertNotEqual(0, result.exit_code)
+        mock_get_plugin.assert_not_called()
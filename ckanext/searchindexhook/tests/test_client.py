@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the HTTP client of the ckanext.searchindexhook extension.
+'''
+import gzip
+import unittest
+import zlib
+
+import pytest
+from mock import Mock, patch
+from requests.exceptions import ConnectionError, Timeout
+
+from ckanext.searchindexhook import deadline
+from ckanext.searchindexhook.client import JSON_HEADERS, IndexClient
+from ckanext.searchindexhook.deadline import DeadlineExceeded
+from ckanext.searchindexhook.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+class TestIndexClient(unittest.TestCase):
+
+    def test_session_is_reused_within_process(self):
+        client = IndexClient()
+
+        self.assertIs(client.get_session(), client.get_session())
+
+    @patch('ckanext.searchindexhook.client.os.getpid')
+    def test_new_session_is_created_after_fork(self, mock_getpid):
+        client = IndexClient()
+        mock_getpid.return_value = 100
+        parent_session = client.get_session()
+
+        mock_getpid.return_value = 101
+        child_session = client.get_session()
+
+        self.assertIsNot(parent_session, child_session)
+
+    def test_pool_size_is_applied_to_adapters(self):
+        client = IndexClient(pool_size=3)
+        session = client.get_session()
+
+        for prefix in ['http://', 'https://']:
+            self.assertEqual(3, session.get_adapter(prefix)._pool_maxsize)
+
+    def test_keep_alive_can_be_disabled(self):
+        client = IndexClient(keep_alive=False)
+
+        self.assertEqual('close', client.get_session().headers['Connection'])
+
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_post_passes_timeouts(self, mock_post):
+        client = IndexClient(connect_timeout=1.5, read_timeout=7)
+
+        client.post('http://www.ws.de/test/', ('user', 'pass'), '[]')
+
+        mock_post.assert_called_once_with(
+            'http://www.ws.de/test/',
+            auth=('user', 'pass'),
+            headers={'Content-Type': 'application/json'},
+            data=b'[]',
+            timeout=(1.5, 7)
+        )
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    def test_delete_passes_timeouts(self, mock_delete):
+        client = IndexClient()
+
+        client.delete('http://www.ws.de/test/id-1', ('user', 'pass'), '[]')
+
+        mock_delete.assert_called_once_with(
+            'http://www.ws.de/test/id-1',
+            auth=('user', 'pass'),
+            headers={'Content-Type': 'application/json'},
+            data=b'[]',
+            timeout=(5.0, 30.0)
+        )
+
+    def test_close_drops_session(self):
+        client = IndexClient()
+        session = client.get_session()
+
+        client.close()
+
+        self.assertIsNot(session, client.get_session())
+
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_large_bodies_are_compressed(self, mock_post):
+        client = IndexClient(compression='gzip', compression_min_size=10)
+
+        client.post('http://localhost/', ('user', 'password'), '[{"id": "large-document"}]')
+
+        headers = mock_post.call_args[1]['headers']
+        self.assertEqual('gzip', headers['Content-Encoding'])
+        self.assertEqual(b'[{"id": "large-document"}]', gzip.decompress(mock_post.call_args[1]['data']))
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    def test_small_bodies_are_not_compressed(self, mock_delete):
+        client = IndexClient(compression='deflate', compression_min_size=1024)
+
+        client.delete('http://localhost/id', ('user', 'password'), '[]')
+
+        mock_delete.assert_called_once_with(
+            'http://localhost/id', auth=('user', 'password'), headers=JSON_HEADERS, data=b'[]',
+            timeout=(5.0, 30.0)
+        )
+
+    def test_deflate_uses_zlib_format(self):
+        client = IndexClient(compression='deflate', compression_min_size=0, compression_level=9)
+
+        headers, body = client.encode('{"id": "document"}')
+
+        self.assertEqual('deflate', headers['Content-Encoding'])
+        self.assertEqual(b'{"id": "document"}', zlib.decompress(body))
+        self.assertNotIn('Content-Encoding', JSON_HEADERS)
+
+    def test_unknown_compression_is_rejected(self):
+        with self.assertRaises(ValueError):
+            IndexClient(compression='brotli')
+
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_transient_responses_are_retried(self, mock_post):
+        mock_post.side_effect = [Mock(status_code=503, headers={}), Mock(status_code=200, headers={})]
+        client = IndexClient(retry_policy=RetryPolicy(max_attempts=3, sleep=Mock()))
+
+        response = client.post('http://localhost/', ('user', 'password'), '[]')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, mock_post.call_count)
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    def test_open_circuit_skips_requests(self, mock_delete):
+        mock_delete.side_effect = ConnectionError('down')
+        client = IndexClient(circuit_breaker=CircuitBreaker(failure_threshold=1))
+
+        with pytest.raises(ConnectionError):
+            client.delete('http://localhost/id', ('user', 'password'), '[]')
+        with pytest.raises(CircuitOpenError):
+            client.delete('http://localhost/id', ('user', 'password'), '[]')
+
+        mock_delete.assert_called_once()
+
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_timeouts_are_limited_by_the_deadline(self, mock_post):
+        client = IndexClient(connect_timeout=5, read_timeout=30)
+
+        with deadline.deadline(1.0):
+            client.post('http://localhost/', ('user', 'password'), '[]')
+
+        connect_timeout, read_timeout = mock_post.call_args[1]['timeout']
+        self.assertLessEqual(connect_timeout, 1.0)
+        self.assertLessEqual(read_timeout, 1.0)
+
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_no_request_is_started_after_the_deadline(self, mock_post):
+        client = IndexClient()
+
+        with pytest.raises(DeadlineExceeded):
+            with deadline.deadline(0):
+                client.post('http://localhost/', ('user', 'password'), '[]')
+
+        mock_post.assert_not_called()
+
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_timeout_at_the_deadline_is_an_abort(self, mock_post):
+        clock = Mock(return_value=0.0)
+
+        def time_out(*args, **kwargs):
+            clock.return_value = 2.0
+            raise Timeout('read timeout')
+
+        mock_post.side_effect = time_out
+        client = IndexClient()
+
+        with pytest.raises(DeadlineExceeded):
+            with deadline.deadline(1.0, clock):
+                client.post('http://localhost/', ('user', 'password'), '[]')
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the coalescing of index operations of the ckanext.searchindexhook extension.
+'''
+import threading
+import unittest
+
+from mock import Mock
+
+from ckanext.searchindexhook.coalesce import Coalescer
+
+
+class TestCoalescer(unittest.TestCase):
+
+    def test_only_last_operation_is_run(self):
+        on_superseded = Mock()
+        coalescer = Coalescer(window=60, on_superseded=on_superseded)
+        results = []
+
+        coalescer.submit('dataset-1', results.append, 'add-1')
+        coalescer.submit('dataset-1', results.append, 'add-2')
+        coalescer.submit('dataset-1', results.append, 'delete')
+        coalescer.flush()
+
+        self.assertEqual(['delete'], results)
+        self.assertEqual(2, on_superseded.call_count)
+        self.assertEqual(0, len(coalescer))
+
+    def test_operations_of_different_datasets_are_kept(self):
+        coalescer = Coalescer(window=60)
+        results = []
+
+        coalescer.submit('dataset-1', results.append, 'add-1')
+        coalescer.submit('dataset-2', results.append, 'add-2')
+        coalescer.flush()
+
+        self.assertEqual(['add-1', 'add-2'], results)
+
+    def test_operation_is_run_after_the_window(self):
+        coalescer = Coalescer(window=0.01)
+        done = threading.Event()
+
+        coalescer.submit('dataset-1', done.set)
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(0, len(coalescer))
+
+    def test_later_operation_does_not_extend_the_window(self):
+        clock = Mock(return_value=100.0)
+        coalescer = Coalescer(window=10, clock=clock)
+        results = []
+
+        coalescer.submit('dataset-1', results.append, 'add-1')
+        clock.return_value = 105.0
+        coalescer.submit('dataset-1', results.append, 'add-2')
+        clock.return_value = 110.0
+
+        self.assertEqual([(results.append, ('add-2',))], coalescer._take_due())
+
+    def test_all_operations_are_run_at_the_limit(self):
+        coalescer = Coalescer(window=60, max_pending=2)
+        done = threading.Event()
+        results = []
+
+        coalescer.submit('dataset-1', results.append, 'add-1')
+        coalescer.submit('dataset-2', done.set)
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(['add-1'], results)
+
+    def test_failing_operation_does_not_stop_the_thread(self):
+        coalescer = Coalescer(window=0.01)
+        done = threading.Event()
+
+        def fail():
+            raise ValueError('test-error-message')
+
+        coalescer.submit('dataset-1', fail)
+        coalescer.submit('dataset-2', done.set)
+
+        self.assertTrue(done.wait(5))
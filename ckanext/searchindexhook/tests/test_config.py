@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the configuration snapshot of the ckanext.searchindexhook extension.
+'''
+import unittest
+
+from mock import patch
+
+from ckanext.searchindexhook.config import ConfigOption, IndexConfig, reload_options
+
+
+class Configured:
+    endpoint = ConfigOption('ckan.searchindexhook.test.endpoint', 'http://default/')
+    index_config = None
+
+
+class TestIndexConfig(unittest.TestCase):
+
+    def test_build_prepares_values(self):
+        index_config = IndexConfig.build(
+            'http://index/api', 'user:secret', 'dataset, harvest ', '/dataset', 'index'
+        )
+
+        self.assertEqual('http://index/api/', index_config.endpoint)
+        self.assertEqual(('user', 'secret'), index_config.auth)
+        self.assertEqual(('dataset', 'harvest'), index_config.indexable_data_types)
+        self.assertEqual(frozenset(['dataset', 'harvest']), index_config.indexable_data_type_set)
+        self.assertEqual('/dataset/', index_config.targetlink_url_base_path)
+        self.assertEqual('index', index_config.index_name)
+        index_config.assert_valid()
+
+    def test_build_keeps_missing_values_empty(self):
+        index_config = IndexConfig.build(False, 'no-colon', False, None, False)
+
+        self.assertIsNone(index_config.endpoint)
+        self.assertIsNone(index_config.auth)
+        self.assertEqual(frozenset(), index_config.indexable_data_type_set)
+        self.assertIsNone(index_config.targetlink_url_base_path)
+
+    def test_assert_valid_raises_validation_error(self):
+        index_config = IndexConfig.build(False, False, False, False, False, error=AssertionError('invalid'))
+
+        with self.assertRaises(AssertionError):
+            index_config.assert_valid()
+
+    def test_snapshot_is_immutable(self):
+        index_config = IndexConfig.build('http://index/', 'user:secret', 'dataset', '/', 'index')
+
+        with self.assertRaises(AttributeError):
+            index_config.endpoint = 'http://other/'
+
+
+class TestConfigOption(unittest.TestCase):
+
+    def test_assignment_drops_snapshot(self):
+        configured = Configured()
+        configured.index_config = 'snapshot'
+
+        configured.endpoint = 'http://other/'
+
+        self.assertEqual('http://other/', configured.endpoint)
+        self.assertIsNone(configured.index_config)
+        self.assertEqual('http://default/', Configured().endpoint)
+
+    def test_reload_reads_configuration_again(self):
+        configured = Configured()
+        configured.endpoint = 'http://other/'
+
+        new_config = {'ckan.searchindexhook.test.endpoint': 'http://new/'}
+        with patch('ckanext.searchindexhook.config.tk.config', new_config):
+            reload_options(configured)
+
+        self.assertEqual('http://new/', configured.endpoint)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the date normalization of the ckanext.searchindexhook extension.
+'''
+import datetime
+import unittest
+
+from dateutil.parser import parse
+
+from ckanext.searchindexhook.dates import (
+    NORMALIZED_DATE_FORMAT, STRPTIME_FORMATS, DateNormalizer, candidate_formats, parse_date
+)
+
+DATE_VALUES = [
+    '2017-08-24T11:19:57+0200',
+    '2017-08-24T11:19:57UTC',
+    '2017-08-24t11:19:57',
+    '2017-08-24T11:19:57+02:00',
+    '2017-08-24T11:19:57.133814',
+    '2017-08-24 11:19:57+0200',
+    '2017-08-24 11:19:57 UTC',
+    '2017-08-24  11:19:57',
+    '2017-08-24',
+    '2017-8-24',
+    '2017-08-2',
+    '2017-02-30',
+    '24.08.2017T11:19:57+0200',
+    '24.08.2017T11:19:57',
+    '24.08.2017 11:19:57',
+    '24.08.2017',
+    '4.8.2017',
+    '20170824',
+    '2017-08-24\n',
+    ' 2017-08-24',
+]
+
+
+def sequential_parse_date(datestr):
+    """Tries all formats in the order of the table, like the former implementation."""
+    for dateformat in STRPTIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(datestr, dateformat).strftime(NORMALIZED_DATE_FORMAT)
+        except ValueError:
+            pass
+    return parse(datestr).strftime(NORMALIZED_DATE_FORMAT)
+
+
+class TestDates(unittest.TestCase):
+
+    def test_formats_are_translated(self):
+        self.assertEqual('%Y-%m-%dT%H:%M:%S%z', STRPTIME_FORMATS[0])
+        self.assertEqual('%d.%m.%Y', STRPTIME_FORMATS[-1])
+
+    def test_candidate_formats_by_shape(self):
+        self.assertEqual(['%Y-%m-%d'], candidate_formats('2017-08-24'))
+        self.assertEqual(['%d.%m.%Y %H:%M:%S'], candidate_formats('24.08.2017 11:19:57'))
+        self.assertEqual(STRPTIME_FORMATS[0:3], candidate_formats('2017-08-24T11:19:57'))
+        self.assertEqual(STRPTIME_FORMATS, candidate_formats('2017-8-24'))
+
+    def test_parse_date_equals_sequential_parsing(self):
+        for value in DATE_VALUES:
+            try:
+                expected = sequential_parse_date(value)
+            except ValueError:
+                with self.assertRaises(ValueError):
+                    parse_date(value)
+            else:
+                self.assertEqual(expected, parse_date(value), value)
+
+    def test_normalizer_remembers_results(self):
+        normalizer = DateNormalizer(cache_size=2)
+
+        self.assertEqual('2017-08-24 00:00:00', normalizer.normalize('2017-08-24'))
+        self.assertEqual('2017-08-24 00:00:00', normalizer.normalize('24.08.2017'))
+        self.assertEqual('2017-08-24 00:00:00', normalizer.normalize('2017-08-24'))
+        self.assertEqual('2017-08-24 11:19:57', normalizer.normalize('2017-08-24 11:19:57'))
+
+        self.assertEqual(['2017-08-24', '2017-08-24 11:19:57'], list(normalizer._results))
+
+    def test_normalizer_raises_for_remembered_invalid_values(self):
+        normalizer = DateNormalizer()
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                normalizer.normalize('foo')
+
+    def test_normalizer_without_cache(self):
+        normalizer = DateNormalizer(cache_size=0)
+
+        self.assertEqual('2017-08-24 00:00:00', normalizer.normalize('2017-08-24'))
+        self.assertEqual(0, len(normalizer._results))
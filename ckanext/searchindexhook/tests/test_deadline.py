@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the time budget of hook calls of the ckanext.searchindexhook extension.
+'''
+import unittest
+
+import pytest
+from requests.exceptions import Timeout
+
+from ckanext.searchindexhook import deadline
+from ckanext.searchindexhook.deadline import DeadlineExceeded
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_nothing_is_checked_without_deadline(self):
+        deadline.check('parse')
+
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual((5.0, 30.0), deadline.bound_timeout((5.0, 30.0), 'http_post'))
+
+    def test_check_raises_after_the_deadline(self):
+        with deadline.deadline(1.0, self.clock):
+            deadline.check('resources')
+            self.clock.now = 1.0
+
+            with pytest.raises(DeadlineExceeded) as error:
+                deadline.check('extras')
+
+        self.assertEqual('extras', error.value.stage)
+        self.assertIsInstance(error.value, Timeout)
+
+    def test_timeouts_are_limited_to_the_time_left(self):
+        with deadline.deadline(2.0, self.clock):
+            self.clock.now = 0.5
+
+            self.assertEqual((1.5, 1.5), deadline.bound_timeout((5.0, 30.0), 'http_post'))
+            self.assertEqual((1.0, 1.5), deadline.bound_timeout((1.0, 30.0), 'http_post'))
+
+    def test_deadline_is_removed_after_the_block(self):
+        with deadline.deadline(1.0, self.clock):
+            pass
+
+        self.assertIsNone(deadline.current())
+
+    def test_nested_deadline_cannot_extend_the_outer_one(self):
+        with deadline.deadline(1.0, self.clock) as outer:
+            with deadline.deadline(10.0, self.clock) as inner:
+                self.assertIs(outer, inner)
+            with deadline.deadline(0.5, self.clock) as inner:
+                self.assertEqual(0.5, inner.remaining())
+            self.assertIs(outer, deadline.current())
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the change detection of the ckanext.searchindexhook extension.
+'''
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from mock import Mock
+
+from ckanext.searchindexhook.digest import (
+    ChangeDetector, MemoryDigestStore, SqliteDigestStore, document_digest, load_digest_store
+)
+
+
+class TestDigest(unittest.TestCase):
+
+    def test_document_digest_ignores_key_order(self):
+        self.assertEqual(
+            document_digest({'id': 'id-1', 'title': 'Title'}),
+            document_digest({'title': 'Title', 'id': 'id-1'})
+        )
+        self.assertNotEqual(
+            document_digest({'id': 'id-1', 'title': 'Title'}),
+            document_digest({'id': 'id-1', 'title': 'Other title'})
+        )
+
+    def test_unchanged_document_is_skipped(self):
+        detector = ChangeDetector(MemoryDigestStore())
+
+        self.assertTrue(detector.has_changed('id-1', {'title': 'Title'}))
+        self.assertFalse(detector.has_changed('id-1', {'title': 'Title'}))
+        self.assertTrue(detector.has_changed('id-1', {'title': 'Other title'}))
+        self.assertEqual({'sent': 2, 'skipped': 1}, dict(detector.stats))
+
+    def test_forgotten_document_is_sent_again(self):
+        detector = ChangeDetector(MemoryDigestStore())
+        detector.has_changed('id-1', {'title': 'Title'})
+
+        detector.forget('id-1')
+
+        self.assertTrue(detector.has_changed('id-1', {'title': 'Title'}))
+
+    def test_sent_document_is_known_until_forgotten(self):
+        detector = ChangeDetector(MemoryDigestStore())
+        self.assertFalse(detector.is_known('id-1'))
+
+        detector.has_changed('id-1', {'title': 'Title'})
+        self.assertTrue(detector.is_known('id-1'))
+
+        detector.forget('id-1')
+        self.assertFalse(detector.is_known('id-1'))
+
+    def test_store_errors_count_as_changed(self):
+        store = Mock()
+        store.get.side_effect = sqlite3.OperationalError('database is locked')
+        store.remove.side_effect = sqlite3.OperationalError('database is locked')
+        detector = ChangeDetector(store)
+
+        self.assertTrue(detector.has_changed('id-1', {'title': 'Title'}))
+        self.assertFalse(detector.is_known('id-1'))
+        detector.forget('id-1')
+
+    def test_memory_store_is_bounded(self):
+        store = MemoryDigestStore(max_size=1)
+        store.set('id-1', 'digest-1')
+        store.set('id-2', 'digest-2')
+
+        self.assertIsNone(store.get('id-1'))
+        self.assertEqual('digest-2', store.get('id-2'))
+
+    def test_sqlite_store(self):
+        directory = tempfile.mkdtemp()
+        try:
+            store = load_digest_store('sqlite', os.path.join(directory, 'digests.db'))
+            store.set('id-1', 'digest-1')
+            store.set('id-1', 'digest-2')
+            self.assertEqual('digest-2', store.get('id-1'))
+            store.remove('id-1')
+            self.assertIsNone(store.get('id-1'))
+            self.assertIsInstance(store, SqliteDigestStore)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_sqlite_store_requires_path(self):
+        self.assertRaises(ValueError, load_digest_store, 'sqlite', None)
+
+    def test_load_custom_store(self):
+        store = load_digest_store('ckanext.searchindexhook.digest:MemoryDigestStore', None)
+
+        self.assertIsInstance(store, MemoryDigestStore)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the background dispatch of the ckanext.searchindexhook extension.
+'''
+import queue
+import threading
+import unittest
+
+from ckanext.searchindexhook import deadline
+from ckanext.searchindexhook.dispatch import AsyncDispatcher
+
+
+class TestAsyncDispatcher(unittest.TestCase):
+
+    def test_operations_for_same_key_keep_order(self):
+        dispatcher = AsyncDispatcher(workers=4)
+        results = []
+
+        for number in range(200):
+            dispatcher.submit('dataset-1', results.append, number)
+        dispatcher.drain()
+
+        self.assertEqual(list(range(200)), results)
+
+    def test_drain_runs_all_queued_operations(self):
+        dispatcher = AsyncDispatcher(workers=2)
+        results = []
+
+        for number in range(50):
+            dispatcher.submit('dataset-{0}'.format(number), results.append, number)
+
+        self.assertEqual([], dispatcher.drain())
+        self.assertEqual(list(range(50)), sorted(results))
+        self.assertEqual(0, dispatcher.pending())
+
+    def test_failing_operation_does_not_stop_worker(self):
+        dispatcher = AsyncDispatcher(workers=1)
+        results = []
+
+        def fail():
+            raise ValueError('test-error-message')
+
+        dispatcher.submit('dataset-1', fail)
+        dispatcher.submit('dataset-1', results.append, 'sent')
+        dispatcher.drain()
+
+        self.assertEqual(['sent'], results)
+
+    def test_full_queue_raises_after_timeout(self):
+        dispatcher = AsyncDispatcher(workers=1, queue_size=1, enqueue_timeout=0.01)
+        blocker = threading.Event()
+
+        # the first operation occupies the worker, the second one fills the queue
+        dispatcher.submit('dataset-1', blocker.wait)
+        with self.assertRaises(queue.Full):
+            for _ in range(3):
+                dispatcher.submit('dataset-1', blocker.wait)
+
+        blocker.set()
+        dispatcher.drain()
+
+    def test_full_queue_waits_at_most_until_the_deadline(self):
+        dispatcher = AsyncDispatcher(workers=1, queue_size=1, enqueue_timeout=60)
+        blocker = threading.Event()
+
+        dispatcher.submit('dataset-1', blocker.wait)
+        with self.assertRaises(queue.Full):
+            with deadline.deadline(0.01):
+                for _ in range(3):
+                    dispatcher.submit('dataset-1', blocker.wait)
+
+        blocker.set()
+        dispatcher.drain()
+
+    def test_offer_does_not_wait_for_a_full_queue(self):
+        dispatcher = AsyncDispatcher(workers=1, queue_size=1, enqueue_timeout=60)
+        blocker = threading.Event()
+
+        dispatcher.submit('dataset-1', blocker.wait)
+        offered = [dispatcher.offer('dataset-1', blocker.wait) for _ in range(3)]
+
+        blocker.set()
+        dispatcher.drain()
+        self.assertIn(False, offered)
+
+    def test_drain_returns_operations_not_started_in_time(self):
+        dispatcher = AsyncDispatcher(workers=1)
+        blocker = threading.Event()
+
+        dispatcher.submit('dataset-1', blocker.wait)
+        dispatcher.submit('dataset-1', print, 'never sent')
+        remaining = dispatcher.drain(timeout=0.05)
+        blocker.set()
+
+        self.assertEqual([(print, ('never sent',))], remaining)
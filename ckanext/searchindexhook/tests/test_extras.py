@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the extras mapping of the ckanext.searchindexhook extension.
+'''
+import unittest
+
+from mock import Mock
+
+from ckanext.searchindexhook.extras import (
+    EXTRAS_MAPPING, HANDLER_COPY, HANDLER_JSON_LIST, build_extras_mapping, compile_extras_mapping
+)
+
+
+class TestExtrasMapping(unittest.TestCase):
+
+    def test_configured_keys_extend_the_mapping(self):
+        mapping = build_extras_mapping(copy_keys=['landingPage'], list_keys=['conformsTo'])
+
+        self.assertEqual((HANDLER_COPY, 'landingPage'), mapping['landingPage'])
+        self.assertEqual((HANDLER_JSON_LIST, 'conformsTo'), mapping['conformsTo'])
+        self.assertNotIn('landingPage', EXTRAS_MAPPING)
+
+    def test_compiled_handlers_get_the_field(self):
+        copy_handler = Mock()
+        spatial_handler = Mock()
+        table = compile_extras_mapping(
+            {'contact_name': (HANDLER_COPY, 'contact'), 'spatial': ('spatial', None)},
+            {HANDLER_COPY: copy_handler, 'spatial': spatial_handler}
+        )
+        metadata_dict = {}
+        extra = {'key': 'contact_name', 'value': 'Jane'}
+
+        table['contact_name'](metadata_dict=metadata_dict, extra=extra)
+        table['spatial'](metadata_dict=metadata_dict, extra=extra)
+
+        copy_handler.assert_called_once_with(metadata_dict=metadata_dict, extra=extra, field='contact')
+        spatial_handler.assert_called_once_with(metadata_dict=metadata_dict, extra=extra)
+
+    def test_unknown_handler_raises_error(self):
+        with self.assertRaises(ValueError):
+            compile_extras_mapping({'key': ('unknown', None)}, {})
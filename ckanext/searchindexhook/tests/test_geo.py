@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the spatial fields of the ckanext.searchindexhook extension.
+'''
+import json
+import random
+import unittest
+
+import geojson
+from mock import patch
+from shapely.geometry import shape
+
+from ckanext.searchindexhook.geo import (
+    BoundingBoxRepresentation, SpatialFeatures, geojson_area, geometry_to_dict, shares_exterior_coordinates
+)
+
+GEOMETRIES = [
+    {'type': 'Point', 'coordinates': [9.156908, 53.896117]},
+    {'type': 'Polygon', 'coordinates': [[
+        [2.2, 42.1], [2.3, 42.1], [2.3, 42.2], [2.3, 42.2], [2.2, 42.2], [2.2, 42.1]
+    ]]},
+    {'type': 'MultiPolygon', 'coordinates': [
+        [[[0.123456789012345678, 0], [1, 0], [1, 1], [0.123456789012345678, 0]]],
+        [[[5, 5], [6, 5], [6, 6], [5, 5]]],
+    ]},
+    {'type': 'GeometryCollection', 'geometries': [
+        {'type': 'Point', 'coordinates': [1, 2]},
+        {'type': 'LineString', 'coordinates': [[1, 2], [3, 4]]},
+    ]},
+    {'type': 'Polygon', 'coordinates': [
+        [[0, 0, 1], [4, 0, 1], [4, 4, 1], [0, 4, 1], [0, 0, 1]],
+        [[1, 1, 1], [2, 1, 1], [2, 2, 1], [1, 1, 1]],
+    ]},
+    {'type': 'MultiPoint', 'coordinates': [[1, 2], [3, 4]]},
+    {'type': 'Polygon', 'coordinates': []},
+]
+
+
+def sequential_shares_exterior_coordinates(coordinates):
+    """The former check comparing every exterior coordinate with every interior ring."""
+    for internal_polygon in coordinates[1:]:
+        shared_coordinates_counter = 0
+        for coord_external in coordinates[0]:
+            if coord_external in internal_polygon:
+                shared_coordinates_counter += 1
+            if shared_coordinates_counter > 1:
+                return True
+    return False
+
+
+class TestGeo(unittest.TestCase):
+
+    def test_geometry_to_dict_equals_geojson_round_trip(self):
+        for geometry in GEOMETRIES:
+            simplified = shape(geometry).simplify(0)
+
+            self.assertEqual(json.loads(geojson.dumps(simplified)), geometry_to_dict(simplified))
+
+    def test_geojson_area_is_at_least_one_for_negative_areas(self):
+        with patch('ckanext.searchindexhook.geo.area', return_value=-5):
+            self.assertEqual(1, geojson_area(GEOMETRIES[1]))
+        self.assertEqual(0, geojson_area(GEOMETRIES[0]))
+
+    def test_spatial_features_build_geometry_once(self):
+        spatial = geojson.loads(json.dumps(GEOMETRIES[1]))
+
+        with patch('ckanext.searchindexhook.geo.shape', side_effect=shape) as mock_shape:
+            features = SpatialFeatures(spatial)
+            boundingbox = features.boundingbox()
+            center = features.center()
+
+        mock_shape.assert_called_once_with(spatial)
+        self.assertEqual('Polygon', boundingbox['type'])
+        self.assertAlmostEqual(2.25, center[0])
+        self.assertAlmostEqual(42.15, center[1])
+
+    def test_shares_exterior_coordinates(self):
+        exterior = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+
+        # touching in one point is allowed
+        self.assertFalse(shares_exterior_coordinates([exterior, [[10, 0], [1, 1], [2, 1], [10, 0]]]))
+        # the closing coordinate of the exterior counts twice
+        self.assertTrue(shares_exterior_coordinates([exterior, [[0.0, 0.0], [1, 1], [2, 1], [0.0, 0.0]]]))
+        self.assertTrue(shares_exterior_coordinates([exterior, [[10, 0], [1, 1], [10, 10], [10, 0]]]))
+        # multi polygons compare whole rings
+        self.assertFalse(shares_exterior_coordinates([[exterior], [exterior]]))
+        self.assertTrue(shares_exterior_coordinates([[exterior, exterior], [exterior]]))
+
+    def test_shares_exterior_coordinates_equals_sequential_check(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            coordinates = [
+                [[rng.randint(0, 4), rng.randint(0, 4)] for _ in range(rng.randint(0, 8))]
+                for _ in range(rng.randint(1, 4))
+            ]
+
+            self.assertEqual(
+                sequential_shares_exterior_coordinates(coordinates),
+                shares_exterior_coordinates(coordinates),
+                coordinates
+            )
+
+    def test_boundingbox_representation_full(self):
+        representation = BoundingBoxRepresentation()
+
+        boundingbox = representation.to_dict(shape(GEOMETRIES[1]))
+
+        self.assertEqual(json.loads(geojson.dumps(shape(GEOMETRIES[1]).simplify(0))), boundingbox)
+        self.assertEqual({'geometries': 1, 'vertices': 6, 'reduced_vertices': 5}, representation.stats)
+
+    def test_boundingbox_representation_envelope(self):
+        boundingbox = BoundingBoxRepresentation('envelope').to_dict(shape(GEOMETRIES[2]))
+
+        self.assertEqual('Polygon', boundingbox['type'])
+        self.assertEqual([0.12345678901234568, 0.0], min(boundingbox['coordinates'][0]))
+        self.assertEqual([6.0, 6.0], max(boundingbox['coordinates'][0]))
+
+    def test_boundingbox_representation_simplify_with_tolerance_in_metres(self):
+        # a jagged line with deviations of about 11 metres
+        line = shape({'type': 'LineString', 'coordinates': [
+            [index * 0.01, 0.0001 * (index % 2)] for index in range(101)
+        ]})
+
+        self.assertEqual(101, len(BoundingBoxRepresentation('simplify', 5).to_dict(line)['coordinates']))
+        self.assertEqual(2, len(BoundingBoxRepresentation('simplify', 20).to_dict(line)['coordinates']))
+
+    def test_boundingbox_representation_precision(self):
+        representation = BoundingBoxRepresentation(precision='2')
+
+        point = representation.to_dict(shape({'type': 'Point', 'coordinates': [9.156908, 53.896117]}))
+        tiny = representation.to_dict(shape({'type': 'Polygon', 'coordinates': [
+            [[0, 0], [0.001, 0], [0.001, 0.001], [0, 0]]
+        ]}))
+
+        self.assertEqual([9.16, 53.9], point['coordinates'])
+        # geometries collapsing with the precision are kept unchanged
+        self.assertEqual([[0.0, 0.0], [0.001, 0.0], [0.001, 0.001], [0.0, 0.0]], tiny['coordinates'][0])
+
+    def test_boundingbox_representation_rejects_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            BoundingBoxRepresentation('convex')
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the spatial cache of the ckanext.searchindexhook extension.
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+from ckanext.searchindexhook.geocache import ENTRY_OVERHEAD, SpatialCache, SqliteSpatialStore
+
+
+class TestSpatialCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_value_is_derived_once(self):
+        cache = SpatialCache()
+        derive = Mock(return_value={'spatial_area': 1})
+
+        for _ in range(3):
+            self.assertEqual({'spatial_area': 1}, cache.get_or_derive('spatial', '{}', derive))
+
+        derive.assert_called_once_with('{}')
+        self.assertEqual({'hits': 2, 'misses': 1}, cache.stats)
+
+    def test_kinds_are_cached_separately(self):
+        cache = SpatialCache()
+
+        cache.get_or_derive('spatial', '{}', lambda value: 'spatial')
+
+        self.assertEqual('bbox', cache.get_or_derive('spatial_bbox', '{}', lambda value: 'bbox'))
+
+    def test_errors_are_raised_again(self):
+        cache = SpatialCache()
+        derive = Mock(side_effect=ValueError('invalid'))
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                cache.get_or_derive('spatial', 'foo', derive)
+
+        derive.assert_called_once_with('foo')
+
+    def test_entries_are_evicted_by_count_and_size(self):
+        cache = SpatialCache(max_entries=2, max_bytes=2 * (ENTRY_OVERHEAD + 12))
+
+        # the size of an entry is the length of the result as JSON, i.e. with quotes
+        cache.get_or_derive('spatial', 'a' * 10, str)
+        cache.get_or_derive('spatial', 'b' * 10, str)
+        cache.get_or_derive('spatial', 'c' * 10, str)
+        self.assertEqual(2, len(cache))
+
+        cache.get_or_derive('spatial', 'd' * 20, str)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(3, cache.stats['evictions'])
+
+    def test_size_of_entries_is_the_size_of_the_result(self):
+        cache = SpatialCache(max_bytes=ENTRY_OVERHEAD + 10)
+
+        cache.get_or_derive('spatial', 'a' * 1000, len)
+
+        self.assertEqual(1, len(cache))
+
+    def test_disk_tier_survives_new_cache(self):
+        path = os.path.join(self.directory, 'spatial.db')
+        SpatialCache(store=SqliteSpatialStore(path)).get_or_derive(
+            'spatial', '{}', lambda value: {'spatial_area': 2.5}
+        )
+
+        cache = SpatialCache(store=SqliteSpatialStore(path))
+        derive = Mock()
+
+        self.assertEqual({'spatial_area': 2.5}, cache.get_or_derive('spatial', '{}', derive))
+        derive.assert_not_called()
+        self.assertEqual(1, cache.stats['disk_hits'])
+
+    def test_result_is_serialized_once(self):
+        path = os.path.join(self.directory, 'spatial.db')
+        cache = SpatialCache(store=SqliteSpatialStore(path))
+
+        with patch('ckanext.searchindexhook.geocache.json.dumps', side_effect=json.dumps) as dumps:
+            cache.get_or_derive('spatial', '{}', lambda value: {'spatial_area': 2.5})
+
+        dumps.assert_called_once_with({'spatial_area': 2.5})
+
+    def test_disk_tier_removes_least_recently_used_entries(self):
+        clock = Mock(side_effect=range(10))
+        store = SqliteSpatialStore(os.path.join(self.directory, 'spatial.db'), max_entries=2, clock=clock)
+
+        store.set('key-1', '{"spatial_area": 1}')
+        store.set('key-2', '{"spatial_area": 2}')
+        store.get('key-1')
+        store.set('key-3', '{"spatial_area": 3}')
+
+        self.assertEqual(2, len(store))
+        self.assertEqual('{"spatial_area": 1}', store.get('key-1'))
+        self.assertIsNone(store.get('key-2'))
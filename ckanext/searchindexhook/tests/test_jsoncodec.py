@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the JSON codec of the ckanext.searchindexhook extension.
+'''
+import json
+import math
+import unittest
+
+from ckanext.searchindexhook.jsoncodec import available_backends, load_codec
+
+VALUE = {
+    'title': 'Straßenbäume in Köln',
+    'url': 'http://example.com/data',
+    'count': 3,
+    'ratio': 0.25,
+    'private': False,
+    'notes': None,
+    'tags': ['a', 'b'],
+    'extras': [{'key': 'spatial', 'value': '{"type": "Point", "coordinates": [7.0, 51.0]}'}]
+}
+
+
+class TestJsonCodec(unittest.TestCase):
+
+    def test_backends_decode_to_the_same_values(self):
+        for backend in available_backends():
+            codec = load_codec(backend)
+            serialized = codec.dumps(VALUE)
+
+            self.assertIsInstance(serialized, str)
+            self.assertEqual(VALUE, json.loads(serialized))
+            self.assertEqual(VALUE, codec.loads(json.dumps(VALUE)))
+
+    def test_backends_accept_values_of_the_json_module(self):
+        for backend in available_backends():
+            codec = load_codec(backend)
+
+            self.assertTrue(math.isnan(codec.loads('{"size": NaN}')['size']))
+            self.assertEqual(2 ** 70, json.loads(codec.dumps({'size': 2 ** 70}))['size'])
+
+    def test_default_backend_is_json_module(self):
+        self.assertEqual('json', load_codec().name)
+
+    def test_decoding_errors_are_value_errors(self):
+        for backend in available_backends():
+            with self.assertRaises(ValueError):
+                load_codec(backend).loads('{invalid')
+
+    def test_auto_selects_fastest_backend(self):
+        self.assertEqual(available_backends()[0], load_codec('auto').name)
+
+    def test_unknown_backend_raises_error(self):
+        with self.assertRaises(ValueError):
+            load_codec('simplejson')
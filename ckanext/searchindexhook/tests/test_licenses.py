@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the license openness cache of the ckanext.searchindexhook extension.
+'''
+import threading
+import unittest
+
+from mock import Mock
+
+from ckanext.searchindexhook.licenses import LicenseOpennessCache
+
+
+def wait_for_refresh(cache):
+    """Waits until a running background refresh has finished."""
+    with cache._refresh_lock:  # pylint: disable=protected-access
+        pass
+
+
+class TestLicenseOpennessCache(unittest.TestCase):
+
+    def test_load_sets_mapping(self):
+        cache = LicenseOpennessCache(Mock(return_value={'cc-by': True}))
+
+        self.assertTrue(cache.load())
+        self.assertEqual({'cc-by': True}, cache.get())
+
+    def test_failed_load_keeps_last_mapping(self):
+        loader = Mock(side_effect=[{'cc-by': True}, ValueError('down')])
+        cache = LicenseOpennessCache(loader, ttl=0.0, retry_interval=0.0)
+        cache.load()
+
+        self.assertFalse(cache.load())
+        self.assertEqual({'cc-by': True}, cache.get())
+
+    def test_expired_mapping_is_refreshed_in_background(self):
+        release = threading.Event()
+        mappings = [{'cc-by': True}, {'cc-by': True, 'dl-de-by-2.0': True}]
+
+        def slow_loader():
+            if len(mappings) == 1:
+                release.wait(5)
+            return mappings.pop(0)
+
+        cache = LicenseOpennessCache(slow_loader, ttl=60.0, retry_interval=60.0)
+        cache.load()
+        cache._expires = 0.0  # pylint: disable=protected-access
+
+        # the lookups return the former mapping while the refresh is running
+        self.assertEqual({'cc-by': True}, cache.get())
+        self.assertEqual({'cc-by': True}, cache.get())
+        release.set()
+        wait_for_refresh(cache)
+
+        self.assertEqual({'cc-by': True, 'dl-de-by-2.0': True}, cache.get())
+        self.assertEqual([], mappings)
+
+    def test_failed_initial_load_is_retried(self):
+        loader = Mock(side_effect=[ValueError('down'), {'cc-by': True}])
+        cache = LicenseOpennessCache(loader, ttl=0.0, retry_interval=0.0)
+        cache.load()
+
+        cache.get()
+        wait_for_refresh(cache)
+
+        self.assertEqual({'cc-by': True}, cache.get())
+        self.assertEqual(2, loader.call_count)
+
+    def test_zero_ttl_disables_refresh_after_load(self):
+        loader = Mock(return_value={'cc-by': True})
+        cache = LicenseOpennessCache(loader, ttl=0.0)
+        cache.load()
+
+        cache.get()
+
+        loader.assert_called_once_with()
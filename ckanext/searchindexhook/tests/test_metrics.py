@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the metrics of the ckanext.searchindexhook extension.
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+
+from ckanext.searchindexhook.metrics import CONTENT_TYPE, STAGE_PARSE, STAGE_POST, Metrics
+from ckanext.searchindexhook.views import build_metrics_blueprint
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_is_rendered_cumulative(self):
+        metrics = Metrics(buckets=(0.001, 0.01))
+        metrics.observe(STAGE_PARSE, 0.0005)
+        metrics.observe(STAGE_PARSE, 0.005)
+        metrics.observe(STAGE_PARSE, 0.5)
+
+        lines = metrics.render().splitlines()
+
+        self.assertIn('# TYPE searchindexhook_stage_duration_seconds histogram', lines)
+        self.assertIn('searchindexhook_stage_duration_seconds_bucket{stage="parse",le="0.001"} 1', lines)
+        self.assertIn('searchindexhook_stage_duration_seconds_bucket{stage="parse",le="0.01"} 2', lines)
+        self.assertIn('searchindexhook_stage_duration_seconds_bucket{stage="parse",le="+Inf"} 3', lines)
+        self.assertIn('searchindexhook_stage_duration_seconds_count{stage="parse"} 3', lines)
+        self.assertIn('searchindexhook_stage_duration_seconds_sum{stage="parse"} 0.5055', lines)
+
+    def test_counters_are_rendered_with_labels(self):
+        metrics = Metrics()
+        metrics.inc('sent', 3)
+        metrics.inc('bytes_sent', 1024)
+        metrics.inc('failed', label='ConnectionError')
+        metrics.inc('failed', label='ConnectionError')
+        metrics.inc('skipped', label='unchanged')
+
+        lines = metrics.render().splitlines()
+
+        self.assertIn('searchindexhook_documents_sent_total 3', lines)
+        self.assertIn('searchindexhook_bytes_sent_total 1024', lines)
+        self.assertIn('searchindexhook_delivery_errors_total{error="ConnectionError"} 2', lines)
+        self.assertIn('searchindexhook_documents_skipped_total{reason="unchanged"} 1', lines)
+
+    def test_time_records_raising_blocks(self):
+        metrics = Metrics()
+
+        with self.assertRaises(ValueError):
+            with metrics.time(STAGE_POST):
+                raise ValueError('test-error-message')
+
+        self.assertIn('searchindexhook_stage_duration_seconds_count{stage="http_post"} 1', metrics.render())
+
+    def test_disabled_metrics_record_nothing(self):
+        metrics = Metrics(enabled=False)
+        metrics.observe(STAGE_PARSE, 0.1)
+        metrics.inc('sent')
+
+        self.assertNotIn('stage="parse"', metrics.render())
+        self.assertIn('searchindexhook_documents_sent_total 0', metrics.render().splitlines())
+
+    def test_metrics_are_written_to_file_per_process(self):
+        directory = tempfile.mkdtemp()
+        try:
+            metrics = Metrics(path=os.path.join(directory, 'searchindexhook-{pid}.prom'), write_interval=0)
+            metrics.inc('sent')
+
+            metrics.maybe_write()
+
+            with open(os.path.join(directory, 'searchindexhook-{0}.prom'.format(os.getpid())),
+                      encoding='utf-8') as metrics_file:
+                self.assertEqual(metrics.render(), metrics_file.read())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_blueprint_exposes_metrics(self):
+        metrics = Metrics()
+        metrics.inc('sent')
+        app = Flask(__name__)
+        app.register_blueprint(build_metrics_blueprint(metrics))
+
+        response = app.test_client().get('/searchindexhook/metrics')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(CONTENT_TYPE, response.headers['Content-Type'])
+        self.assertIn(b'searchindexhook_documents_sent_total 1', response.data)
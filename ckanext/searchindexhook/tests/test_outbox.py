@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the outbox of the ckanext.searchindexhook extension.
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from ckanext.searchindexhook.outbox import OPERATION_ADD, OPERATION_DELETE, OutboxStore
+
+
+class TestOutboxStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.outbox = OutboxStore(os.path.join(self.directory, 'outbox', 'outbox.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_only_latest_operation_per_dataset_is_kept(self):
+        self.outbox.add('id-1', '{"version": 1}')
+        self.outbox.add('id-1', '{"version": 2}')
+        self.outbox.delete('id-1')
+        self.outbox.add('id-2', '{"version": 1}')
+
+        operations = self.outbox.fetch(10)
+
+        self.assertEqual(2, len(self.outbox))
+        self.assertEqual(
+            [('id-1', OPERATION_DELETE, None), ('id-2', OPERATION_ADD, '{"version": 1}')],
+            [operation[1:] for operation in operations]
+        )
+
+    def test_remove_keeps_operations_replaced_in_the_meantime(self):
+        self.outbox.add('id-1', '{"version": 1}')
+        self.outbox.add('id-2', '{"version": 1}')
+        rowids = [operation[0] for operation in self.outbox.fetch(10)]
+
+        self.outbox.add('id-2', '{"version": 2}')
+        self.outbox.remove(rowids)
+
+        self.assertEqual(
+            [('id-2', OPERATION_ADD, '{"version": 2}')],
+            [operation[1:] for operation in self.outbox.fetch(10)]
+        )
+
+    def test_add_many_and_discard(self):
+        self.outbox.add_many([('id-1', '{}'), ('id-2', '{}')])
+        self.outbox.discard('id-1')
+
+        self.assertEqual(['id-2'], [operation[1] for operation in self.outbox.fetch(10)])
+
+    def test_discard_many(self):
+        self.outbox.add_many([('id-1', '{}'), ('id-2', '{}'), ('id-3', '{}')])
+        self.outbox.discard_many(['id-1', 'id-3'])
+
+        self.assertEqual(['id-2'], [operation[1] for operation in self.outbox.fetch(10)])
+
+    def test_existing_skips_operations_replaced_or_discarded(self):
+        self.outbox.add_many([('id-1', '{}'), ('id-2', '{}'), ('id-3', '{}')])
+        rowids = [operation[0] for operation in self.outbox.fetch(10)]
+
+        self.outbox.add('id-2', '{"version": 2}')
+        self.outbox.discard('id-3')
+
+        self.assertEqual({rowids[0]}, self.outbox.existing(rowids))
+
+    def test_fetch_respects_limit(self):
+        for number in range(5):
+            self.outbox.add('id-{0}'.format(number), '{}')
+
+        self.assertEqual(2, len(self.outbox.fetch(2)))
+
+    def test_store_uses_wal_mode(self):
+        # pylint: disable=protected-access
+        with self.outbox._connect() as connection:
+            journal_mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+
+        self.assertEqual('wal', journal_mode)
@@ -3,6 +3,11 @@
 Tests for the ckanext.searchindexhook extension.
 '''
 import datetime
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
 
 import pytest
 import unittest
@@ -13,7 +18,10 @@ import geojson
 
 from mock import Mock, patch, ANY
 from requests.exceptions import HTTPError, ConnectionError
+from ckanext.searchindexhook.digest import ChangeDetector, MemoryDigestStore
+from ckanext.searchindexhook.metrics import Metrics
 from ckanext.searchindexhook.plugin import NORMALIZED_DATE_FORMAT
+from ckanext.searchindexhook.profiling import SlowDocumentProfiler
 
 
 class TestPlugin(unittest.TestCase, object):
@@ -224,6 +232,16 @@ class TestPlugin(unittest.TestCase, object):
             plugin.get_search_index_endpoint()
         )
 
+    def test_index_config_is_built_once_until_an_option_changes(self):
+        plugin = self._build_plugin_add_index()
+
+        index_config = plugin.get_index_config()
+        self.assertIs(index_config, plugin.get_index_config())
+        self.assertEqual(('testuser', 'testpassword'), index_config.auth)
+
+        plugin.search_index_credentials = 'otheruser:otherpassword'
+        self.assertEqual(('otheruser', 'otherpassword'), plugin.get_index_config().auth)
+
     def test_substitute_targetlink_works_as_expected(self):
         plugin = self.get_plugin_instance()
         plugin.targetlink_url_base_path = '/test/path/'
@@ -302,6 +320,142 @@ class TestPlugin(unittest.TestCase, object):
 
         plugin.delete_from_index = pre_mock_def
 
+    def test_before_index_upsert_mode_only_adds(self):
+        plugin = self.get_plugin_instance()
+        plugin.indexable_data_types = 'indexable_dataset'
+        plugin.upsert_enabled = True
+
+        pre_mock_def = plugin.delete_from_index
+        pre_mock_remove = plugin.remove_document
+        plugin.delete_from_index = Mock()
+        plugin.remove_document = Mock()
+        plugin.add_to_index = Mock()
+
+        pkg_dict = {'id': 15, 'name': 'package-1', 'type': 'indexable_dataset', 'state': 'active'}
+
+        try:
+            plugin.before_index(pkg_dict)
+            plugin.add_to_index.assert_called_once_with(pkg_dict)
+            plugin.delete_from_index.assert_not_called()
+            assert not plugin.remove_document.called, 'remove_document was called and should not have been'
+        finally:
+            plugin.upsert_enabled = False
+            plugin.delete_from_index = pre_mock_def
+            plugin.remove_document = pre_mock_remove
+
+    def test_before_index_upsert_mode_deletes_deleted_dataset(self):
+        plugin = self.get_plugin_instance()
+        plugin.indexable_data_types = 'indexable_dataset'
+        plugin.upsert_enabled = True
+
+        pre_mock_remove = plugin.remove_document
+        plugin.remove_document = Mock()
+        plugin.add_to_index = Mock()
+
+        pkg_dict = {'id': 15, 'name': 'package-1', 'type': 'indexable_dataset', 'state': 'deleted'}
+
+        try:
+            plugin.before_index(pkg_dict)
+            plugin.remove_document.assert_called_once_with(15)
+            assert not plugin.add_to_index.called, 'add_to_index was called and should not have been'
+        finally:
+            plugin.upsert_enabled = False
+            plugin.remove_document = pre_mock_remove
+
+    def test_before_index_upsert_mode_deletes_formerly_indexed_non_indexable_dataset(self):
+        plugin = self.get_plugin_instance()
+        plugin.indexable_data_types = 'indexable_dataset'
+        plugin.upsert_enabled = True
+        plugin.digest_enabled = True
+        plugin.change_detector = ChangeDetector(MemoryDigestStore())
+        plugin.change_detector.has_changed(15, {'document': {'id': 15}})
+
+        pre_mock_remove = plugin.remove_document
+        plugin.remove_document = Mock()
+        plugin.add_to_index = Mock()
+
+        pkg_dict = {'id': 15, 'name': 'package-1', 'type': 'non_indexable_dataset', 'state': 'active'}
+
+        try:
+            plugin.before_index(pkg_dict)
+            plugin.before_index(pkg_dict)
+            plugin.remove_document.assert_called_once_with(15)
+            assert not plugin.add_to_index.called, 'add_to_index was called and should not have been'
+        finally:
+            plugin.upsert_enabled = False
+            plugin.digest_enabled = False
+            plugin.change_detector = None
+            plugin.remove_document = pre_mock_remove
+
+    def test_before_index_upsert_mode_skips_never_indexed_non_indexable_dataset(self):
+        plugin = self.get_plugin_instance()
+        plugin.indexable_data_types = 'indexable_dataset'
+        plugin.upsert_enabled = True
+
+        pre_mock_remove = plugin.remove_document
+        plugin.remove_document = Mock()
+        plugin.add_to_index = Mock()
+
+        pkg_dict = {'id': 15, 'name': 'package-1', 'type': 'non_indexable_dataset', 'state': 'active'}
+
+        try:
+            plugin.before_index(pkg_dict)
+            assert not plugin.remove_document.called, 'remove_document was called and should not have been'
+            assert not plugin.add_to_index.called, 'add_to_index was called and should not have been'
+        finally:
+            plugin.upsert_enabled = False
+            plugin.remove_document = pre_mock_remove
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_before_index_batch_mode_sends_no_deletions(self, mock_post, mock_delete):
+        plugin = self._build_plugin_add_index()
+        # earlier tests replace add_to_index of the singleton plugin with a mock
+        vars(plugin).pop('add_to_index', None)
+        plugin.batch_enabled = True
+
+        pkg_dict = self._build_pkg_dict({"resources": [], "extras": []})
+        package_ids = ['11111111-1111-4111-8111-111111111111', '22222222-2222-4222-8222-222222222222']
+
+        try:
+            for package_id in package_ids:
+                plugin.before_index(dict(pkg_dict, id=package_id))
+            plugin.batch_buffer.flush()
+        finally:
+            plugin.batch_enabled = False
+            plugin.batch_buffer = None
+
+        mock_delete.assert_not_called()
+        mock_post.assert_called_once()
+        self.assertEqual(2, len(json.loads(mock_post.call_args[1]['data'])))
+
+    def test_before_index_async_mode_dispatches_document(self):
+        plugin = self.get_plugin_instance()
+        plugin.indexable_data_types = 'indexable_dataset'
+        plugin.async_enabled = True
+
+        pre_mock_def = plugin.delete_from_index
+        pre_mock_build = plugin.build_index_document
+        plugin.delete_from_index = Mock()
+        plugin.add_to_index = Mock()
+        plugin.build_index_document = Mock(return_value={'document': {'id': 15}})
+        plugin.dispatcher = Mock()
+
+        pkg_dict = {'id': 15, 'name': 'package-1', 'type': 'indexable_dataset'}
+
+        try:
+            plugin.before_index(pkg_dict)
+            plugin.dispatcher.submit.assert_called_once_with(
+                15, plugin.deliver_document, 15, {'document': {'id': 15}}
+            )
+            plugin.delete_from_index.assert_not_called()
+            assert not plugin.add_to_index.called, 'add_to_index was called and should not have been'
+        finally:
+            plugin.async_enabled = False
+            plugin.dispatcher = None
+            plugin.delete_from_index = pre_mock_def
+            plugin.build_index_document = pre_mock_build
+
     def _build_pkg_dict(self, data_dict):
         return {
             'id': 15, 'type': 'test-type',
@@ -425,7 +579,7 @@ class TestPlugin(unittest.TestCase, object):
 
         self.assertDictEqual(expected_data, actual_data)
 
-    @patch('ckanext.searchindexhook.plugin.requests.post')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
     def test_add_to_index_works_as_expected(self, mock_post):
         plugin = self._build_plugin_add_index()
 
@@ -465,11 +619,12 @@ class TestPlugin(unittest.TestCase, object):
             plugin.get_search_index_endpoint(),
             auth=('testuser', 'testpassword'),
             headers={'Content-Type': 'application/json'},
-            data=ANY
+            data=ANY,
+            timeout=(5.0, 30.0)
         )
         self._check_payload(expected_payload, mock_post)
 
-    @patch('ckanext.searchindexhook.plugin.requests.post')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
     def test_add_to_index_extra_values(self, mock_post):
         plugin = self._build_plugin_add_index()
 
@@ -570,11 +725,12 @@ class TestPlugin(unittest.TestCase, object):
             plugin.get_search_index_endpoint(),
             auth=('testuser', 'testpassword'),
             headers={'Content-Type': 'application/json'},
-            data=ANY
+            data=ANY,
+            timeout=(5.0, 30.0)
         )
         self._check_payload(expected_payload, mock_post)
 
-    @patch('ckanext.searchindexhook.plugin.requests.post')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
     def test_add_to_index_extra_values_strings(self, mock_post):
         plugin = self._build_plugin_add_index()
 
@@ -612,11 +768,12 @@ class TestPlugin(unittest.TestCase, object):
             plugin.get_search_index_endpoint(),
             auth=('testuser', 'testpassword'),
             headers={'Content-Type': 'application/json'},
-            data=ANY
+            data=ANY,
+            timeout=(5.0, 30.0)
         )
         self._check_payload(expected_payload, mock_post)
 
-    @patch('ckanext.searchindexhook.plugin.requests.post')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
     def test_add_to_index_extra_values_modified_date_in_future(self, mock_post):
         plugin = self._build_plugin_add_index()
 
@@ -645,11 +802,12 @@ class TestPlugin(unittest.TestCase, object):
             plugin.get_search_index_endpoint(),
             auth=('testuser', 'testpassword'),
             headers={'Content-Type': 'application/json'},
-            data=ANY
+            data=ANY,
+            timeout=(5.0, 30.0)
         )
         self._check_payload(expected_payload, mock_post)
 
-    @patch('ckanext.searchindexhook.plugin.requests.post')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
     def test_add_to_index_extra_values_invalid_date(self, mock_post):
         plugin = self._build_plugin_add_index()
 
@@ -678,12 +836,13 @@ class TestPlugin(unittest.TestCase, object):
             plugin.get_search_index_endpoint(),
             auth=('testuser', 'testpassword'),
             headers={'Content-Type': 'application/json'},
-            data=ANY
+            data=ANY,
+            timeout=(5.0, 30.0)
         )
 
         self._check_payload(expected_payload, mock_post)
 
-    @patch('ckanext.searchindexhook.plugin.requests.post')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
     def test_add_to_index_bbox_centroid_no_spatial(self, mock_post):
         # prepare
         plugin = self._build_plugin_add_index()
@@ -729,10 +888,187 @@ class TestPlugin(unittest.TestCase, object):
             plugin.get_search_index_endpoint(),
             auth=('testuser', 'testpassword'),
             headers={'Content-Type': 'application/json'},
-            data=ANY
+            data=ANY,
+            timeout=(5.0, 30.0)
         )
         self._check_payload(expected_payload, mock_post)
 
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_add_to_index_batch_mode_queues_document(self, mock_post):
+        plugin = self._build_plugin_add_index()
+        plugin.batch_enabled = True
+        plugin.batch_buffer = Mock()
+
+        data_dict = {
+            "resources": [],
+            "extras": []
+        }
+        pkg_dict = self._build_pkg_dict(data_dict)
+
+        try:
+            plugin.add_to_index(pkg_dict)
+        finally:
+            plugin.batch_enabled = False
+            batch_buffer = plugin.batch_buffer
+            plugin.batch_buffer = None
+
+        mock_post.assert_not_called()
+        batch_buffer.add.assert_called_once_with(
+            pkg_dict['id'], plugin.build_index_document(pkg_dict)
+        )
+
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_add_to_index_records_metrics(self, mock_post):
+        plugin = self._build_plugin_add_index()
+        pkg_dict = self._build_pkg_dict({
+            "resources": [],
+            "extras": []
+        })
+        metrics = plugin.metrics
+        plugin.metrics = Metrics()
+
+        try:
+            plugin.add_to_index(pkg_dict)
+            rendered = plugin.metrics.render().splitlines()
+        finally:
+            plugin.metrics = metrics
+
+        mock_post.assert_called_once()
+        self.assertIn('searchindexhook_documents_sent_total 1', rendered)
+        for stage in ('parse', 'resources', 'extras', 'serialize', 'http_post'):
+            self.assertIn('searchindexhook_stage_duration_seconds_count{{stage="{0}"}} {1}'.format(
+                stage, 2 if stage == 'serialize' else 1
+            ), rendered)
+
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_add_to_index_records_slow_document(self, mock_post):
+        plugin = self._build_plugin_add_index()
+        pkg_dict = self._build_pkg_dict({
+            "resources": [],
+            "extras": []
+        })
+        plugin.profiler = SlowDocumentProfiler(0.0)
+
+        try:
+            with self.assertLogs('ckanext.searchindexhook.profiling', level='WARNING') as logs:
+                plugin.add_to_index(pkg_dict)
+        finally:
+            plugin.profiler = None
+
+        mock_post.assert_called_once()
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(pkg_dict['id'], record['id'])
+        self.assertIn('http_post', record['stages_ms'])
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_before_index_records_slow_document_with_change_detection(self, mock_post, mock_delete):
+        plugin = self._build_plugin_add_index()
+        plugin.digest_enabled = True
+        plugin.change_detector = ChangeDetector(MemoryDigestStore())
+        plugin.profiler = SlowDocumentProfiler(0.0)
+        pkg_dict = dict(
+            self._build_pkg_dict({"resources": [], "extras": []}), id='11111111-1111-4111-8111-111111111111'
+        )
+
+        try:
+            with self.assertLogs('ckanext.searchindexhook.profiling', level='WARNING') as logs:
+                plugin.before_index(pkg_dict)
+        finally:
+            plugin.profiler = None
+            plugin.digest_enabled = False
+            plugin.change_detector = None
+
+        mock_post.assert_called_once()
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(pkg_dict['id'], record['id'])
+        self.assertIn('serialize', record['stages_ms'])
+
+    def test_build_index_document_copies_configured_extras(self):
+        plugin = self._build_plugin_add_index()
+        pkg_dict = self._build_pkg_dict({
+            "resources": [],
+            "extras": [{
+                "key": "landingPage",
+                "value": "http://example.com/"
+            }, {
+                "key": "conformsTo",
+                "value": "[\"http://example.com/standard\"]"
+            }, {
+                "key": "unmapped",
+                "value": "ignored"
+            }]
+        })
+        plugin.extras_copy_fields = ['landingPage']
+        plugin.extras_list_fields = ['conformsTo']
+        plugin.extras_handlers = plugin.compile_extras_handlers()
+
+        try:
+            document = plugin.build_index_document(pkg_dict)
+        finally:
+            plugin.extras_copy_fields = []
+            plugin.extras_list_fields = []
+            plugin.extras_handlers = plugin.compile_extras_handlers()
+
+        metadata = json.loads(document['document']['metadata'])
+        self.assertEqual("http://example.com/", metadata['landingPage'])
+        self.assertEqual(["http://example.com/standard"], metadata['conformsTo'])
+        self.assertNotIn('unmapped', metadata)
+
+    def test_build_index_document_parses_data_dict_once(self):
+        plugin = self._build_plugin_add_index()
+        pkg_dict = self._build_pkg_dict({
+            "resources": [],
+            "extras": []
+        })
+        json_codec = plugin.json_codec
+        plugin.json_codec = Mock(wraps=json_codec)
+
+        try:
+            plugin.build_index_document(pkg_dict)
+            parsed = [args[0] for args, _ in plugin.json_codec.loads.call_args_list]
+        finally:
+            plugin.json_codec = json_codec
+
+        self.assertEqual([pkg_dict['data_dict']], parsed)
+
+    def test_build_index_document_accepts_nan_values(self):
+        plugin = self._build_plugin_add_index()
+        pkg_dict = self._build_pkg_dict({
+            "resources": [{"format": "CSV", "size": float('nan')}],
+            "extras": []
+        })
+
+        document = plugin.build_index_document(pkg_dict)
+
+        metadata = json.loads(document['document']['metadata'])
+        self.assertTrue(math.isnan(metadata['resources'][0]['size']))
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_before_index_skips_unchanged_document(self, mock_post, mock_delete):
+        plugin = self._build_plugin_add_index()
+        directory = tempfile.mkdtemp()
+        plugin.digest_enabled = True
+        plugin.digest_path = os.path.join(directory, 'digests.db')
+
+        pkg_dict = self._build_pkg_dict({"resources": [], "extras": []})
+        pkg_dict['id'] = 'f73d8b97-e6cb-46bf-bbf6-670155f9fbb4'
+
+        try:
+            plugin.before_index(pkg_dict)
+            plugin.before_index(pkg_dict)
+            stats = dict(plugin.get_change_detector().stats)
+        finally:
+            plugin.digest_enabled = False
+            del plugin.digest_path
+            plugin.change_detector = None
+            shutil.rmtree(directory)
+
+        mock_post.assert_called_once()
+        mock_delete.assert_called_once()
+        self.assertEqual({'sent': 1, 'skipped': 1}, stats)
+
     def test_normalize_date_valid_values(self):
         plugin = self._build_plugin_add_index()
 
@@ -761,7 +1097,7 @@ class TestPlugin(unittest.TestCase, object):
             actual = plugin.normalize_date()
             self.assertEqual(actual, None)
 
-    @patch('ckanext.searchindexhook.plugin.requests.delete')
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
     def test_delete_from_index_works_as_expected(self, mock_delete):
         plugin = self.get_plugin_instance()
 
@@ -779,11 +1115,14 @@ class TestPlugin(unittest.TestCase, object):
         plugin.targetlink_url_base_path = '/test/path/'
         plugin.search_index_name = 'test-index'
 
-        plugin.resolve_data_dict = Mock(
-            return_value=mocked_pkg_dict
+        pre_mock_def = plugin.resolve_package_id
+        plugin.resolve_package_id = Mock(
+            return_value=mocked_pkg_dict['id']
         )
 
         plugin.delete_from_index(document_id)
+        plugin.resolve_package_id.assert_called_once_with(document_id)
+        plugin.resolve_package_id = pre_mock_def
 
         expected_payload = [{
             'indexName': plugin.search_index_name,
@@ -805,7 +1144,8 @@ class TestPlugin(unittest.TestCase, object):
             plugin.get_search_index_endpoint() + mocked_id_value,
             auth=('testuser', 'testpassword'),
             headers={'Content-Type': 'application/json'},
-            data=ANY
+            data=ANY,
+            timeout=(5.0, 30.0)
         )
         self._check_payload(expected_payload, mock_delete)
 
@@ -868,6 +1208,283 @@ class TestPlugin(unittest.TestCase, object):
 
         plugin.delete_from_index = pre_mock_def
 
+    def test_connection_error_stores_document_in_outbox(self):
+        plugin = self._build_plugin_add_index()
+        directory = tempfile.mkdtemp()
+        plugin.outbox_path = os.path.join(directory, 'outbox.db')
+
+        pre_mock_def = plugin.delete_from_index
+        plugin.delete_from_index = Mock(
+            side_effect=ConnectionError('test-error-message')
+        )
+
+        pkg_dict = self._build_pkg_dict({"resources": [], "extras": []})
+
+        try:
+            plugin.before_index(pkg_dict)
+            operations = plugin.get_outbox().fetch(10)
+        finally:
+            plugin.delete_from_index = pre_mock_def
+            plugin.outbox_path = False
+            plugin.outbox = None
+            shutil.rmtree(directory)
+
+        self.assertEqual(1, len(operations))
+        self.assertEqual(str(pkg_dict['id']), operations[0][1])
+        self.assertEqual(plugin.build_index_document(pkg_dict), json.loads(operations[0][3]))
+
+    def test_outbox_errors_do_not_block_before_index(self):
+        plugin = self._build_plugin_add_index()
+        plugin.outbox_path = os.path.join(tempfile.mkdtemp(), 'outbox.db')
+        plugin.outbox = Mock()
+        plugin.outbox.add.side_effect = sqlite3.OperationalError('database is locked')
+
+        pre_mock_def = plugin.delete_from_index
+        plugin.delete_from_index = Mock(
+            side_effect=ConnectionError('test-error-message')
+        )
+
+        pkg_dict = self._build_pkg_dict({"resources": [], "extras": []})
+
+        try:
+            with self.assertLogs('ckanext.searchindexhook.plugin', level='ERROR') as logs:
+                returned = plugin.before_index(pkg_dict)
+        finally:
+            plugin.delete_from_index = pre_mock_def
+            shutil.rmtree(os.path.dirname(plugin.outbox_path))
+            plugin.outbox_path = False
+            plugin.outbox = None
+
+        self.assertEqual(pkg_dict, returned)
+        self.assertIn('Writing the outbox failed: database is locked', logs.output[-1])
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    def test_open_circuit_stores_document_in_outbox_without_request(self, mock_delete):
+        plugin = self._build_plugin_add_index()
+        directory = tempfile.mkdtemp()
+        plugin.outbox_path = os.path.join(directory, 'outbox.db')
+        plugin.metrics = Metrics()
+        plugin.index_client = None
+        plugin.circuit_failure_threshold = 1
+        mock_delete.side_effect = ConnectionError('test-error-message')
+
+        pkg_dict = self._build_pkg_dict({"resources": [], "extras": []})
+        first_id = '11111111-1111-4111-8111-111111111111'
+        second_id = '22222222-2222-4222-8222-222222222222'
+
+        try:
+            plugin.before_index(dict(pkg_dict, id=first_id, name='first-name'))
+            plugin.before_index(dict(pkg_dict, id=second_id, name='second-name'))
+            operations = plugin.get_outbox().fetch(10)
+        finally:
+            del plugin.circuit_failure_threshold
+            plugin.index_client = None
+            plugin.outbox_path = False
+            plugin.outbox = None
+            shutil.rmtree(directory)
+
+        mock_delete.assert_called_once()
+        self.assertEqual([first_id, second_id], [operation[1] for operation in operations])
+        rendered = plugin.metrics.render()
+        self.assertIn('searchindexhook_circuit_transitions_total{state="open"} 1', rendered)
+        self.assertIn('searchindexhook_delivery_errors_total{error="CircuitOpenError"} 1', rendered)
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_exceeded_deadline_hands_dataset_to_background_workers(self, mock_post, mock_delete):
+        plugin = self._build_plugin_add_index()
+        plugin.metrics = Metrics()
+        plugin.async_enabled = True
+        plugin.deadline_budget = 1e-9
+
+        pkg_dict = dict(
+            self._build_pkg_dict({"resources": [], "extras": []}), id='11111111-1111-4111-8111-111111111111'
+        )
+
+        try:
+            returned = plugin.before_index(pkg_dict)
+            mock_post.assert_not_called()
+            remaining = plugin.dispatcher.drain()
+        finally:
+            del plugin.deadline_budget
+            del plugin.async_enabled
+            plugin.dispatcher = None
+
+        self.assertEqual(pkg_dict, returned)
+        self.assertEqual([], remaining)
+        mock_delete.assert_called_once()
+        self._check_payload([plugin.build_index_document(pkg_dict)], mock_post)
+        rendered = plugin.metrics.render()
+        self.assertIn('searchindexhook_deadline_aborts_total{stage="resources"} 1', rendered)
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_exceeded_deadline_is_replaced_by_later_sync(self, mock_post, mock_delete):
+        plugin = self._build_plugin_add_index()
+        # earlier tests replace add_to_index of the singleton plugin with a mock
+        vars(plugin).pop('add_to_index', None)
+        directory = tempfile.mkdtemp()
+        plugin.outbox_path = os.path.join(directory, 'outbox.db')
+        plugin.metrics = Metrics()
+
+        pkg_dict = dict(
+            self._build_pkg_dict({"resources": [], "extras": []}), id='11111111-1111-4111-8111-111111111111'
+        )
+        newer_pkg_dict = dict(pkg_dict, title='newer title')
+
+        try:
+            plugin.deadline_budget = 1e-9
+            plugin.before_index(pkg_dict)
+            deferred = plugin.get_outbox().fetch(10)
+            del plugin.deadline_budget
+            plugin.before_index(newer_pkg_dict)
+            remaining = plugin.get_outbox().fetch(10)
+            dispatcher = plugin.dispatcher
+        finally:
+            plugin.outbox_path = False
+            plugin.outbox = None
+            shutil.rmtree(directory)
+
+        self.assertIsNone(dispatcher)
+        self.assertEqual(plugin.build_index_document(pkg_dict), json.loads(deferred[0][3]))
+        self.assertEqual([], remaining)
+        mock_post.assert_called_once()
+        self._check_payload([plugin.build_index_document(newer_pkg_dict)], mock_post)
+
+    def test_shutdown_stores_undrained_operations_in_outbox(self):
+        plugin = self._build_plugin_add_index()
+        directory = tempfile.mkdtemp()
+        plugin.outbox_path = os.path.join(directory, 'outbox.db')
+        aborted_pkg_dict = dict(
+            self._build_pkg_dict({"resources": [], "extras": []}), id='11111111-1111-4111-8111-111111111111'
+        )
+        built_pkg_dict = dict(aborted_pkg_dict, id='22222222-2222-4222-8222-222222222222')
+        deleted_id = '33333333-3333-4333-8333-333333333333'
+        plugin.dispatcher = Mock()
+        plugin.dispatcher.drain.return_value = [
+            (plugin.index_in_background, (aborted_pkg_dict,)),
+            (plugin.deliver_document, (built_pkg_dict['id'], plugin.build_index_document(built_pkg_dict))),
+            (plugin.deliver_deletion, (deleted_id,)),
+        ]
+
+        try:
+            plugin.shutdown()
+            operations = plugin.get_outbox().fetch(10)
+        finally:
+            plugin.dispatcher = None
+            plugin.outbox_path = False
+            plugin.outbox = None
+            shutil.rmtree(directory)
+
+        self.assertEqual(
+            [aborted_pkg_dict['id'], built_pkg_dict['id'], deleted_id],
+            [operation[1] for operation in operations]
+        )
+        self.assertEqual(plugin.build_index_document(aborted_pkg_dict), json.loads(operations[0][3]))
+        self.assertEqual('delete', operations[2][2])
+
+    def test_coalescing_sends_only_last_state(self):
+        plugin = self._build_plugin_add_index()
+        plugin.metrics = Metrics()
+        plugin.coalesce_window = 60
+        plugin.sync_dataset = Mock()
+
+        pkg_dict = self._build_pkg_dict({"resources": [], "extras": []})
+
+        try:
+            for title in ['first title', 'second title', 'last title']:
+                plugin.before_index(dict(pkg_dict, title=title))
+            plugin.sync_dataset.assert_not_called()
+            plugin.coalescer.flush()
+            sync_dataset = plugin.sync_dataset
+        finally:
+            del plugin.coalesce_window
+            del plugin.sync_dataset
+            plugin.coalescer = None
+
+        sync_dataset.assert_called_once_with(dict(pkg_dict, title='last title'))
+        self.assertIn('searchindexhook_operations_coalesced_total 2', plugin.metrics.render())
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_coalesced_deletion_supersedes_pending_additions(self, mock_post, mock_delete):
+        plugin = self._build_plugin_add_index()
+        plugin.coalesce_window = 60
+        package_id = '11111111-1111-4111-8111-111111111111'
+
+        pkg_dict = dict(self._build_pkg_dict({"resources": [], "extras": []}), id=package_id)
+
+        try:
+            plugin.before_index(pkg_dict)
+            plugin.before_index(pkg_dict)
+            plugin.after_dataset_delete({}, {'id': package_id})
+            plugin.coalescer.flush()
+        finally:
+            del plugin.coalesce_window
+            plugin.coalescer = None
+
+        mock_post.assert_not_called()
+        mock_delete.assert_called_once()
+        self.assertEqual('http://www.ws.de/test/' + package_id, mock_delete.call_args[0][0])
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_replay_outbox_sends_documents_in_one_request(self, mock_post, mock_delete):
+        plugin = self._build_plugin_add_index()
+        directory = tempfile.mkdtemp()
+        plugin.outbox_path = os.path.join(directory, 'outbox.db')
+
+        try:
+            outbox = plugin.get_outbox()
+            outbox.add('id-1', json.dumps({'document': {'id': 'id-1'}}))
+            outbox.add('id-2', json.dumps({'document': {'id': 'id-2'}}))
+            outbox.delete('id-3')
+
+            delivered = plugin.replay_outbox()
+            remaining = len(outbox)
+        finally:
+            plugin.outbox_path = False
+            plugin.outbox = None
+            shutil.rmtree(directory)
+
+        self.assertEqual(3, delivered)
+        self.assertEqual(0, remaining)
+        self.assertEqual(3, mock_delete.call_count)
+        mock_post.assert_called_once()
+        self.assertEqual(
+            [{'document': {'id': 'id-1'}}, {'document': {'id': 'id-2'}}],
+            json.loads(mock_post.call_args[1]['data'])
+        )
+
+    @patch('ckanext.searchindexhook.client.requests.Session.delete')
+    @patch('ckanext.searchindexhook.client.requests.Session.post')
+    def test_replay_outbox_skips_documents_delivered_in_the_meantime(self, mock_post, mock_delete):
+        plugin = self._build_plugin_add_index()
+        directory = tempfile.mkdtemp()
+        plugin.outbox_path = os.path.join(directory, 'outbox.db')
+
+        try:
+            outbox = plugin.get_outbox()
+            outbox.add('id-1', json.dumps({'document': {'id': 'id-1'}}))
+            outbox.add('id-2', json.dumps({'document': {'id': 'id-2', 'version': 1}}))
+            # a hook call delivers a newer document of id-2 while the replay is running
+            def deliver_newer_document(*args, **kwargs):  # pylint: disable=unused-argument
+                plugin.clear_deferred('id-2')
+                return mock_delete.return_value
+            mock_delete.side_effect = deliver_newer_document
+
+            plugin.replay_outbox()
+            remaining = len(outbox)
+        finally:
+            plugin.outbox_path = False
+            plugin.outbox = None
+            shutil.rmtree(directory)
+
+        self.assertEqual(0, remaining)
+        self.assertEqual(1, mock_delete.call_count)
+        mock_post.assert_called_once()
+        self.assertEqual([{'document': {'id': 'id-1'}}], json.loads(mock_post.call_args[1]['data']))
+
     def test_shorten_resource_formats_empty(self):
         plugin = self.get_plugin_instance()
 
@@ -959,6 +1576,20 @@ class TestPlugin(unittest.TestCase, object):
         self.assertEqual(metadata_dict['spatial_area'], 0)
         self.assertEqual(metadata_dict['spatial_center'], {'lat': 53.896117, 'lon': 9.156908})
 
+    def test_spatial_to_meta_derives_identical_values_once(self):
+        extra = {'key': 'spatial', 'value': '{"type": "Point", "coordinates": [8.1, 50.2]}'}
+        plugin = self.get_plugin_instance()
+        plugin.spatial_cache = None
+
+        with patch.object(plugin, 'derive_spatial_fields', wraps=plugin.derive_spatial_fields) as derive:
+            for name in ['first-dataset', 'second-dataset']:
+                metadata_dict = {'name': name}
+                plugin.spatial_to_meta(extra, metadata_dict)
+                self.assertEqual({'lat': 50.2, 'lon': 8.1}, metadata_dict['spatial_center'])
+
+        derive.assert_called_once_with(extra['value'])
+        self.assertEqual(1, plugin.spatial_cache.stats['hits'])
+
     def test_spatial_to_meta_geojson_type_polygon_fix(self):
         # prepare
         extra = {}
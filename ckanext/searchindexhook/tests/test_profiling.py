@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the slow document profiler of the ckanext.searchindexhook extension.
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ckanext.searchindexhook.metrics import STAGE_PARSE, Metrics
+from ckanext.searchindexhook.profiling import SlowDocumentProfiler, geometry_vertices
+
+POLYGON = {'type': 'Polygon', 'coordinates': [
+    [[0, 0], [1, 0], [1, 1], [0, 0]],
+    [[0.2, 0.2], [0.3, 0.2], [0.2, 0.2]]
+]}
+
+DATA_DICT = {
+    'id': 'id-1',
+    'name': 'slow-dataset',
+    'data_dict': json.dumps({
+        'resources': [{'url': 'http://example.com/1'}, {'url': 'http://example.com/2'}],
+        'extras': [
+            {'key': 'spatial', 'value': json.dumps(POLYGON)},
+            {'key': 'contact_name', 'value': 'Jane'}
+        ]
+    })
+}
+
+
+class TestSlowDocumentProfiler(unittest.TestCase):
+
+    def run_profile(self, profiler, index):
+        metrics = Metrics()
+
+        def traced_index():
+            metrics.observe(STAGE_PARSE, 0.25)
+            return index()
+
+        with self.assertLogs('ckanext.searchindexhook.profiling', level='WARNING') as logs:
+            profiler.profile(metrics, DATA_DICT, traced_index)
+        return json.loads(logs.records[0].getMessage())
+
+    def test_slow_document_is_recorded(self):
+        record = self.run_profile(SlowDocumentProfiler(0.0), lambda: {'document': {'id': 'id-1'}})
+
+        self.assertEqual('id-1', record['id'])
+        self.assertEqual(2, record['resources'])
+        self.assertEqual(2, record['extras'])
+        self.assertEqual({'spatial': 7}, record['vertices'])
+        self.assertEqual(250.0, record['stages_ms']['parse'])
+        self.assertEqual(len(json.dumps({'document': {'id': 'id-1'}})), record['payload_bytes'])
+
+    def test_fast_document_is_not_recorded(self):
+        profiler = SlowDocumentProfiler(60.0)
+
+        with self.assertNoLogs('ckanext.searchindexhook.profiling'):
+            document = profiler.profile(Metrics(), DATA_DICT, lambda: {'document': {}})
+
+        self.assertEqual({'document': {}}, document)
+
+    def test_failed_document_is_recorded_with_error(self):
+        def failing_index():
+            raise ValueError('test-error-message')
+
+        with self.assertRaises(ValueError):
+            with self.assertLogs('ckanext.searchindexhook.profiling', level='WARNING') as logs:
+                SlowDocumentProfiler(0.0).profile(Metrics(), DATA_DICT, failing_index)
+
+        self.assertEqual('ValueError', json.loads(logs.records[0].getMessage())['error'])
+
+    def test_cprofile_statistics_are_dumped(self):
+        directory = tempfile.mkdtemp()
+        try:
+            record = self.run_profile(SlowDocumentProfiler(0.0, cprofile_dir=directory), lambda: None)
+
+            self.assertTrue(os.path.exists(record['profile']))
+            self.assertEqual(directory, os.path.dirname(record['profile']))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_records_are_written_to_log_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'slow.log')
+            profiler = SlowDocumentProfiler(0.0, log_path=path)
+            profiler.profile(Metrics(), DATA_DICT, lambda: None)
+            for handler in profiler.logger.handlers:
+                handler.flush()
+
+            with open(path, encoding='utf-8') as log_file:
+                self.assertEqual('id-1', json.loads(log_file.readline())['id'])
+        finally:
+            for handler in list(profiler.logger.handlers):
+                handler.close()
+                profiler.logger.removeHandler(handler)
+            shutil.rmtree(directory)
+
+    def test_geometry_vertices_of_collections(self):
+        collection = {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [1, 2]}},
+            {'type': 'Feature', 'geometry': {'type': 'GeometryCollection', 'geometries': [POLYGON]}}
+        ]}
+
+        self.assertEqual(8, geometry_vertices(collection))
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the reindex of the ckanext.searchindexhook extension.
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+from mock import Mock, call, patch
+
+from ckanext.searchindexhook.jsoncodec import load_codec
+from ckanext.searchindexhook.reindex import Checkpoint, Reindexer, build_index_dict
+
+
+def package_show(context, data_dict):  # pylint: disable=unused-argument
+    if data_dict['id'] == 'broken':
+        raise ValueError('test-error-message')
+    return {'id': data_dict['id']}
+
+
+def build_plugin(upsert_enabled=False, outbox=None):
+    plugin = Mock()
+    plugin.upsert_enabled = upsert_enabled
+    plugin.uses_upsert.return_value = upsert_enabled
+    plugin.json_codec = load_codec('json')
+    plugin.get_outbox.return_value = outbox
+    plugin.get_indexable_data_types.return_value = ['dataset']
+    plugin.build_index_document.side_effect = lambda index_dict: {'id': index_dict['id']}
+    return plugin
+
+
+@patch('ckanext.searchindexhook.reindex.build_index_dict', side_effect=lambda pkg_dict, dumps: pkg_dict)
+@patch('ckanext.searchindexhook.reindex.tk.get_action', return_value=package_show)
+class TestReindexer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.directory, 'reindex.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_reindex(self, plugin, chunks, resume=False, processes=1):
+        with patch('ckanext.searchindexhook.reindex.query_dataset_ids', return_value=iter(chunks)) as query:
+            reindexer = Reindexer(
+                plugin, processes=processes, connections=2, checkpoint_path=self.checkpoint_path
+            )
+            stats = reindexer.run(resume=resume)
+        return stats, query
+
+    def test_chunks_are_sent_in_bulk_after_deletions(self, *_):
+        plugin = build_plugin()
+
+        stats, _ = self.run_reindex(plugin, [['id-1', 'id-2'], ['id-3']])
+
+        self.assertEqual({'datasets': 3, 'delivered': 3}, stats)
+        plugin.send_deletion.assert_has_calls([call('id-1'), call('id-2'), call('id-3')], any_order=True)
+        plugin.send_documents.assert_has_calls([
+            call('[{"id": "id-1"},{"id": "id-2"}]'), call('[{"id": "id-3"}]')
+        ], any_order=True)
+
+    def test_upsert_mode_sends_no_deletions(self, *_):
+        plugin = build_plugin(upsert_enabled=True)
+
+        self.run_reindex(plugin, [['id-1']])
+
+        plugin.send_deletion.assert_not_called()
+        plugin.send_documents.assert_called_once_with('[{"id": "id-1"}]')
+
+    def test_failed_documents_are_counted(self, *_):
+        plugin = build_plugin()
+
+        stats, _ = self.run_reindex(plugin, [['id-1', 'broken']])
+
+        self.assertEqual(1, stats['failed'])
+        plugin.send_documents.assert_called_once_with('[{"id": "id-1"}]')
+
+    def test_resume_continues_after_checkpoint(self, *_):
+        plugin = build_plugin()
+        self.run_reindex(plugin, [['id-1'], ['id-2']])
+
+        _, query = self.run_reindex(plugin, [], resume=True)
+
+        self.assertEqual('id-2', query.call_args[0][3])
+
+    def test_undelivered_chunk_stops_checkpoint(self, *_):
+        plugin = build_plugin()
+
+        with patch('ckanext.searchindexhook.reindex.Reindexer.send_chunk', autospec=True) as send_chunk:
+            send_chunk.side_effect = lambda reindexer, documents: (
+                'undelivered' if documents[0][0] == 'id-2' else 'delivered'
+            )
+            stats, _ = self.run_reindex(plugin, [['id-1'], ['id-2'], ['id-3']])
+
+        self.assertEqual({'datasets': 3, 'delivered': 2, 'undelivered': 1}, stats)
+        with open(self.checkpoint_path, encoding='utf-8') as checkpoint_file:
+            self.assertEqual('id-1', json.load(checkpoint_file)['last_id'])
+
+    def test_undelivered_chunk_is_stored_in_outbox(self, *_):
+        plugin = build_plugin(outbox=Mock())
+        plugin.send_documents.side_effect = requests.exceptions.ConnectionError('down')
+
+        stats, _ = self.run_reindex(plugin, [['id-1']])
+
+        self.assertEqual(1, stats['deferred'])
+        plugin.defer_serialized_documents.assert_called_once_with([('id-1', '{"id": "id-1"}')])
+
+    def test_delivered_chunk_clears_deferred_operations(self, *_):
+        outbox = Mock()
+        plugin = build_plugin(outbox=outbox)
+
+        self.run_reindex(plugin, [['id-1', 'id-2']])
+
+        outbox.discard_many.assert_called_once_with(['id-1', 'id-2'])
+
+    def test_documents_are_built_in_worker_processes(self, *_):
+        plugin = build_plugin(upsert_enabled=True)
+
+        stats, _ = self.run_reindex(plugin, [['id-1', 'id-2'], ['id-3']], processes=2)
+
+        self.assertEqual(3, stats['delivered'])
+        self.assertEqual(2, plugin.send_documents.call_count)
+
+
+class TestReindexHelpers(unittest.TestCase):
+
+    def test_build_index_dict(self):
+        pkg_dict = {
+            'id': 'id-1',
+            'title': '  Title\x07',
+            'notes': 'Notes',
+            'tags': [{'name': 'tag'}, {'name': 'vocab-tag', 'vocabulary_id': 'vocab'}],
+            'groups': [{'name': 'group', 'id': 'group-id'}],
+            'resources': [{'url': 'http://example.com', 'tracking_summary': {}}],
+            'metadata_created': '2024-01-01T10:00:00',
+            'metadata_modified': '2024-01-02T10:00:00',
+            'tracking_summary': {'total': 0}
+        }
+
+        index_dict = build_index_dict(pkg_dict)
+
+        self.assertEqual('Title', index_dict['title'])
+        self.assertEqual(['tag'], index_dict['tags'])
+        self.assertEqual(['group'], index_dict['groups'])
+        self.assertEqual('2024-01-02T10:00:00Z', index_dict['metadata_modified'])
+        self.assertEqual([{'url': 'http://example.com'}], json.loads(index_dict['data_dict'])['resources'])
+        self.assertNotIn('tracking_summary', index_dict)
+
+    def test_checkpoint_rejects_other_filters(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'reindex.json')
+            Checkpoint(path, {'types': ['dataset']}).save('id-1', {})
+
+            self.assertEqual('id-1', Checkpoint(path, {'types': ['dataset']}).load())
+            with self.assertRaises(ValueError):
+                Checkpoint(path, {'types': ['harvest']}).load()
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the retries and the circuit breaker of the ckanext.searchindexhook extension.
+'''
+import unittest
+
+import pytest
+from mock import Mock
+from requests.exceptions import ConnectionError
+
+from ckanext.searchindexhook.resilience import (
+    STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker, CircuitOpenError, RetryPolicy
+)
+
+
+def build_response(status_code, headers=None):
+    return Mock(status_code=status_code, headers=headers or {})
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def _build_policy(self, **kwargs):
+        self.sleeps = []
+        return RetryPolicy(sleep=self.sleeps.append, **kwargs)
+
+    def test_transient_status_is_retried_until_success(self):
+        policy = self._build_policy(max_attempts=3)
+        send = Mock(side_effect=[build_response(503), build_response(200)])
+
+        response = policy.call(send)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, send.call_count)
+        self.assertEqual(1, len(self.sleeps))
+
+    def test_retries_are_bounded(self):
+        policy = self._build_policy(max_attempts=3)
+        send = Mock(return_value=build_response(429))
+
+        response = policy.call(send)
+
+        self.assertEqual(429, response.status_code)
+        self.assertEqual(3, send.call_count)
+
+    def test_other_status_is_not_retried(self):
+        policy = self._build_policy(max_attempts=3)
+        send = Mock(return_value=build_response(400))
+
+        policy.call(send)
+
+        self.assertEqual(1, send.call_count)
+        self.assertEqual([], self.sleeps)
+
+    def test_delay_grows_exponentially_up_to_the_maximum(self):
+        rng = Mock()
+        rng.uniform.side_effect = lambda low, high: high
+        policy = self._build_policy(backoff=0.1, max_backoff=0.3, rng=rng)
+
+        delays = [policy.delay(retry) for retry in range(4)]
+
+        self.assertEqual([0.1, 0.2, 0.3, 0.3], delays)
+
+    def test_retry_after_is_honoured_up_to_the_maximum(self):
+        policy = self._build_policy(max_backoff=2.0)
+
+        self.assertEqual(1.0, policy.delay(0, build_response(429, {'Retry-After': '1'})))
+        self.assertEqual(2.0, policy.delay(0, build_response(429, {'Retry-After': '120'})))
+
+    def test_retries_are_reported(self):
+        on_retry = Mock()
+        policy = self._build_policy(max_attempts=2, on_retry=on_retry)
+
+        policy.call(Mock(return_value=build_response(502)))
+
+        on_retry.assert_called_once_with(502)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.on_change = Mock()
+        self.breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=10.0, on_change=self.on_change, clock=self.clock
+        )
+
+    def _fail(self):
+        with pytest.raises(ConnectionError):
+            self.breaker.call(Mock(side_effect=ConnectionError('down')))
+
+    def test_circuit_opens_after_failures_in_a_row(self):
+        self._fail()
+        self.assertEqual(STATE_CLOSED, self.breaker.state)
+        self._fail()
+
+        self.assertEqual(STATE_OPEN, self.breaker.state)
+        self.on_change.assert_called_once_with(STATE_OPEN)
+
+    def test_success_resets_the_failure_count(self):
+        self._fail()
+        self.breaker.call(Mock(return_value=build_response(200)))
+        self._fail()
+
+        self.assertEqual(STATE_CLOSED, self.breaker.state)
+
+    def test_server_errors_are_failures(self):
+        self.breaker.call(Mock(return_value=build_response(503)))
+        self.breaker.call(Mock(return_value=build_response(429)))
+
+        self.assertEqual(STATE_OPEN, self.breaker.state)
+
+    def test_client_errors_are_no_failures(self):
+        self.breaker.call(Mock(return_value=build_response(404)))
+        self.breaker.call(Mock(return_value=build_response(400)))
+
+        self.assertEqual(STATE_CLOSED, self.breaker.state)
+
+    def test_open_circuit_fails_fast(self):
+        self._fail()
+        self._fail()
+        send = Mock()
+
+        with pytest.raises(CircuitOpenError):
+            self.breaker.call(send)
+
+        send.assert_not_called()
+
+    def test_half_open_circuit_closes_after_successful_trial(self):
+        self._fail()
+        self._fail()
+        self.clock.now = 10.0
+
+        self.assertEqual(STATE_HALF_OPEN, self.breaker.state)
+        self.breaker.call(Mock(return_value=build_response(200)))
+
+        self.assertEqual(STATE_CLOSED, self.breaker.state)
+        self.assertEqual(
+            [STATE_OPEN, STATE_HALF_OPEN, STATE_CLOSED],
+            [call[0][0] for call in self.on_change.call_args_list]
+        )
+
+    def test_half_open_circuit_reopens_after_failed_trial(self):
+        self._fail()
+        self._fail()
+        self.clock.now = 10.0
+
+        self._fail()
+
+        self.assertEqual(STATE_OPEN, self.breaker.state)
+        with pytest.raises(CircuitOpenError):
+            self.breaker.call(Mock())
+
+    def test_half_open_circuit_limits_trial_calls(self):
+        self._fail()
+        self._fail()
+        self.clock.now = 10.0
+        self.breaker.before_call()
+
+        with pytest.raises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_trial_is_released_after_unrelated_error(self):
+        self._fail()
+        self._fail()
+        self.clock.now = 10.0
+
+        with pytest.raises(ValueError):
+            self.breaker.call(Mock(side_effect=ValueError('encoding failed')))
+        self.breaker.call(Mock(return_value=build_response(200)))
+
+        self.assertEqual(STATE_CLOSED, self.breaker.state)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the dataset id resolver of the ckanext.searchindexhook extension.
+'''
+import unittest
+
+import pytest
+from mock import Mock
+
+from ckanext.searchindexhook.resolver import PackageIdResolver
+
+PACKAGE_ID = 'f73d8b97-e6cb-46bf-bbf6-670155f9fbb4'
+
+
+class TestPackageIdResolver(unittest.TestCase):
+
+    def test_uuid_is_returned_without_lookup(self):
+        lookup = Mock()
+        resolver = PackageIdResolver(lookup=lookup)
+
+        self.assertEqual(PACKAGE_ID, resolver.resolve(' ' + PACKAGE_ID + ' '))
+        lookup.assert_not_called()
+
+    def test_name_is_looked_up_once(self):
+        lookup = Mock(return_value=PACKAGE_ID)
+        resolver = PackageIdResolver(lookup=lookup)
+
+        self.assertEqual(PACKAGE_ID, resolver.resolve('dataset-name'))
+        self.assertEqual(PACKAGE_ID, resolver.resolve('dataset-name'))
+        lookup.assert_called_once_with('dataset-name')
+
+    def test_unknown_dataset_raises_lookup_error(self):
+        resolver = PackageIdResolver(lookup=Mock(return_value=None))
+
+        with pytest.raises(LookupError):
+            resolver.resolve('unknown-dataset')
+
+    def test_rename_drops_former_name(self):
+        lookup = Mock(return_value=None)
+        resolver = PackageIdResolver(lookup=lookup)
+        resolver.remember('old-name', PACKAGE_ID)
+
+        resolver.remember('new-name', PACKAGE_ID)
+
+        self.assertEqual(PACKAGE_ID, resolver.resolve('new-name'))
+        with pytest.raises(LookupError):
+            resolver.resolve('old-name')
+
+    def test_least_recently_used_name_is_evicted(self):
+        lookup = Mock(return_value=None)
+        resolver = PackageIdResolver(max_size=2, lookup=lookup)
+        resolver.remember('name-1', 'id-1')
+        resolver.remember('name-2', 'id-2')
+        resolver.resolve('name-1')
+
+        resolver.remember('name-3', 'id-3')
+
+        self.assertEqual(2, len(resolver))
+        self.assertEqual('id-1', resolver.resolve('name-1'))
+        with pytest.raises(LookupError):
+            resolver.resolve('name-2')
@@ -0,0 +1,20 @@
+"""
+Module providing the views of the search index hook.
+"""
+from flask import Blueprint, Response
+
+from ckanext.searchindexhook.metrics import CONTENT_TYPE
+
+
+def build_metrics_blueprint(metrics):
+    """
+    Returns the blueprint exposing the metrics of the current process in the Prometheus
+    text format at /searchindexhook/metrics.
+    """
+    blueprint = Blueprint('searchindexhook', __name__, url_prefix='/searchindexhook')
+
+    def metrics_view():
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+    blueprint.add_url_rule('/metrics', view_func=metrics_view, endpoint='metrics')
+    return blueprint